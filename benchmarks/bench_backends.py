@@ -0,0 +1,124 @@
+"""
+The same workload on the `file`, `sqlite`, `memory` and `cassandra` backends: workers loop picking one of M keys at
+random, locking it, holding it for a while and releasing it, retrying with exponential backoff when it's taken.
+
+The `file` and `sqlite` locks are run with worker processes, the way they're meant to be used. The `memory` lock can
+only be shared by threads, and so can the in-memory stand-in the `cassandra` lock runs against (which adds `--latency`
+per round trip). Usage::
+
+    python -m benchmarks.bench_backends --workers 8 --keys 1,16 --seconds 3
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.exceptions import BusyLockException
+from padlock.distributed.cassandra import CassandraDistributedRowLock
+from padlock.distributed.retry_policy import ExponentialBackoffPolicy
+from padlock.local.file import FileLock
+from padlock.local.memory import MemoryLock, StripedLockTable
+from padlock.local.sqlite import SQLiteLock
+from padlock.metrics import Histogram
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+POLICY = ExponentialBackoffPolicy(base=0.0005, cap=0.05, max_attempts=50)
+
+
+def work(make_lock, keys, hold, stop):
+    """
+    Lock keys until `stop`, returning how many locks were acquired and how long each took.
+    """
+    names = ['bench:%d' % i for i in xrange(keys)]
+    latencies = []
+    while time.time() < stop:
+        lock = make_lock(random.choice(names))
+        start = time.time()
+        try:
+            lock.acquire()
+        except BusyLockException:
+            continue
+        latencies.append(time.time() - start)
+        time.sleep(hold)
+        lock.release()
+    return latencies
+
+
+def file_worker(args):
+    path, keys, hold, stop = args
+    return work(lambda key: FileLock(key, path=path, backoff_policy=POLICY), keys, hold, stop)
+
+
+def sqlite_worker(args):
+    path, keys, hold, stop = args
+    return work(lambda key: SQLiteLock(key, path=path, backoff_policy=POLICY), keys, hold, stop)
+
+
+def run_processes(worker, workers, keys, hold, seconds):
+    tmp = tempfile.mkdtemp()
+    pool = multiprocessing.Pool(workers)
+    try:
+        stop = time.time() + seconds
+        return sum(pool.map(worker, [(os.path.join(tmp, 'locks'), keys, hold, stop)] * workers), [])
+    finally:
+        pool.close()
+        pool.join()
+        shutil.rmtree(tmp)
+
+
+def run_threads(make_lock, workers, keys, hold, seconds):
+    stop = time.time() + seconds
+    results = []
+
+    def target():
+        results.extend(work(make_lock, keys, hold, stop))
+
+    threads = [threading.Thread(target=target) for _ in xrange(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=8, help='processes or threads (default: 8)')
+    parser.add_argument('--keys', type=lambda v: [int(k) for k in v.split(',')], default=[1, 16],
+                        help='comma separated key counts (default: 1,16)')
+    parser.add_argument('--seconds', type=float, default=3.0, help='how long to run each backend for')
+    parser.add_argument('--hold', type=float, default=0.0005, help='seconds every lock is held for')
+    parser.add_argument('--latency', type=float, default=0.001, help='seconds every cassandra round trip takes')
+    args = parser.parse_args()
+
+    print '%d workers, %.2fms hold, %.1fms cassandra latency' % (args.workers, args.hold * 1e3, args.latency * 1e3)
+    print '%-10s %6s %14s %10s %10s' % ('backend', 'keys', 'acquires/sec', 'p50 ms', 'p99 ms')
+    for keys in args.keys:
+        table = StripedLockTable()
+        cf = FakeColumnFamily(latency=args.latency)
+        runs = [
+            ('file', lambda: run_processes(file_worker, args.workers, keys, args.hold, args.seconds)),
+            ('sqlite', lambda: run_processes(sqlite_worker, args.workers, keys, args.hold, args.seconds)),
+            ('memory', lambda: run_threads(lambda key: MemoryLock(key, table=table, backoff_policy=POLICY),
+                                           args.workers, keys, args.hold, args.seconds)),
+            ('cassandra', lambda: run_threads(
+                lambda key: CassandraDistributedRowLock(None, cf, key, backoff_policy=POLICY,
+                                                        consistency_level=ConsistencyLevel.ONE),
+                args.workers, keys, args.hold, args.seconds)),
+        ]
+        for name, run in runs:
+            histogram = Histogram()
+            latencies = run()
+            for latency in latencies:
+                histogram.record(latency)
+            print '%-10s %6d %14.1f %10.3f %10.3f' % (name, keys, len(latencies) / args.seconds,
+                                                      (histogram.percentile(50) or 0) * 1e3,
+                                                      (histogram.percentile(99) or 0) * 1e3)
+
+
+if __name__ == '__main__':
+    main()
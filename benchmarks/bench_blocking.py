@@ -0,0 +1,95 @@
+"""
+How many round trips a blocking acquire spends waiting for a lock, and how long it takes to notice the lock is free,
+with blind exponential backoff and with the waits cut short at the holder's expiry (what `acquire(blocking=True)`
+does). Contenders wait for a lock held with a `--hold-timeout` by a holder that either crashed (and never releases it)
+or releases it early, at a random point. Round trips (until the first contender gets the lock) are counted on the
+in-memory column family, with `--latency` per round trip. Usage::
+
+    python -m benchmarks.bench_blocking --contenders 1,8 --rounds 10
+"""
+import argparse
+import random
+import threading
+import time
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.distributed.cassandra import CassandraDistributedRowLock
+from padlock.distributed.retry_policy import acquire_policy, ExponentialBackoffPolicy
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+POLICY = ExponentialBackoffPolicy(base=0.01, cap=1.0)
+
+
+def contend(cf, aware, contenders):
+    """
+    Start `contenders` threads that each wait for the lock on `cf`, then release it, returning the threads and the
+    list every one of them adds when it got the lock to, along with how many round trips had been made by then.
+    """
+    won = []
+    guard = threading.Lock()
+
+    def target():
+        lock = CassandraDistributedRowLock(None, cf, 'row', backoff_policy=POLICY,
+                                           consistency_level=ConsistencyLevel.ONE)
+        if aware:
+            lock.acquire(blocking=True)
+        else:
+            lock.acquire_with(acquire_policy(POLICY, blocking=True))
+        got = time.time()
+        with guard:
+            won.append((got, cf.stats['reads'] + cf.stats['writes']))
+        lock.release()
+
+    threads = [threading.Thread(target=target) for _ in xrange(contenders)]
+    for t in threads:
+        t.start()
+    return threads, won
+
+
+def run(aware, crashed, contenders, hold_timeout, latency):
+    cf = FakeColumnFamily(latency=latency)
+    holder = CassandraDistributedRowLock(None, cf, 'row', timeout=hold_timeout,
+                                         consistency_level=ConsistencyLevel.ONE)
+    holder.acquire()
+    if crashed:
+        free_at = time.time() + hold_timeout
+    else:
+        free_at = time.time() + random.uniform(0.1, 0.9) * hold_timeout
+    cf.stats.clear()
+    threads, won = contend(cf, aware, contenders)
+    if not crashed:
+        time.sleep(max(0, free_at - time.time()))
+        holder.release()
+        free_at = time.time()
+    for t in threads:
+        t.join()
+    got, trips = min(won)
+    return trips, got - free_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--contenders', type=lambda v: [int(c) for c in v.split(',')], default=[1, 8],
+                        help='comma separated numbers of threads waiting for the lock (default: 1,8)')
+    parser.add_argument('--rounds', type=int, default=10, help='times to run every case (default: 10)')
+    parser.add_argument('--hold-timeout', type=float, default=2.0, help="the holder's lock timeout (default: 2)")
+    parser.add_argument('--latency', type=float, default=0.001, help='seconds every round trip takes')
+    args = parser.parse_args()
+
+    print '%.1fs holder timeout, %.1fms latency' % (args.hold_timeout, args.latency * 1e3)
+    print '%-10s %11s %-14s %13s %14s %14s' % ('holder', 'contenders', 'waits', 'round trips', 'mean wake ms',
+                                               'max wake ms')
+    for crashed in (True, False):
+        for contenders in args.contenders:
+            for aware in (False, True):
+                trips, wakes = 0, []
+                for _ in xrange(args.rounds):
+                    t, wake = run(aware, crashed, contenders, args.hold_timeout, args.latency)
+                    trips += t
+                    wakes.append(max(0, wake))
+                print '%-10s %11d %-14s %13.1f %14.1f %14.1f' % (
+                    'crashed' if crashed else 'releases', contenders, 'until expiry' if aware else 'blind backoff',
+                    float(trips) / args.rounds, sum(wakes) / len(wakes) * 1e3, max(wakes) * 1e3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Many threads in one process locking the same row, with and without `coalesce=True`.
+
+Uses the same simulated latency as :py:mod:`benchmarks.bench_contention`. Usage::
+
+    python -m benchmarks.bench_coalesce [threads] [seconds]
+"""
+import sys
+import threading
+import time
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.distributed.cassandra import CassandraDistributedRowLock, BusyLockException
+from padlock.distributed.retry_policy import DeadlinePolicy
+from padlock.tests.fake_cassandra import FakeColumnFamily
+from benchmarks.bench_contention import HOLD, LATENCY
+
+
+def run(coalesce, threads, seconds):
+    cf = FakeColumnFamily(latency=LATENCY)
+    counts = {'acquired': 0, 'failed': 0}
+    count_lock = threading.Lock()
+    policy = DeadlinePolicy(max_wait=1.0, base=0.002, cap=0.05)
+    stop = time.time() + seconds
+
+    def work():
+        while time.time() < stop:
+            lock = CassandraDistributedRowLock(None, cf, 'hot', backoff_policy=policy, coalesce=coalesce,
+                                               consistency_level=ConsistencyLevel.ONE)
+            try:
+                with lock:
+                    time.sleep(HOLD)
+                outcome = 'acquired'
+            except BusyLockException:
+                outcome = 'failed'
+            with count_lock:
+                counts[outcome] += 1
+
+    workers = [threading.Thread(target=work) for _ in xrange(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    acquired = float(max(counts['acquired'], 1))
+    round_trips = cf.stats['reads'] + cf.stats['writes']
+    return counts['acquired'] / float(seconds), counts['failed'] / float(seconds), round_trips / acquired
+
+
+def main(threads=32, seconds=3):
+    print '%d threads, %.1fms latency, %.1fms hold' % (threads, LATENCY * 1e3, HOLD * 1e3)
+    print '%-10s %14s %14s %22s' % ('coalesce', 'acquires/sec', 'gave up/sec', 'round trips/acquire')
+    for coalesce in (False, True):
+        rate, failed, round_trips = run(coalesce, threads, seconds)
+        print '%-10s %14.1f %14.1f %22.2f' % (coalesce, rate, failed, round_trips)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
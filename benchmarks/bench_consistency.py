@@ -0,0 +1,53 @@
+"""
+What the consistency level of each phase of the lock costs: one thread taking and releasing a lock over and over
+against the in-memory column family, whose three replicas each answer a round trip after `latency` plus up to `jitter`
+seconds - a request waits for as many of them as its consistency level needs. Reports the mean time to acquire
+and to release. Usage::
+
+    python -m benchmarks.bench_consistency [seconds] [latency] [jitter]
+"""
+import sys
+import time
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.distributed.cassandra import CassandraDistributedRowLock
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+ONE, QUORUM, ALL = ConsistencyLevel.ONE, ConsistencyLevel.QUORUM, ConsistencyLevel.ALL
+
+# (lock, verify, release)
+SETTINGS = [
+    (ONE, ONE, ONE),
+    (QUORUM, QUORUM, QUORUM),
+    (QUORUM, QUORUM, ONE),
+    (ONE, ALL, ONE),
+    (ALL, ALL, ALL),
+]
+
+
+def main(seconds=2.0, latency=0.001, jitter=0.002):
+    print '%.1fms latency + up to %.1fms jitter per replica, %.1fs per setting' % (latency * 1e3, jitter * 1e3, seconds)
+    print '%-8s %-8s %-8s %10s %12s %12s' % ('lock', 'verify', 'release', 'locks/sec', 'acquire ms', 'release ms')
+    names = ConsistencyLevel._VALUES_TO_NAMES
+    for lock_cl, verify_cl, release_cl in SETTINGS:
+        cf = FakeColumnFamily(latency=latency, jitter=jitter)
+        acquiring = releasing = 0.0
+        count = 0
+        stop = time.time() + seconds
+        while time.time() < stop:
+            lock = CassandraDistributedRowLock(None, cf, 'row', lock_consistency_level=lock_cl,
+                                               verify_consistency_level=verify_cl,
+                                               release_consistency_level=release_cl)
+            start = time.time()
+            lock.acquire()
+            acquired = time.time()
+            lock.release()
+            acquiring += acquired - start
+            releasing += time.time() - acquired
+            count += 1
+        print '%-8s %-8s %-8s %10.1f %12.3f %12.3f' % (names[lock_cl], names[verify_cl], names[release_cl],
+                                                       count / seconds, acquiring / count * 1e3,
+                                                       releasing / count * 1e3)
+
+
+if __name__ == '__main__':
+    main(*[float(a) for a in sys.argv[1:4]])
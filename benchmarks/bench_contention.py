@@ -0,0 +1,76 @@
+"""
+Lock throughput on a single hot row under contention, for each of the retry policies.
+
+Every thread loops acquiring the same row, holding it briefly and releasing it. Round trips go to an in-memory
+stand-in that sleeps to simulate network latency. Reports, per successful acquire, how many insert/read/remove cycles
+were wasted on attempts that found the row busy. Usage::
+
+    python -m benchmarks.bench_contention [threads] [seconds]
+"""
+import sys
+import threading
+import time
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.distributed.cassandra import CassandraDistributedRowLock, BusyLockException
+from padlock.distributed.retry_policy import FixedAttemptsPolicy, ExponentialBackoffPolicy, DeadlinePolicy
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+LATENCY = 0.001
+HOLD = 0.002
+
+
+# everything gives up after roughly a second, otherwise a livelocked policy would never finish
+POLICIES = [
+    ('tight loop', FixedAttemptsPolicy(attempts=250, delay=0)),
+    ('fixed 5ms', FixedAttemptsPolicy(attempts=100, delay=0.005)),
+    ('exponential, no jitter', ExponentialBackoffPolicy(base=0.002, cap=0.05, max_attempts=25, jitter=None)),
+    ('exponential, full jitter', ExponentialBackoffPolicy(base=0.002, cap=0.05, max_attempts=40)),
+    ('exponential, decorrelated', ExponentialBackoffPolicy(base=0.002, cap=0.05, max_attempts=25,
+                                                           jitter='decorrelated')),
+    ('deadline 1s, full jitter', DeadlinePolicy(max_wait=1.0, base=0.002, cap=0.05)),
+]
+
+
+def run(policy, threads, seconds):
+    cf = FakeColumnFamily(latency=LATENCY)
+    counts = {'acquired': 0, 'failed': 0}
+    count_lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def work():
+        while time.time() < stop:
+            lock = CassandraDistributedRowLock(None, cf, 'hot', backoff_policy=policy,
+                                               consistency_level=ConsistencyLevel.ONE)
+            try:
+                with lock:
+                    time.sleep(HOLD)
+                outcome = 'acquired'
+            except BusyLockException:
+                outcome = 'failed'
+            with count_lock:
+                counts[outcome] += 1
+
+    workers = [threading.Thread(target=work) for _ in xrange(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    # every attempt is exactly one read, successful or not
+    acquired = max(counts['acquired'], 1)
+    wasted = cf.stats['reads'] - counts['acquired']
+    return (counts['acquired'] / float(seconds), counts['failed'] / float(seconds), wasted / float(acquired),
+            cf.stats['writes'] / float(acquired))
+
+
+def main(threads=16, seconds=3):
+    print '%d threads, %.1fms latency, %.1fms hold' % (threads, LATENCY * 1e3, HOLD * 1e3)
+    print '%-28s %14s %14s %22s %16s' % ('policy', 'acquires/sec', 'gave up/sec', 'wasted cycles/acquire',
+                                         'writes/acquire')
+    for label, policy in POLICIES:
+        rate, failed, wasted, writes = run(policy, threads, seconds)
+        print '%-28s %14.1f %14.1f %22.2f %16.2f' % (label, rate, failed, wasted, writes)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
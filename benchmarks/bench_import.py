@@ -0,0 +1,44 @@
+"""
+How long does it take to ``import padlock`` and get hold of a lock class?
+
+Each measurement runs in a fresh interpreter, so nothing is shared between runs. Usage::
+
+    python -m benchmarks.bench_import [runs]
+"""
+import subprocess
+import sys
+
+
+SCENARIOS = [
+    ('baseline (python startup)', 'pass'),
+    ('import padlock', 'import padlock'),
+    ("import padlock; padlock.get('cassandra')", "import padlock; padlock.get('cassandra')"),
+    ('import padlock; padlock.load_zcml()', 'import padlock; padlock.load_zcml()'),
+]
+
+TEMPLATE = """
+import time
+_start = time.time()
+%s
+print time.time() - _start
+"""
+
+
+def measure(statement, runs):
+    timings = []
+    for _ in xrange(runs):
+        out = subprocess.check_output([sys.executable, '-c', TEMPLATE % statement])
+        timings.append(float(out.strip().splitlines()[-1]))
+    timings.sort()
+    return timings[len(timings) // 2], timings[0]
+
+
+def main(runs=20):
+    print '%-45s %12s %12s' % ('scenario', 'median (ms)', 'best (ms)')
+    for label, statement in SCENARIOS:
+        median, best = measure(statement, runs)
+        print '%-45s %12.2f %12.2f' % (label, median * 1e3, best * 1e3)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
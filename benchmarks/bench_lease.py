@@ -0,0 +1,68 @@
+"""
+Hot rows that only one process ever locks, with and without `lease_grace`: threads loop picking one of a few keys at
+random and locking it, against the in-memory column family (which adds `--latency` per round trip). With a lease, a
+released lock keeps its column for the next lock on the row in the process to take over, so most acquires and
+releases make no round trips at all. Usage::
+
+    python -m benchmarks.bench_lease --threads 4 --keys 2 --seconds 3
+"""
+import argparse
+import random
+import threading
+import time
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.exceptions import BusyLockException
+from padlock.distributed.cassandra import CassandraDistributedRowLock, release_leases
+from padlock.distributed.retry_policy import ExponentialBackoffPolicy
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+POLICY = ExponentialBackoffPolicy(base=0.0005, cap=0.005, max_attempts=50)
+
+
+def run(lease_grace, threads, keys, seconds, latency):
+    cf = FakeColumnFamily(latency=latency)
+    names = ['hot:%d' % i for i in xrange(keys)]
+    stop = time.time() + seconds
+    counts = []
+
+    def work():
+        acquired = 0
+        while time.time() < stop:
+            lock = CassandraDistributedRowLock(None, cf, random.choice(names), lease_grace=lease_grace,
+                                               value_format='binary', backoff_policy=POLICY,
+                                               consistency_level=ConsistencyLevel.ONE)
+            try:
+                with lock:
+                    acquired += 1
+            except BusyLockException:
+                pass
+        counts.append(acquired)
+
+    workers = [threading.Thread(target=work) for _ in xrange(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    release_leases()
+    acquired = sum(counts)
+    return acquired, float(cf.stats['reads'] + cf.stats['writes']) / max(acquired, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=4, help='threads locking (default: 4)')
+    parser.add_argument('--keys', type=int, default=2, help='hot rows (default: 2)')
+    parser.add_argument('--seconds', type=float, default=3.0, help='how long to run each case for')
+    parser.add_argument('--latency', type=float, default=0.001, help='seconds every round trip takes')
+    parser.add_argument('--lease-grace', type=float, default=0.05, help='seconds a lease is kept (default: 0.05)')
+    args = parser.parse_args()
+
+    print '%d threads, %d keys, %.1fms latency' % (args.threads, args.keys, args.latency * 1e3)
+    print '%-12s %14s %24s' % ('lease_grace', 'acquires/sec', 'round trips per acquire')
+    for lease_grace in (None, args.lease_grace):
+        acquired, trips = run(lease_grace, args.threads, args.keys, args.seconds, args.latency)
+        print '%-12s %14.1f %24.3f' % (lease_grace, acquired / args.seconds, trips)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Encoding and decoding lock column values, in the old text format and the binary one (with and without the holder),
+for a row with many lock columns - which is what verifying a lock on a busy row has to decode. Usage::
+
+    python -m benchmarks.bench_lock_values [columns] [repeat]
+"""
+import sys
+import timeit
+from padlock.distributed import lock_values
+
+EXPIRY = 1392166152000000L
+
+
+def main(columns=1000, repeat=200):
+    host, pid = lock_values.holder()
+    formats = [
+        ('text', lambda e: lock_values.encode_text(e)),
+        ('binary', lambda e: lock_values.encode(e)),
+        ('binary + holder', lambda e: lock_values.encode(e, host, pid)),
+    ]
+    print '%d columns per row, best of 3 x %d' % (columns, repeat)
+    print '%-16s %8s %18s %18s' % ('format', 'bytes', 'encode us/row', 'decode us/row')
+    for label, encode in formats:
+        expiries = [EXPIRY + i for i in xrange(columns)]
+        row = dict(('_lock_%d' % i, encode(e)) for i, e in enumerate(expiries))
+        enc = min(timeit.repeat(lambda: [encode(e) for e in expiries], number=repeat, repeat=3)) / repeat
+        dec = min(timeit.repeat(lambda: dict((k, lock_values.decode_expiry(v)) for k, v in row.iteritems()),
+                                number=repeat, repeat=3)) / repeat
+        print '%-16s %8d %18.1f %18.1f' % (label, len(encode(EXPIRY)), enc * 1e6, dec * 1e6)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,69 @@
+"""
+Retry-and-collide against queueing, on a single hot row. Every thread loops acquiring the row, holding it briefly
+and releasing it, using either the plain row lock with exponential backoff or the queued lock polling every couple of
+milliseconds. Reports throughput, writes per acquire (including the release), and how long acquiring took - the
+spread between p50 and max is how unfair the lock is. Usage::
+
+    python -m benchmarks.bench_queue [threads] [seconds]
+"""
+import sys
+import threading
+import time
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.exceptions import BusyLockException
+from padlock.distributed.cassandra import CassandraDistributedRowLock, CassandraDistributedQueuedLock
+from padlock.distributed.retry_policy import ExponentialBackoffPolicy, FixedAttemptsPolicy
+from padlock.metrics import Histogram
+from padlock.tests.fake_cassandra import FakeColumnFamily
+from benchmarks.bench_contention import HOLD, LATENCY
+
+LOCKS = [
+    ('row, exponential', CassandraDistributedRowLock, ExponentialBackoffPolicy(base=0.002, cap=0.05,
+                                                                               max_attempts=40)),
+    ('queued, 2ms polls', CassandraDistributedQueuedLock, FixedAttemptsPolicy(attempts=500, delay=0.002)),
+]
+
+
+def run(cls, policy, threads, seconds):
+    cf = FakeColumnFamily(latency=LATENCY)
+    waits = Histogram()
+    counts = {'acquired': 0, 'failed': 0}
+    count_lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def work():
+        while time.time() < stop:
+            lock = cls(None, cf, 'hot', backoff_policy=policy, consistency_level=ConsistencyLevel.ONE)
+            start = time.time()
+            try:
+                with lock:
+                    waits.record(time.time() - start)
+                    time.sleep(HOLD)
+                outcome = 'acquired'
+            except BusyLockException:
+                outcome = 'failed'
+            with count_lock:
+                counts[outcome] += 1
+
+    workers = [threading.Thread(target=work) for _ in xrange(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    acquired = float(max(counts['acquired'], 1))
+    summary = waits.summary()
+    return (counts['acquired'] / float(seconds), counts['failed'] / float(seconds), cf.stats['writes'] / acquired,
+            (summary['p50'] or 0) * 1e3, (summary['p99'] or 0) * 1e3, summary['max'] * 1e3)
+
+
+def main(threads=16, seconds=3):
+    print '%d threads, %.1fms latency, %.1fms hold' % (threads, LATENCY * 1e3, HOLD * 1e3)
+    print '%-20s %14s %12s %16s %10s %10s %10s' % ('lock', 'acquires/sec', 'gave up/sec', 'writes/acquire',
+                                                   'p50 ms', 'p99 ms', 'max ms')
+    for label, cls, policy in LOCKS:
+        print '%-20s %14.1f %12.1f %16.2f %10.1f %10.1f %10.1f' % ((label,) + run(cls, policy, threads, seconds))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
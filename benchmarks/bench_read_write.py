@@ -0,0 +1,64 @@
+"""
+A hot row that's mostly read: every thread loops locking the row, 95% of the time to read it, holding the lock for a
+while and releasing it. Compares taking the plain row lock every time with taking the read-write lock, shared for
+reads and exclusive for writes. Usage::
+
+    python -m benchmarks.bench_read_write [threads] [seconds]
+"""
+import random
+import sys
+import threading
+import time
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.exceptions import BusyLockException
+from padlock.distributed.cassandra import CassandraDistributedRowLock, CassandraDistributedReadWriteLock
+from padlock.distributed.retry_policy import ExponentialBackoffPolicy
+from padlock.tests.fake_cassandra import FakeColumnFamily
+from benchmarks.bench_contention import HOLD, LATENCY
+
+READS = 0.95
+
+
+def run(read_write, threads, seconds):
+    cf = FakeColumnFamily(latency=LATENCY)
+    policy = ExponentialBackoffPolicy(base=0.002, cap=0.05, max_attempts=40)
+    counts = {'read': 0, 'write': 0, 'failed': 0}
+    count_lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def work():
+        while time.time() < stop:
+            shared = random.random() < READS
+            kwargs = dict(backoff_policy=policy, consistency_level=ConsistencyLevel.ONE)
+            if read_write:
+                lock = CassandraDistributedReadWriteLock(None, cf, 'hot', shared=shared, **kwargs)
+            else:
+                lock = CassandraDistributedRowLock(None, cf, 'hot', **kwargs)
+            try:
+                with lock:
+                    time.sleep(HOLD)
+                outcome = 'read' if shared else 'write'
+            except BusyLockException:
+                outcome = 'failed'
+            with count_lock:
+                counts[outcome] += 1
+
+    workers = [threading.Thread(target=work) for _ in xrange(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    return counts['read'] / float(seconds), counts['write'] / float(seconds), counts['failed'] / float(seconds)
+
+
+def main(threads=16, seconds=3):
+    print '%d threads, %d%% reads, %.1fms latency, %.1fms hold' % (threads, READS * 100, LATENCY * 1e3, HOLD * 1e3)
+    print '%-12s %12s %12s %14s' % ('lock', 'reads/sec', 'writes/sec', 'gave up/sec')
+    for label, read_write in (('row', False), ('read-write', True)):
+        reads, writes, failed = run(read_write, threads, seconds)
+        print '%-12s %12.1f %12.1f %14.1f' % (label, reads, writes, failed)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
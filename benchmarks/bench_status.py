@@ -0,0 +1,41 @@
+"""
+Finding out which of N keys are locked: a lock per key calling `read_lock_columns` (a round trip per key) against
+:py:func:`padlock.distributed.status.lock_status` (a `multiget` per chunk of keys), with every round trip to the
+in-memory column family taking `latency` seconds. Usage::
+
+    python -m benchmarks.bench_status [keys] [latency]
+"""
+import sys
+import time
+from padlock.distributed import lock_values
+from padlock.distributed.cassandra import CassandraDistributedRowLock, utcnow
+from padlock.distributed.status import lock_status
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+
+def main(keys=10000, latency=0.001):
+    cf = FakeColumnFamily(latency=latency)
+    value = lock_values.encode(utcnow() + 60 * 10 ** 6)
+    names = ['key:%d' % i for i in xrange(keys)]
+    for name in names[::10]:
+        cf.rows[name] = {'_lock_holder': (value, None)}
+
+    print '%d keys (1 in 10 locked), %.1fms per round trip' % (keys, latency * 1e3)
+    print '%-20s %10s %10s %10s %8s' % ('method', 'seconds', 'reads', 'writes', 'locked')
+
+    cf.stats.clear()
+    start = time.time()
+    locked = sum(1 for name in names if CassandraDistributedRowLock(None, cf, name).read_lock_columns())
+    print '%-20s %10.2f %10d %10d %8d' % ('read_lock_columns', time.time() - start, cf.stats['reads'],
+                                          cf.stats['writes'], locked)
+
+    for chunk_size in (100, 500):
+        cf.stats.clear()
+        start = time.time()
+        locked = sum(1 for s in lock_status(cf, names, chunk_size=chunk_size).itervalues() if s.locked)
+        print '%-20s %10.2f %10d %10d %8d' % ('lock_status (%d)' % chunk_size, time.time() - start,
+                                              cf.stats['reads'], cf.stats['writes'], locked)
+
+
+if __name__ == '__main__':
+    main(*[f(a) for f, a in zip((int, float), sys.argv[1:3])])
@@ -0,0 +1,106 @@
+"""
+Throughput and latency of :py:class:`padlock.distributed.cassandra.CassandraDistributedRowLock` with N threads
+contending for M keys, against an in-memory stand-in for cassandra with simulated latency.
+
+Every thread loops picking a key at random, acquiring it, holding it for a while and releasing it. One line is printed
+for every combination of key and thread counts, so reading down the table for a given number of keys gives a
+contention curve. Columns are acquires and give ups per second, the p50/p99 time to acquire, round trips per
+successful acquire and how many times two threads held the same key at once (which only happens when writes take a
+while to become visible, see ``--replication-delay``). Usage::
+
+    python -m benchmarks.bench_throughput --threads 1,4,16,64 --keys 1,16 --latency 0.002 --jitter 0.001
+
+Only threads are supported - the stand-in lives in this process, so separate processes would each have their own.
+"""
+import argparse
+import random
+import threading
+import time
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock import registry
+from padlock.distributed.cassandra import CassandraDistributedRowLock, BusyLockException
+from padlock.distributed.retry_policy import IRetryPolicy
+from padlock.metrics import InMemoryLockObserver
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+
+def run(args, threads, keys):
+    cf = FakeColumnFamily(latency=args.latency, jitter=args.jitter, replication_delay=args.replication_delay)
+    observer = InMemoryLockObserver(key_prefix=lambda key: 'bench')
+    policy = registry.lookup(IRetryPolicy, args.policy)
+    names = ['bench:%d' % i for i in xrange(keys)]
+    holders = dict.fromkeys(names, 0)
+    counts = {'overlaps': 0}
+    count_lock = threading.Lock()
+    stop = time.time() + args.seconds
+
+    def work():
+        while time.time() < stop:
+            key = random.choice(names)
+            lock = CassandraDistributedRowLock(None, cf, key, backoff_policy=policy, observer=observer,
+                                               consistency_level=ConsistencyLevel.ONE)
+            try:
+                lock.acquire()
+            except BusyLockException:
+                continue
+            with count_lock:
+                if holders[key]:
+                    counts['overlaps'] += 1
+                holders[key] += 1
+            time.sleep(args.hold)
+            with count_lock:
+                holders[key] -= 1
+            lock.release()
+
+    workers = [threading.Thread(target=work) for _ in xrange(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    stats = observer.snapshot().get('bench', {})
+    acquired = stats.get('acquired', 0)
+    acquire = stats.get('acquire', {})
+    return {
+        'rate': acquired / args.seconds,
+        'failed': stats.get('failed', 0) / args.seconds,
+        'p50': (acquire.get('p50') or 0) * 1e3,
+        'p99': (acquire.get('p99') or 0) * 1e3,
+        'round_trips': (cf.stats['reads'] + cf.stats['writes']) / float(max(acquired, 1)),
+        'overlaps': counts['overlaps'],
+    }
+
+
+def counts(value):
+    return [int(v) for v in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--threads', type=counts, default=[1, 2, 4, 8, 16, 32],
+                        help='comma separated thread counts (default: 1,2,4,8,16,32)')
+    parser.add_argument('--keys', type=counts, default=[1, 16], help='comma separated key counts (default: 1,16)')
+    parser.add_argument('--seconds', type=float, default=3.0, help='how long to run each combination for')
+    parser.add_argument('--latency', type=float, default=0.001, help='seconds every round trip takes')
+    parser.add_argument('--jitter', type=float, default=0.0005, help='up to how many more seconds, at random')
+    parser.add_argument('--replication-delay', type=float, default=0.0,
+                        help='seconds before a write can be read')
+    parser.add_argument('--hold', type=float, default=0.002, help='seconds every lock is held for')
+    parser.add_argument('--policy', default='exponential_backoff', choices=registry.names(IRetryPolicy),
+                        help='the retry policy to use (default: exponential_backoff)')
+    args = parser.parse_args()
+
+    print '%.1fms latency (+%.1fms jitter), %.1fms replication delay, %.1fms hold, %s' % (
+        args.latency * 1e3, args.jitter * 1e3, args.replication_delay * 1e3, args.hold * 1e3, args.policy)
+    print '%6s %8s %14s %12s %10s %10s %20s %9s' % ('keys', 'threads', 'acquires/sec', 'gave up/sec', 'p50 ms',
+                                                    'p99 ms', 'round trips/acquire', 'overlaps')
+    for keys in args.keys:
+        for threads in args.threads:
+            res = run(args, threads, keys)
+            print '%6d %8d %14.1f %12.1f %10.2f %10.2f %20.2f %9d' % (
+                keys, threads, res['rate'], res['failed'], res['p50'], res['p99'], res['round_trips'],
+                res['overlaps'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+How many tombstones verifying the lock has to scan past on a hot row, with the default `delete` layout and the
+`overwrite` one: threads take turns locking the same row of the in-memory column family (which keeps tombstones
+until it's compacted, like cassandra does for `gc_grace_seconds`), and the tombstones scanned per read of the lock
+columns are reported as acquires pile up. Usage::
+
+    python -m benchmarks.bench_tombstones [threads] [acquires]
+"""
+import sys
+import threading
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.exceptions import BusyLockException
+from padlock.distributed.cassandra import CassandraDistributedRowLock
+from padlock.distributed.retry_policy import ExponentialBackoffPolicy
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+POLICY = ExponentialBackoffPolicy(base=0.0005, cap=0.005, max_attempts=100)
+
+
+def run(layout, threads, acquires, checkpoints):
+    cf = FakeColumnFamily()
+    done = [0]
+    lock = threading.Lock()
+    rows = []
+    last = {'reads': 0, 'tombstones_scanned': 0}
+
+    def work():
+        while True:
+            with lock:
+                if done[0] >= acquires:
+                    return
+            try:
+                with CassandraDistributedRowLock(None, cf, 'hot', layout=layout, backoff_policy=POLICY,
+                                                 consistency_level=ConsistencyLevel.ONE):
+                    pass
+            except BusyLockException:
+                continue
+            with lock:
+                done[0] += 1
+                if done[0] in checkpoints:
+                    reads = cf.stats['reads'] - last['reads']
+                    scanned = cf.stats['tombstones_scanned'] - last['tombstones_scanned']
+                    rows.append((done[0], float(scanned) / reads, len(cf.tombstones.get('hot', {})),
+                                 len(cf.rows.get('hot', {}))))
+                    last.update(cf.stats)
+
+    workers = [threading.Thread(target=work) for _ in xrange(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return rows
+
+
+def main(threads=4, acquires=2000):
+    checkpoints = set([100, 1000, acquires])
+    print '%d threads on one row' % threads
+    print '%-10s %10s %22s %12s %14s' % ('layout', 'acquires', 'tombstones per read', 'tombstones', 'live columns')
+    for layout in ('delete', 'overwrite'):
+        for acquired, per_read, tombstones, columns in run(layout, threads, acquires, checkpoints):
+            print '%-10s %10d %22.1f %12d %14d' % (layout, acquired, per_read, tombstones, columns)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,54 @@
+"""
+Acquire/release cost of the cassandra row lock on rows that also hold application data.
+
+Compares reading only the lock prefix slice against reading the whole row (how `read_lock_columns` used to work),
+using the in-memory stand-in so it runs without a cluster. The stand-in sorts the whole row on every slice, so the
+timings still grow with row width - `columns read` is what a real cluster would have to ship back. Usage::
+
+    python -m benchmarks.bench_wide_rows [iterations]
+"""
+import sys
+import time
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.distributed.cassandra import CassandraDistributedRowLock, NotFoundException
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+
+class FullRowLock(CassandraDistributedRowLock):
+    """
+    The old behaviour: fetch every column on the row (filtered afterwards, the old code treated data columns as locks).
+    """
+    def read_lock_columns(self):
+        res = {}
+        try:
+            cols = self.column_family.get(self.key, column_count=1e9)
+        except NotFoundException:
+            cols = {}
+        for k, v in cols.iteritems():
+            if k.startswith(self.prefix):
+                res[k] = self.read_timeout_value(v)
+        return res
+
+
+def run(lock_class, width, iterations):
+    cf = FakeColumnFamily()
+    cf.insert('row', dict(('data%08d' % i, 'x' * 64) for i in xrange(width)))
+    cf.stats.clear()
+    start = time.time()
+    for _ in xrange(iterations):
+        with lock_class(None, cf, 'row', consistency_level=ConsistencyLevel.ONE):
+            pass
+    elapsed = time.time() - start
+    return elapsed / iterations, cf.stats['columns_read'] / float(iterations)
+
+
+def main(iterations=200):
+    print '%10s %-14s %16s %16s' % ('row width', 'read', 'acquire (us)', 'columns read')
+    for width in (0, 100, 1000, 10000):
+        for label, lock_class in (('whole row', FullRowLock), ('lock prefix', CassandraDistributedRowLock)):
+            per_acquire, cols = run(lock_class, width, iterations)
+            print '%10d %-14s %16.1f %16.1f' % (width, label, per_acquire * 1e6, cols)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -1,17 +1,21 @@
 import sys
-from zope.configuration.config import ConfigurationMachine
-from zope.configuration import xmlconfig
 from zope.interface import Interface
-from zope.component import getUtility
+from padlock import registry
 
 
 class ILock(Interface):
     """
     Your average, run of the mill, generic lock interface.
     """
-    def acquire(self):
+    def acquire(self, blocking=None, timeout=None):
         """
-        Acquires the lock.
+        Acquires the lock. Called without arguments, it retries as the lock's retry policy allows and raises
+        :py:class:`padlock.exceptions.BusyLockException` if the lock can't be had. Given `blocking` and/or `timeout` it
+        works like `threading.Lock.acquire` instead, returning whether the lock was acquired: a single attempt if
+        `blocking` is `False`, otherwise as many as fit in `timeout` seconds (as long as it takes if `timeout` is
+        `None` or `-1`).
+
+        :rtype: bool
         """
 
     def release(self):
@@ -29,17 +33,67 @@ class ILock(Interface):
         The exit functionality for context managers (catches exceptions, releases the lock and whatnot)
         """
 
+
+class IAsyncLock(Interface):
+    """
+    The :py:class:`ILock` of the asyncio world: :py:meth:`acquire` and :py:meth:`release` are coroutines, so waiting
+    for a lock doesn't block the event loop::
+
+        yield From(lock.acquire())
+        try:
+            yield From(do_some_stuff())
+        finally:
+            yield From(lock.release())
+    """
+    def acquire(self):
+        """
+        A coroutine that acquires the lock.
+        """
+
+    def release(self):
+        """
+        A coroutine that releases the lock.
+        """
+
+
+# the built in backends - nothing is imported until the first padlock.get() asking for it
+registry.register(ILock, 'cassandra', 'padlock.distributed.cassandra.CassandraDistributedRowLock')
+registry.register(ILock, 'cassandra_multi', 'padlock.distributed.cassandra.CassandraDistributedMultiRowLock')
+registry.register(ILock, 'cassandra_rw', 'padlock.distributed.cassandra.CassandraDistributedReadWriteLock')
+registry.register(ILock, 'cassandra_semaphore', 'padlock.distributed.cassandra.CassandraDistributedSemaphore')
+registry.register(ILock, 'cassandra_queued', 'padlock.distributed.cassandra.CassandraDistributedQueuedLock')
+registry.register(ILock, 'memory', 'padlock.local.memory.MemoryLock')
+registry.register(ILock, 'file', 'padlock.local.file.FileLock')
+registry.register(ILock, 'sqlite', 'padlock.local.sqlite.SQLiteLock')
+registry.register(ILock, 'sqlite_multi', 'padlock.local.sqlite.SQLiteMultiLock')
+registry.register(IAsyncLock, 'cassandra', 'padlock.distributed.cassandra_async.AsyncCassandraDistributedRowLock')
+
+
 def load_zcml(package_name='padlock', spec='configure.zcml'):
+    """
+    Load a ZCML configuration file. This is entirely optional, the built in backends are available without it, but
+    it's useful if you want to register (or override) locks and retry policies using ZCML. Once called, utilities
+    registered with zope take precedence over the built in ones.
+    """
+    from zope.configuration.config import ConfigurationMachine
+    from zope.configuration import xmlconfig
     context = ConfigurationMachine()
     xmlconfig.registerCommonDirectives(context)
     __import__(package_name)
     package = sys.modules[package_name]
     xmlconfig.file(spec, package, context=context)
+    registry.prefer_zope()
 
-load_zcml()
 
 def get(name):
     """
     Get a named lock class. You must provide initialization values to the lock class returned.
     """
-    return getUtility(ILock, name)
+    return registry.lookup(ILock, name)
+
+
+def get_async(name):
+    """
+    Get a named :py:class:`IAsyncLock` class. Like :py:func:`get`, you must provide initialization values.
+    """
+    return registry.lookup(IAsyncLock, name)
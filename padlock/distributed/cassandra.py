@@ -16,12 +16,21 @@ specific to your implementation.
 """
 
 import calendar
+import collections
 import datetime
+import math
+import random
+import threading
+import time
+import uuid
 from zope.interface import  implements
-from zope.component import getUtility
 from time_uuid import TimeUUID
-from padlock import ILock
-from padlock.distributed.retry_policy import IRetryPolicy
+from padlock import ILock, registry
+from padlock.exceptions import BusyLockException, StaleLockException, LostLockException
+from padlock.distributed import lock_values
+from padlock.distributed.retry_policy import IRetryPolicy, acquire_policy, retry_delay
+from padlock.metrics import ILockObserver
+from padlock.local.table import LocalLockTable
 
 try:
     from pycassa import ConsistencyLevel, ColumnFamily, NotFoundException
@@ -48,17 +57,98 @@ _cf_args = [
     'timestamp'
 ]
 
+# appended to a lock prefix to get the end of the column slice holding every lock column - astyanax uses the same
+# (u'\uffff'), utf-8 encoded so it's valid for both `BytesType` and `UTF8Type` comparators
+_PREFIX_END = u'\uffff'.encode('utf-8')
 
-class BusyLockException(Exception):
+# turns for rows locked with coalesce=True, see CassandraDistributedRowLock.acquire_local()
+_local_locks = LocalLockTable()
+
+# lock ids that aren't in use by any lock in this process, to be used again by locks with layout='overwrite'
+_spare_lock_ids = collections.deque()
+
+# rows held by locks with reentrant=True: {(row, owner): [the lock whose column is on the row, hold count]}
+_reentrant_holds = {}
+_reentrant_guard = threading.Lock()
+
+# lock columns kept by locks with lease_grace set, once released: {row: the lock that released it}
+_leases = {}
+_lease_guard = threading.Lock()
+# notified when a lease that lapses sooner than the reaper expects is kept
+_lease_kept = threading.Condition(_lease_guard)
+# the thread giving up the leases that lapse, started along with the first lease
+_lease_reaper = None
+
+
+def utcnow():
+    """
+    The current time, as microseconds from the unix epoch (Jan 1 1970 UTC) - the unit lock expiries are written in.
+
+    :rtype: long
+    """
+    d = datetime.datetime.utcnow()
+    return long(calendar.timegm(d.timetuple())*1e6) + long(d.microsecond)
+
+
+def iter_lock_columns(column_family, key, prefix, page_size, first_page=None, stats=None, **get_kwargs):
+    """
+    Yields the raw `(name, value)` lock columns (those starting with `prefix`) of a row, reading them `page_size` at a
+    time. Any other keyword arguments are passed on to `column_family.get()`.
+
+    :param first_page: The first page of columns, if it has already been read (by a `multiget`, for instance)
+    :type first_page: dict
+    :param stats: Counts the `reads` made, if given
+    :type stats: collections.Counter
     """
-    Raised when a lock is already taken on this row.
+    start, finish = prefix, prefix + _PREFIX_END
+    cols = first_page
+    while True:
+        if cols is None:
+            if stats is not None:
+                stats['reads'] += 1
+            try:
+                cols = column_family.get(key, column_start=start, column_finish=finish, column_count=page_size,
+                                         **get_kwargs)
+            except NotFoundException:
+                return
+        for k, v in cols.iteritems():
+            # slice starts are inclusive, so every page after the first repeats the last column we saw
+            if k != start or start == prefix:
+                yield k, v
+        if len(cols) < page_size:
+            return
+        start, cols = k, None
+
+
+def release_leases(manager=None):
     """
+    Give up every lease kept by the locks of this process (see `lease_grace` in
+    :py:class:`CassandraDistributedRowLock`), or only those of the locks created by `manager`, rather than leaving
+    them to lapse. One write per lease.
+
+    :param manager: Only give up the leases of locks created by this :py:class:`padlock.distributed.manager.LockManager`
+    """
+    with _lease_guard:
+        leases = [l for l in _leases.itervalues() if manager is None or l.manager is manager]
+        for l in leases:
+            del _leases[l.local_key()]
+    for l in leases:
+        l.drop_lease()
 
 
-class StaleLockException(Exception):
+def lock_id_order(lock_id):
     """
-    Raised old, stale locks exist on a row and we don't want them to have existed.
+    What lock ids are sorted by, when the order matters: by time if they're version 1 UUIDs (like the default
+    TimeUUIDs), after all the UUIDs by name otherwise.
     """
+    try:
+        u = uuid.UUID(lock_id)
+    except ValueError:
+        return (1, 0, lock_id)
+    if u.version != 1:
+        return (1, 0, lock_id)
+    return (0, u.time, u.bytes)
+
 
 # This is pretty much directly lifted from the excellent Astynax cassandra clibrary from Netflix
 #
@@ -83,37 +173,102 @@ class CassandraDistributedRowLock(object):
     A lock that is implemented in a row of a Cassandra column family. It's good to use this type of lock when you want
     to lock a single row in cassandra for some purpose in a scenario where there will not be a lot of lock contention.
 
-    Shamelessly lifted from: Netflix's `Astynax library <https://github.com/Netflix/astyanax>`_. Take a `look <https://github.com/Netflix/astyanax/blob/master/src/main/java/com/netflix/astyanax/recipes/locks/ColumnPrefixDistributedRowLock.java>`_ at the implementation (in Java).
+    Shamelessly lifted from: Netflix's `Astynax library <https://github.com/Netflix/astyanax>`_. Take a
+    `look <https://github.com/Netflix/astyanax/blob/master/src/main/java/com/netflix/astyanax/recipes/locks/ColumnPrefixDistributedRowLock.java>`_
+    at the implementation (in Java).
 
     Importantly, note that this in no way a transaction for a cassandra row!
 
     :param pool: A pycassa ConnectionPool. It will be used to facilitate communication with cassandra.
     :type pool: pycassa.pool.ConnectionPool
-    :param column_family: Either a `string` (which will then be made into a `pycassa.column_family.ColumnFamily` instance) or
-        an already configured instance of `ColumnFamily` (which will be used directly).
+    :param column_family: Either a `string` (which will then be made into a `pycassa.column_family.ColumnFamily`
+        instance) or an already configured instance of `ColumnFamily` (which will be used directly).
     :type column_family: string
     :param key: The row key for this lock. The lock can co-exist with other columns on an existing row if desired.
     :type key: string
 
     The following paramters are optional and all come with defaults:
 
+    :param consistency_level: The consistency level of every read and write the lock makes. Defaults to
+        `LOCAL_QUORUM`
+    :param lock_consistency_level: The consistency level of the writes taking (and renewing) the lock. Defaults to
+        `consistency_level`
+    :param verify_consistency_level: The consistency level of the reads verifying the lock. Defaults to
+        `consistency_level`
+    :param release_consistency_level: The consistency level of the writes removing our lock column and stale ones.
+        Defaults to `consistency_level`. The lock is only safe if the lock writes and verify reads together cover
+        more than the replication factor (eg: both at `QUORUM`), but the release can often be weaker: a release that
+        hasn't reached every replica yet only makes others wait, at worst until the lock expires.
     :param prefix: The column prefix. Defaults to `_lock_`
     :type prefix: str
-    :param lock_id: A unique string, should probably be a UUIDv1 if provided at all. Defaults to a UUIDv1 provided by `time-uuid <http://github.com/samuraisam/time_uuid>`_
+    :param lock_id: A unique string, should probably be a UUIDv1 if provided at all. Defaults to a UUIDv1 provided by
+        `time-uuid <http://github.com/samuraisam/time_uuid>`_
     :type lock_id: str
     :param fail_on_stale_lock: Whether or not to fail when stale locks are found. Otherwise they'll just be cleaned up.
     :type fail_on_stale_lock: bool
-    :param timeout: How long to wait until the lock is considered stale. You should set this to as much time as you think the work will take using the lock.
+    :param timeout: How long to wait until the lock is considered stale. You should set this to as much time as you
+        think the work will take using the lock.
     :type timeout: float
-    :param ttl: How many seconds until cassandra will automatically clean up stale locks. It must be greater than `timeout`.
+    :param ttl: How many seconds until cassandra will automatically clean up stale locks. It must be greater than
+        `timeout`.
     :type ttl: float
-    :param backoff_policy: a :py:class:`padlock.distributed.retry_policy.IRetryPolicy` instance. Governs the retry policy of acquiring the lock.
+    :param backoff_policy: a :py:class:`padlock.distributed.retry_policy.IRetryPolicy` instance. Governs the retry
+        policy of acquiring the lock.
     :type backoff_policy: IRetryPolicy
     :param allow_retry: Whether or not to allow retry. Defaults to `True`
     :type allow_retry: bool
+    :param page_size: How many lock columns to read per request when verifying the lock. Defaults to `100`
+    :type page_size: int
+    :param value_format: How lock columns are written, ``'text'`` (the default, which every version of padlock reads)
+        or ``'binary'``, which records the holder. Either is read, but only switch to binary once nothing reading the
+        row is older than the binary format, see :py:mod:`padlock.distributed.lock_values`.
+    :type value_format: str
+    :param record_holder: Whether binary lock columns record the host and process holding the lock. Defaults to `True`
+    :type record_holder: bool
+    :param renew_interval: If set, a background thread calls :py:meth:`renew` this often (in seconds) while the lock
+        is held, so `timeout` only needs to cover a missed renewal or two rather than all of the work. Must be less than
+        `timeout`. Defaults to `None`, no renewal.
+    :type renew_interval: float
+    :param on_lost: Called with the lock if the background renewal finds out the lock was lost.
+    :type on_lost: callable
+    :param observer: Told about round trips, attempts, busy and stale locks and hold times. Defaults to the
+        :py:class:`padlock.metrics.ILockObserver` named `default`, which ignores everything.
+    :type observer: padlock.metrics.ILockObserver
+    :param coalesce: Whether threads in this process locking the same row should take turns locally, so that only one
+        of them at a time goes to cassandra for the lock, rather than all of them colliding and retrying there.
+        Waiting for a turn is bounded by the `backoff_policy`, just like retrying in cassandra. Defaults to `False`
+    :type coalesce: bool
+    :param manager: The :py:class:`padlock.distributed.manager.LockManager` that created the lock, if any. It's told
+        when the lock is acquired and released.
+    :type manager: padlock.distributed.manager.LockManager
+    :param layout: How lock columns are gotten rid of. ``'delete'`` (the default) removes them, which leaves a tombstone
+        behind for every lock ever taken on the row, and every read of the lock columns has to scan past them until
+        they're compacted away - on a busy row, that can make verifying the lock orders of magnitude slower.
+        ``'overwrite'`` writes a released marker over them instead (a negative expiry, see
+        :py:mod:`padlock.distributed.lock_values`), without a TTL, and locks without a `lock_id` of their own borrow
+        one from the ids this process's locks have released, so the same few columns are written over and over
+        and no tombstones are left at all, unless a holder dies and its column's `ttl` runs out. Every lock on a row
+        must understand released markers before any of them uses `overwrite`.
+    :type layout: str
+    :param lease_grace: If set, a released lock keeps its column on the row for up to this many seconds, so that the
+        next lock on the row in this process (with `lease_grace` set too) can take it over without a round trip.
+        Lock columns are then marked as releasable (see :py:mod:`padlock.distributed.lock_values`): a lock in another
+        process that finds one in its way asks for it with a revoke column, ``<prefix>revoke:<lock_id>``. A lease that's
+        still in use once the grace period has passed reads the row when it's released, and is given up if it was
+        asked for or written again (which starts another grace period) if it wasn't. A lease that isn't taken over in
+        time is given up by the :py:class:`LeaseReaper`, one thread for the whole process. A lock taken over holds for
+        at least `timeout` less `lease_grace`, so the grace period should be well short of the `timeout`. Needs the
+        ``'binary'`` `value_format`. Defaults to `None`, locks are released right away
+    :type lease_grace: float
+    :param reentrant: Whether the thread holding the lock can lock the row again, like a `threading.RLock`. Nested
+        acquires, with this lock or any other reentrant lock of the same kind on the same row and prefix, are counted
+        in this process and make no round trips; the lock column is only removed once every one of them has been
+        released. Defaults to `False`
+    :type reentrant: bool
 
     You can also provide the following keyword arguments which will be passed directly to the `ColumnFamily` constructor
-    if you didn't provide the instance yourself:
+    if you didn't provide the instance yourself (the lock's own reads and writes use the consistency levels above
+    rather than the column family's defaults):
 
         * **read_consistency_level**
         * **write_consistency_level**
@@ -129,68 +284,568 @@ class CassandraDistributedRowLock(object):
         * **buffer_size**
         * **column_bufer_size**
         * **timestamp**
+
+    Each lock counts the work it does in `stats`, a `collections.Counter` of `reads` and `writes` (round trips),
+    `writes_skipped` (releases that had nothing left to remove), `stale_folded` (writes that also removed stale
+    lock columns), `reentered` (nested acquires of a `reentrant` lock), `leased` (acquires that took over a lease),
+    `lease_renewed` and `lease_revoked` (leases written again, or given up because they were asked for, on release)
+    and `revokes` (writes asking for leases).
     """
 
     implements(ILock)
 
+    REVOKE = 'revoke:'
+
     def __init__(self, pool, column_family, key, **kwargs):
         self.pool = pool
-        if isinstance(column_family, ColumnFamily):
-            self.column_family = column_family
-        else:
+        if isinstance(column_family, basestring):
             cf_kwargs = {k: kwargs.get(k) for k in _cf_args if k in kwargs}
             self.column_family = ColumnFamily(self.pool, column_family, **cf_kwargs)
+        else:
+            self.column_family = column_family
         self.key = key
         self.consistency_level = kwargs.get('consistency_level', ConsistencyLevel.LOCAL_QUORUM)
+        self.lock_consistency_level = kwargs.get('lock_consistency_level', self.consistency_level)
+        self.verify_consistency_level = kwargs.get('verify_consistency_level', self.consistency_level)
+        self.release_consistency_level = kwargs.get('release_consistency_level', self.consistency_level)
         self.prefix = kwargs.get('prefix', '_lock_')
-        self.lock_id = kwargs.get('lock_id', str(TimeUUID.with_utcnow()))
+        self.layout = kwargs.get('layout', 'delete')
+        if self.layout not in ('delete', 'overwrite'):
+            raise ValueError("Unknown layout {!r}, must be 'delete' or 'overwrite'".format(self.layout))
+        self.lock_id = kwargs.get('lock_id')
+        self.borrowed_lock_id = False
+        if self.lock_id is None:
+            if self.layout == 'overwrite':
+                self.borrow_lock_id()
+            else:
+                self.lock_id = str(TimeUUID.with_utcnow())
         self.fail_on_stale_lock = kwargs.get('fail_on_stale_lock', False)
         self.timeout = kwargs.get('timeout', 60.0)  # seconds
         self.ttl = kwargs.get('ttl', None)
-        self.backoff_policy = kwargs.get('backoff_policy', getUtility(IRetryPolicy, 'run_once'))
+        self.backoff_policy = kwargs.get('backoff_policy')
+        if self.backoff_policy is None:
+            self.backoff_policy = registry.lookup(IRetryPolicy, 'run_once')
         self.allow_retry = kwargs.get('allow_retry', True)
+        self.page_size = kwargs.get('page_size', 100)
+        self.value_format = kwargs.get('value_format', 'text')
+        if self.value_format not in ('binary', 'text'):
+            raise ValueError("Unknown value_format {!r}, must be 'binary' or 'text'".format(self.value_format))
+        self.record_holder = kwargs.get('record_holder', True)
+        self.renew_interval = kwargs.get('renew_interval', None)
+        self.on_lost = kwargs.get('on_lost', None)
+        self.coalesce = kwargs.get('coalesce', False)
+        self.reentrant = kwargs.get('reentrant', False)
+        self.lease_grace = kwargs.get('lease_grace', None)
+        if self.lease_grace is not None:
+            if self.value_format != 'binary':
+                raise ValueError("lease_grace needs the binary value_format, to mark lock columns as releasable")
+            if self.layout != 'delete':
+                raise ValueError("lease_grace can't be used with the overwrite layout")
+            if not self.record_holder:
+                raise ValueError("lease_grace needs record_holder, for other locks to tell whose lease it is")
+        self.observer = kwargs.get('observer')
+        if self.observer is None:
+            self.observer = registry.lookup(ILockObserver, 'default')
+        self.manager = kwargs.get('manager')
+        self.observed_key = key
+        self.acquire_time = None
         self.locks_to_delete = set()
         self.lock_column = None
+        self.lost = False
+        self.renewer = None
+        self.local_held = False
+        self.busy_until = None
+        self.reentrant_key = None
+        self.reentrant_depth = 0
+        self.leased_at = None
+        self.lease_expiry = None
+        self.releasable_columns = set()
+        self.revoked = set()
+        self.stats = collections.Counter()
 
-    def acquire(self):
+    def acquire(self, blocking=None, timeout=None):
         """
         Acquire the lock on this row. It will then read immediatly from cassandra, potentially retrying, potentially
         sleeping the executing thread.
+
+        Called without arguments, it retries as the `backoff_policy` allows and raises :py:class:`BusyLockException`
+        if the row is still locked. Given `blocking` and/or `timeout`, it returns whether the lock was acquired
+        instead, like `threading.Lock.acquire`: a single attempt if `blocking` is `False`, otherwise exponential
+        backoff for up to `timeout` seconds, or for as long as it takes (see
+        :py:func:`padlock.distributed.retry_policy.acquire_policy`).
+
+        Either way, a wait that would last past the expiry of the lock column that was in the way (as read while
+        verifying the lock) is cut short, so the next attempt comes just as that column goes stale rather than
+        whenever the backoff happens to end. See :py:class:`HolderExpiryPolicy`.
+
+        If the lock is `reentrant` and this thread already holds the row, it's acquired again right away, without
+        a round trip. So is a lock with `lease_grace` set, if this process kept a lease on the row.
+
+        :rtype: bool
         """
-        if self.ttl is not None:
-            if self.timeout > self.ttl:
-                raise ValueError("Timeout {} must be less than TTL {}".format(self.timeout, self.ttl))
+        if self.reentrant:
+            owner = threading.current_thread().ident
+            if self.reenter(owner):
+                return True
+        retry = HolderExpiryPolicy(self, acquire_policy(self.backoff_policy, blocking, timeout))
+        try:
+            self.acquire_with(retry)
+        except BusyLockException:
+            if blocking is None and timeout is None:
+                raise
+            return False
+        if self.reentrant:
+            self.held_by(owner)
+        return True
+
+    def acquire_with(self, retry):
+        """
+        Used internally - acquires the lock, retrying as the `retry` policy allows, or raises
+        :py:class:`BusyLockException`.
+        """
+        self.prepare_acquire()
 
-        retry = self.backoff_policy.duplicate()
         retry_count = 0
+        start = time.time()
 
-        while True:
+        if self.coalesce:
+            self.acquire_local(retry)
+
+        try:
+            while True:
+                try:
+                    self.try_acquire()
+                    self.observer.acquired(self.observed_key, retry_count + 1, time.time() - start)
+                    return
+                except BusyLockException, e:
+                    if not retry.allow_retry():
+                        raise e
+                    retry_count += 1
+        except:
+            self.give_up(retry_count + 1, start)
+            raise
+
+    def prepare_acquire(self):
+        """
+        Used internally - checks the lock's settings and borrows a lock id, if need be, before the first attempt.
+        """
+        self.check_timeouts()
+        self.busy_until = None
+        if self.lock_id is None:
+            self.borrow_lock_id()
+
+    def try_acquire(self):
+        """
+        Used internally - makes one attempt at the lock, taking over a lease if there's one, or rolls the attempt back
+        and raises :py:class:`BusyLockException`.
+        """
+        self.busy_until = None
+        try:
+            if not self.take_lease():
+                self.attempt()
+        except BusyLockException:
+            self.rollback()
+            raise
+
+    def give_up(self, attempts, start):
+        """
+        Used internally - cleans up after an acquire that failed after `attempts` attempts, started at `start`.
+        """
+        self.release_local()
+        self.return_lock_id()
+        self.observer.failed(self.observed_key, attempts, time.time() - start)
+
+    def take_lease(self):
+        """
+        Used internally - takes over the lock column this process kept on the row when it was last released, if
+        `lease_grace` is set and there's a lease that's still good, instead of an :py:meth:`attempt`. Returns whether
+        it did. No round trips, unless the lease lapsed before the :py:class:`LeaseReaper` got to it, in which case
+        it's given up.
+
+        :rtype: bool
+        """
+        if self.lease_grace is None:
+            return False
+        with _lease_guard:
+            lease = _leases.pop(self.local_key(), None)
+        if lease is None:
+            return False
+        if self.utcnow() - lease.leased_at >= long(self.lease_grace * 1e6):
+            lease.drop_lease()
+            return False
+
+        self.check_timeouts()
+        lock_id, lock_column, leased_at = lease.lock_id, lease.lock_column, lease.leased_at
+        stale = set(lease.locks_to_delete)
+        lease.lock_column = None
+        lease.locks_to_delete.clear()
+        self.lock_id, self.lock_column, self.leased_at = lock_id, lock_column, leased_at
+        self.locks_to_delete.update(stale)
+        self.stats['leased'] += 1
+        self.hold()
+        return True
+
+    def keep_lease(self):
+        """
+        Used internally - called on release, keeps our lock column as a lease for the next lock on the row in this
+        process to take over, if `lease_grace` is set. While the lease is fresh that's all there is to it. Once
+        `lease_grace` has passed since the row was last read, it's read again (and the lease written again, unless
+        it was lost or revoked), two round trips. Returns whether the lease was kept, if not the lock column must be
+        removed as usual.
+
+        :rtype: bool
+        """
+        if self.lease_grace is None or self.lock_column is None or self.lost:
+            return False
+        grace = long(self.lease_grace * 1e6)
+        now = self.utcnow()
+        if now - self.leased_at >= grace:
+            cols = self.read_lock_columns()
+            revoke = self.revoke_column(self.lock_column)
+            if revoke in cols:
+                self.locks_to_delete.add(revoke)
+                self.stats['lease_revoked'] += 1
+                return False
             try:
-                cur_time = self.utcnow()
+                self.check_held(self.key, cols, now)
+            except LostLockException:
+                return False
+            self.live_lock_columns(self.key, cols, now, self.locks_to_delete)
+            mutation = self.batch()
+            self.fill_stale_mutation(mutation)
+            self.fill_lock_mutation(mutation, now, self.ttl)
+            self.send(mutation, 'renew')
+            self.leased_at = now
+            self.stats['lease_renewed'] += 1
 
-                mutation = self.column_family.batch()
-                self.fill_lock_mutation(mutation, cur_time, self.ttl)
-                mutation.send()
+        with _lease_guard:
+            self.lease_expiry = self.leased_at + grace
+            _leases[self.local_key()] = self
+            reaper = LeaseReaper.running()
+            if reaper.due is None or self.lease_expiry < reaper.due:
+                _lease_kept.notify()
+        return True
 
-                self.verify_lock(cur_time)
+    def drop_lease(self):
+        """
+        Used internally - removes the lock column of a lease that's being given up, along with the revoke column asking
+        for it, in case there is one. One round trip.
+        """
+        self.locks_to_delete.add(self.revoke_column(self.lock_column))
+        self.rollback()
 
-                self.acquire_time = self.utcnow()
+    def revoke(self, key, columns):
+        """
+        Used internally - asks the holders of those of the lock `columns` in our way on row `key` that are releasable
+        to give them up, with a revoke column each, all in one write. Holders are only asked once, and locks in this
+        process are never asked, see :py:meth:`read_lock_value`.
+        """
+        wanted = [c for c in columns if c in self.releasable_columns and (key, c) not in self.revoked]
+        if not wanted:
+            return
+        value = self.generate_timeout_value(self.utcnow() + long(self.timeout * 1e6))
+        # nobody may be left to remove it, so it goes away by itself even without a `ttl`
+        ttl = self.ttl if self.ttl is not None else max(1, int(math.ceil(self.timeout)))
+        mutation = self.batch()
+        mutation.insert(key, dict((self.revoke_column(c), value) for c in wanted), ttl=ttl)
+        self.send(mutation, 'insert')
+        self.revoked.update((key, c) for c in wanted)
+        self.stats['revokes'] += 1
 
-                return
-            except BusyLockException, e:
-                self.release()
-                if not retry.allow_retry():
-                    raise e
-                retry_count += 1
+    def revoke_column(self, column):
+        """
+        Used internally - the name of the column asking the holder of lock `column` to give it up.
+        """
+        return self.prefix + self.REVOKE + column[len(self.prefix):]
+
+    def is_revoke_column(self, column):
+        return column.startswith(self.prefix + self.REVOKE)
+
+    def reenter(self, owner):
+        """
+        Used internally - takes another hold on the row, without a round trip, if `owner` (a thread, or a task)
+        already holds it with a reentrant lock like this one. Returns whether it did.
+
+        :rtype: bool
+        """
+        key = self.reentrant_hold_key(owner)
+        with _reentrant_guard:
+            held = _reentrant_holds.get(key)
+            if held is None:
+                return False
+            held[1] += 1
+        self.reentrant_key = key
+        self.reentrant_depth += 1
+        self.stats['reentered'] += 1
+        return True
+
+    def held_by(self, owner):
+        """
+        Used internally - called once the lock has been acquired on behalf of `owner`, so that the owner's nested
+        acquires are counted rather than sent to cassandra.
+        """
+        key = self.reentrant_hold_key(owner)
+        with _reentrant_guard:
+            _reentrant_holds[key] = [self, 1]
+        self.reentrant_key = key
+        self.reentrant_depth = 1
+
+    def leave(self):
+        """
+        Used internally - gives up one of our holds on a reentrant row. Returns the lock whose column must now be
+        removed, once the last hold is given up, or `None` while the row is still held.
+        """
+        key = self.reentrant_key
+        self.reentrant_depth -= 1
+        if not self.reentrant_depth:
+            self.reentrant_key = None
+        with _reentrant_guard:
+            held = _reentrant_holds.get(key)
+            if held is None:
+                # released from under us, by LockManager.release_all()
+                return None
+            held[1] -= 1
+            if held[1]:
+                return None
+            del _reentrant_holds[key]
+            return held[0]
+
+    def forget_holds(self):
+        """
+        Used internally - stops counting holds on the row, when the lock is released without going through
+        :py:meth:`release`.
+        """
+        if self.reentrant_key is not None:
+            with _reentrant_guard:
+                held = _reentrant_holds.get(self.reentrant_key)
+                if held is not None and held[0] is self:
+                    del _reentrant_holds[self.reentrant_key]
+            self.reentrant_key = None
+            self.reentrant_depth = 0
+
+    def reentrant_hold_key(self, owner):
+        """
+        Used internally - identifies the holds of `owner` on the row among the reentrant locks in this process. Only
+        locks of the same kind share their holds.
+        """
+        return (self.__class__,) + self.local_key() + (owner,)
+
+    def acquire_local(self, retry):
+        """
+        Used internally - waits for this row's turn in this process, bounded by the `retry` policy, raising
+        :py:class:`BusyLockException` if the policy runs out before another thread in this process is done with it.
+        No round trips to cassandra are made.
+        """
+        key = self.local_key()
+        blocking, timeout = False, None
+        while not _local_locks.acquire(key, blocking, timeout):
+            timeout = retry_delay(retry)
+            if timeout is None:
+                raise BusyLockException("Lock already acquired in this process for row '{}'".format(self.key))
+            blocking = True
+        self.local_held = True
+
+    def release_local(self):
+        """
+        Used internally - gives up this row's turn in this process, if we have it.
+        """
+        if self.local_held:
+            self.local_held = False
+            _local_locks.release(self.local_key())
+
+    def borrow_lock_id(self):
+        """
+        Used internally - takes a lock id that no other lock in this process is using, for the `overwrite` layout.
+        """
+        try:
+            self.lock_id = _spare_lock_ids.pop()
+        except IndexError:
+            self.lock_id = str(TimeUUID.with_utcnow())
+        self.borrowed_lock_id = True
+
+    def return_lock_id(self):
+        """
+        Used internally - gives a borrowed lock id back once our lock column is gone, for the next lock to use.
+        """
+        if self.borrowed_lock_id and self.lock_column is None:
+            _spare_lock_ids.append(self.lock_id)
+            self.lock_id = None
+            self.borrowed_lock_id = False
+
+    def local_key(self):
+        """
+        Used internally - identifies the row (and lock prefix) among the locks in this process.
+        """
+        return (getattr(self.pool, 'keyspace', None), getattr(self.column_family, 'column_family', None),
+                self.key, self.prefix)
+
+    def check_timeouts(self):
+        """
+        Used internally - raises a `ValueError` if `timeout`, `ttl` and `renew_interval` don't make sense together.
+        """
+        if self.ttl is not None:
+            if self.timeout > self.ttl:
+                raise ValueError("Timeout {} must be less than TTL {}".format(self.timeout, self.ttl))
+        if self.renew_interval is not None:
+            if self.renew_interval >= self.timeout:
+                raise ValueError("Renew interval {} must be less than timeout {}".format(self.renew_interval,
+                                                                                         self.timeout))
+        if self.lease_grace is not None:
+            if self.lease_grace >= self.timeout:
+                raise ValueError("Lease grace {} must be less than timeout {}".format(self.lease_grace, self.timeout))
+
+    def attempt(self):
+        """
+        Used internally - a single attempt at taking the lock: writes our lock column and reads the row back to verify
+        it. Raises :py:class:`BusyLockException` if someone else holds the lock, in which case our column must be
+        removed again with :py:meth:`rollback`.
+        """
+        cur_time = self.utcnow()
+        self.write_lock_column(cur_time)
+        self.timed_verify_lock(cur_time)
+        self.leased_at = cur_time
+        self.hold()
+
+    def timed_verify_lock(self, cur_time):
+        """
+        Used internally - :py:meth:`verify_lock`, letting the observer know how long the read took.
+        """
+        start = time.time()
+        try:
+            self.verify_lock(cur_time)
+        finally:
+            self.observer.round_trip('verify', self.observed_key, time.time() - start)
+
+    def hold(self):
+        """
+        Used internally - called once the lock has been verified: notes when it was acquired and starts renewing it.
+        """
+        self.acquire_time = self.utcnow()
+        self.lost = False
+
+        if self.renew_interval is not None:
+            self.renewer = LockRenewer(self, self.renew_interval, self.on_lost)
+            self.renewer.start()
+        if self.manager is not None:
+            self.manager.holding(self)
+
+    def write_lock_column(self, cur_time):
+        """
+        Used internally - writes our lock column, expiring `timeout` after `cur_time`. One round trip.
+        """
+        mutation = self.batch()
+        self.fill_lock_mutation(mutation, cur_time, self.ttl)
+        self.send(mutation, 'insert')
 
     def release(self):
         """
-        Allow this row to be locked by something (or someone) else. Performs a single write (round trip) to Cassandra.
+        Allow this row to be locked by something (or someone) else. Performs a single write (round trip) to Cassandra,
+        unless there's nothing left to remove (when the last attempt at acquiring already cleaned up after itself, say).
+
+        A `reentrant` lock only removes its column once every hold on the row has been released, until then nothing
+        is written. With `lease_grace` set, the column is kept for the next lock on the row in this process to take
+        over instead, see :py:meth:`keep_lease`.
+        """
+        if self.reentrant_depth:
+            lock = self.leave()
+            if lock is not None:
+                lock.release_held()
+            return
+        self.release_held()
+
+    def release_held(self):
+        """
+        Used internally - releases the lock, whatever holds a `reentrant` lock may have on the row.
+        """
+        self.unhold()
+        try:
+            if not self.keep_lease():
+                self.rollback()
+        finally:
+            self.release_local()
+            self.return_lock_id()
+
+    def unhold(self):
+        """
+        Used internally - the counterpart of :py:meth:`hold`, called when releasing the lock before its columns are
+        removed: stops renewing it and lets the observer know how long it was held.
+        """
+        if self.renewer is not None:
+            self.renewer.stop()
+            self.renewer = None
+        if self.acquire_time is not None:
+            self.observer.released(self.observed_key, (self.utcnow() - self.acquire_time) / 1e6)
+            self.acquire_time = None
+        if self.manager is not None:
+            self.manager.released(self)
+
+    def rollback(self):
+        """
+        Used internally - removes our lock column, and any stale ones we came across, from the row. Skipped entirely if
+        there is nothing to remove.
         """
-        if not len(self.locks_to_delete) or self.lock_column is not None:
-            mutation = self.column_family.batch()
+        if len(self.locks_to_delete) or self.lock_column is not None:
+            mutation = self.batch()
             self.fill_release_mutation(mutation, False)
-            mutation.send()
+            self.send(mutation, 'release')
+        else:
+            self.stats['writes_skipped'] += 1
+
+    def send(self, mutation, phase):
+        """
+        Used internally - sends a mutation, one round trip, letting the observer know how long it took. The `release`
+        phase is written at the `release_consistency_level`, the others (`insert`, `renew`) at the
+        `lock_consistency_level`.
+        """
+        if phase == 'release':
+            level = self.release_consistency_level
+        else:
+            level = self.lock_consistency_level
+        self.stats['writes'] += 1
+        start = time.time()
+        try:
+            mutation.send(write_consistency_level=level)
+        finally:
+            self.observer.round_trip(phase, self.observed_key, time.time() - start)
+
+    def renew(self):
+        """
+        Extend a held lock by another `timeout` seconds (and refresh its TTL), so long running work can use a short
+        timeout. Performs a read and a write, which also removes any stale lock columns found while acquiring the lock
+        rather than leaving them for :py:meth:`release`. If the lock has been lost in the meantime - our column
+        expired, or was removed by someone cleaning up stale locks - nothing is written, :py:attr:`lost` is set and
+        :py:class:`LostLockException` is raised.
+        """
+        if self.lock_column is None:
+            raise ValueError("renew() called without holding the lock")
+
+        cur_time = self.utcnow()
+        start = time.time()
+        try:
+            self.verify_held(cur_time)
+        finally:
+            self.observer.round_trip('renew', self.observed_key, time.time() - start)
+
+        mutation = self.batch()
+        self.fill_stale_mutation(mutation)
+        self.fill_lock_mutation(mutation, cur_time, self.ttl)
+        self.send(mutation, 'renew')
+
+    def verify_held(self, cur_time):
+        """
+        Used internally - reads the row, raising :py:class:`LostLockException` unless our lock column is still live.
+        """
+        self.check_held(self.key, self.read_lock_columns(), cur_time)
+
+    def check_held(self, key, cols, cur_time):
+        """
+        Used internally - raises :py:class:`LostLockException` (and sets :py:attr:`lost`) unless our lock column is
+        among the lock columns `cols` read from a row, and isn't stale.
+        """
+        expiry = cols.get(self.lock_column)
+        if expiry is None or (expiry != 0 and cur_time > expiry):
+            self.lost = True
+            raise LostLockException("Lock on row '{}' with lock column '{}' was lost".format(key, self.lock_column))
 
     def verify_lock(self, cur_time):
         """
@@ -206,34 +861,105 @@ class CassandraDistributedRowLock(object):
         if self.lock_column is None:
             raise ValueError("verify_lock() called without attempting to take the lock")
 
-        cols = self.read_lock_columns()
-        for k, v in cols.iteritems():
-            if v != 0 and cur_time > v:
-                if self.fail_on_stale_lock:
-                    raise StaleLockException("Stale lock on row '{}'. Manual cleanup required.".format(self.key))
-                self.locks_to_delete.add(k)
-            elif k != self.lock_column:
-                raise BusyLockException("Lock already acquired for row '{}' with lock column '{}'".format(self.key, k))
+        self.check_lock_columns(self.key, self.read_lock_columns(), cur_time, self.locks_to_delete)
+
+    def check_lock_columns(self, key, cols, cur_time, stale):
+        """
+        Used internally - checks the lock columns read from a row, raising :py:class:`BusyLockException` if any of
+        them (other than our own) is still live. Stale columns are added to `stale`, to be removed on release.
+
+        :param cols: The lock columns of the row, as returned by :py:meth:`read_lock_columns`
+        :type cols: dict
+        :param stale: Where to collect the names of stale lock columns
+        :type stale: set
+        """
+        conflicting = [k for k in self.live_lock_columns(key, cols, cur_time, stale) if self.conflicts(k)]
+        if conflicting:
+            self.note_busy(cols, conflicting)
+            self.revoke(key, conflicting)
+            self.observer.busy(key)
+            raise BusyLockException("Lock already acquired for row '{}' with lock column '{}'".format(
+                key, conflicting[0]))
+
+    def note_busy(self, cols, columns, first=False):
+        """
+        Used internally - remembers, in :py:attr:`busy_until`, when the lock `columns` in our way expire (their
+        expiries are in `cols`): when the last of them does or, if `first` is set, when the first does. `0` if they
+        never do.
+        """
+        expiries = [cols[k] for k in columns]
+        if first:
+            expiries = [e for e in expiries if e != 0] or [0]
+            self.busy_until = min(expiries)
+        else:
+            self.busy_until = 0 if 0 in expiries else max(expiries)
+
+    def live_lock_columns(self, key, cols, cur_time, stale):
+        """
+        Used internally - the names of the lock columns in `cols` that aren't stale, ours included. Stale ones are
+        added to `stale`, or raise :py:class:`StaleLockException` if `fail_on_stale_lock` is set. Expired revoke
+        columns are added to `stale` too.
+
+        :rtype: list
+        """
+        live = []
+        found = 0
+        try:
+            for k, v in cols.iteritems():
+                if v < 0:
+                    # released, in the overwrite layout
+                    continue
+                if self.is_revoke_column(k):
+                    # not a lock, but removed along with the stale ones once it's expired
+                    if v != 0 and cur_time > v:
+                        stale.add(k)
+                    continue
+                if v != 0 and cur_time > v:
+                    found += 1
+                    if self.fail_on_stale_lock:
+                        raise StaleLockException("Stale lock on row '{}'. Manual cleanup required.".format(key))
+                    stale.add(k)
+                else:
+                    live.append(k)
+        finally:
+            if found:
+                self.observer.stale(key, found)
+        return live
+
+    def conflicts(self, column):
+        """
+        Used internally - whether someone else's live lock column, `column`, keeps us from holding the lock. Every
+        column but our own does.
+        """
+        return column != self.lock_column
 
     def read_lock_columns(self):
         """
-        Return all columns in this row with the timeout value deserialized into a long
+        Return all lock columns (those starting with :py:attr:`prefix`) in this row with the timeout value deserialized
+        into a long. Only the lock columns are read, so any other data on the row is left alone.
 
         :rtype: dict
         """
         res = {}
-        try:
-            cols = self.column_family.get(self.key, column_count=1e9)
-        except NotFoundException:
-            cols = {}
-        for k, v in cols.iteritems():
-            res[k] = self.read_timeout_value(v)
+        for k, v in self.iter_lock_columns(self.key):
+            res[k] = self.read_lock_value(k, v)
         return res
 
+    def iter_lock_columns(self, key, first_page=None):
+        """
+        Used internally - yields the raw `(name, value)` lock columns for a row, reading them :py:attr:`page_size` at
+        a time from the slice of columns starting with :py:attr:`prefix`.
+
+        :param first_page: The first page of columns, if it has already been read (by a `multiget`, for instance)
+        :type first_page: dict
+        """
+        return iter_lock_columns(self.column_family, key, self.prefix, self.page_size, first_page, self.stats,
+                                 read_consistency_level=self.verify_consistency_level)
+
     def release_locks(self, force=False):
         """
         Clean up after ourselves. Removes all lock columns (everything returned by :py:meth:`read_lock_columns`)
-        that is not stale.
+        that are stale. To clean up every row of a column family, see :py:mod:`padlock.distributed.sweeper`.
 
         :param force: Remove even non-stale locks
         """
@@ -242,9 +968,12 @@ class CassandraDistributedRowLock(object):
         now = self.utcnow()
         for k, v in locks.iteritems():
             if force or (v > 0 and v < now):
-                cols_to_remove.add(k)
+                cols_to_remove.append(k)
 
-        self.column_family.batch().remove(self.key, cols_to_remove).send()
+        if cols_to_remove:
+            mutation = self.batch()
+            self.fill_removal(mutation, self.key, cols_to_remove)
+            self.send(mutation, 'release')
 
         return locks
 
@@ -254,42 +983,97 @@ class CassandraDistributedRowLock(object):
 
         :rtype: long
         """
-        d = datetime.datetime.utcnow()
-        return long(calendar.timegm(d.timetuple())*1e6) + long(d.microsecond)
+        return utcnow()
+
+    def batch(self):
+        """
+        Used internally - a new `pycassa.batch.CfMutator` for this lock's column family. Nothing is sent until
+        `send()` is called, so everything queued on it goes out in a single round trip.
+        """
+        return self.column_family.batch(queue_size=0)
 
     def fill_lock_mutation(self, mutation, time, ttl):
         """
         Used internally - fills out `pycassa.batch.CfMutator` with the necessary steps to acquire the lock.
         """
+        column, value = self.lock_column_value(time)
+
+        kw = {}
+        if ttl is not None:
+            kw['ttl'] = ttl
+
+        mutation.insert(self.key, {column: value}, **kw)
+
+        return column
+
+    def lock_column_value(self, time):
+        """
+        Used internally - the name of our lock column and the (serialized) value to write to it when locking at `time`.
+
+        :rtype: tuple
+        """
         if self.lock_column is not None:
-            if self.lock_column != (self.prefix + self.lock_id):
+            if self.lock_column != self.column_name():
                 raise ValueError("Can't change prefix or lock_id after acquiring the lock")
         else:
-            self.lock_column = self.prefix + self.lock_id
+            self.lock_column = self.column_name()
         if time is None:
             timeout_val = 0
         else:
             timeout_val = time + long(self.timeout * 1e6) # convert self.timeout to microseconds
 
-        kw = {}
-        if ttl is not None:
-            kw['ttl'] = ttl
-
-        mutation.insert(self.key, {self.lock_column: self.generate_timeout_value(timeout_val)}, **kw)
+        return self.lock_column, self.generate_timeout_value(timeout_val)
 
-        return self.lock_column
+    def column_name(self):
+        """
+        Used internally - the name of our lock column.
+        """
+        return self.prefix + self.lock_id
 
     def generate_timeout_value(self, timeout_val):
         """
-        Used internally - serialize a timeout value (a `long`) to be inserted into a cassandra as a `string`.
+        Used internally - serialize a timeout value (a `long`) to be inserted into a cassandra as a `string`, in the
+        `value_format` (see :py:mod:`padlock.distributed.lock_values`).
+        """
+        if self.value_format == 'text':
+            return lock_values.encode_text(timeout_val)
+        flags = 0 if self.lease_grace is None else lock_values.RELEASABLE
+        if self.record_holder:
+            host, pid = lock_values.holder()
+            return lock_values.encode(timeout_val, host, pid, flags)
+        return lock_values.encode(timeout_val, flags=flags)
+
+    def read_lock_value(self, column, value):
+        """
+        Used internally - the expiry in the `value` of lock `column`, noting whether the column is releasable by
+        someone we could ask: leases held by this process are taken over here rather than given up.
         """
-        return repr(timeout_val)
+        if lock_values.decode_flags(value) & lock_values.RELEASABLE:
+            expiry, host, pid = lock_values.decode(value)
+            if (host, pid) == lock_values.holder():
+                self.releasable_columns.discard(column)
+            else:
+                self.releasable_columns.add(column)
+            return expiry
+        self.releasable_columns.discard(column)
+        return self.read_timeout_value(value)
 
     def read_timeout_value(self, col):
         """
-        Used internally - deserialize a timeout value that was stored in cassandra as a `string` back into a `long`.
+        Used internally - deserialize a timeout value that was stored in cassandra, in either format, back into a
+        `long`.
         """
-        return long(col)
+        return lock_values.decode_expiry(col)
+
+    def read_lock_holders(self):
+        """
+        Who holds (or is trying to take, or held and never released) the lock on this row, for the benefit of
+        operators: ``{column name: (expiry, host, pid)}``. The host and pid are `None` for locks that didn't record
+        them.
+
+        :rtype: dict
+        """
+        return dict((k, lock_values.decode(v)) for k, v in self.iter_lock_columns(self.key))
 
     def fill_release_mutation(self, mutation, exclude_current_lock=False):
         """
@@ -303,14 +1087,525 @@ class CassandraDistributedRowLock(object):
         if not exclude_current_lock and self.lock_column is not None:
             cols_to_delete.append(self.lock_column)
 
-        mutation.remove(self.key, cols_to_delete)
+        if cols_to_delete:
+            self.fill_removal(mutation, self.key, cols_to_delete)
 
         self.locks_to_delete.clear()
         self.lock_column = None
 
+    def fill_removal(self, mutation, key, columns):
+        """
+        Used internally - adds getting rid of lock `columns` on row `key` to a mutation: removing them or, in the
+        `overwrite` layout, writing a released marker over them.
+        """
+        if self.layout == 'overwrite':
+            value = self.generate_timeout_value(-self.utcnow())
+            mutation.insert(key, dict((c, value) for c in columns))
+        else:
+            mutation.remove(key, columns)
+
+    def fill_stale_mutation(self, mutation):
+        """
+        Used internally - adds the removal of the stale lock columns we've come across to a mutation that's going out
+        anyway, rather than leaving them for :py:meth:`release`. Our own lock column is left alone.
+        """
+        if len(self.locks_to_delete):
+            self.stats['stale_folded'] += 1
+            lock_column = self.lock_column
+            self.fill_release_mutation(mutation, exclude_current_lock=True)
+            self.lock_column = lock_column
+
     def __enter__(self):
         self.acquire()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.release()
+
+
+class HolderExpiryPolicy(object):
+    """
+    The retry policy a lock acquires with: waits as long as `policy` says, but no longer than until the lock column
+    that was in the way on the last attempt (:py:attr:`CassandraDistributedRowLock.busy_until`) expires, plus a few
+    milliseconds at random so that contenders waiting for the same column don't all come back at once.
+
+    :param lock: The lock being acquired
+    :type lock: CassandraDistributedRowLock
+    :param policy: The policy deciding how long to wait otherwise, and how many attempts to make
+    :type policy: padlock.distributed.retry_policy.IRetryPolicy
+    """
+
+    implements(IRetryPolicy)
+
+    # seconds past the expiry to wake up at, at most
+    spread = 0.005
+
+    def __init__(self, lock, policy):
+        self.lock = lock
+        self.policy = policy
+
+    def duplicate(self):
+        return self.__class__(self.lock, self.policy.duplicate())
+
+    def next_delay(self):
+        delay = retry_delay(self.policy)
+        if delay is None:
+            return None
+        expiry = self.lock.busy_until
+        if expiry:
+            until = (expiry - self.lock.utcnow()) / 1e6 + random.uniform(0.001, self.spread)
+            delay = max(0, min(delay, until))
+        return delay
+
+    def allow_retry(self):
+        delay = self.next_delay()
+        if delay is None:
+            return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+
+class LockRenewer(threading.Thread):
+    """
+    A daemon thread that keeps a lock alive by calling its `renew()` method every `interval` seconds until it's
+    stopped, or until the lock turns out to have been lost, in which case `on_lost` is called with the lock. Failed
+    renewals (a timeout talking to cassandra, say) are simply retried at the next interval.
+    """
+
+    def __init__(self, lock, interval, on_lost=None):
+        super(LockRenewer, self).__init__(name='padlock-renewer')
+        self.daemon = True
+        self.lock = lock
+        self.interval = interval
+        self.on_lost = on_lost
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.lock.renew()
+            except LostLockException:
+                if self.on_lost is not None:
+                    self.on_lost(self.lock)
+                return
+            except Exception:
+                pass
+
+    def stop(self):
+        """
+        Stop renewing, waiting for a renewal that's in progress to finish.
+        """
+        self.stopped.set()
+        if self is not threading.current_thread():
+            self.join()
+
+
+class LeaseReaper(threading.Thread):
+    """
+    A daemon thread that gives up the leases kept in this process (see `lease_grace` in
+    :py:class:`CassandraDistributedRowLock`) once their grace period has passed without another lock taking them over.
+    There's one for the whole process, rather than a timer per lease.
+    """
+
+    def __init__(self):
+        super(LeaseReaper, self).__init__(name='padlock-lease-reaper')
+        self.daemon = True
+        # when the next lease lapses (microseconds since the epoch), or `None` while there isn't one
+        self.due = None
+
+    @classmethod
+    def running(cls):
+        """
+        Used internally - the reaper, started if it isn't running yet (or any more, in a forked process). Must be
+        called with the lease guard held.
+
+        :rtype: LeaseReaper
+        """
+        global _lease_reaper
+        if _lease_reaper is None or not _lease_reaper.is_alive():
+            _lease_reaper = cls()
+            _lease_reaper.start()
+        return _lease_reaper
+
+    def run(self):
+        while True:
+            with _lease_guard:
+                now = utcnow()
+                lapsed = [l for l in _leases.itervalues() if l.lease_expiry <= now]
+                for l in lapsed:
+                    del _leases[l.local_key()]
+                if not lapsed:
+                    self.due = min([l.lease_expiry for l in _leases.itervalues()] or [None])
+                    _lease_kept.wait(None if self.due is None else (self.due - now) / 1e6)
+                    continue
+                # looks again as soon as these are given up
+                self.due = now
+            for l in lapsed:
+                try:
+                    l.drop_lease()
+                except Exception:
+                    # the column expires by itself
+                    pass
+
+
+class CassandraDistributedMultiRowLock(CassandraDistributedRowLock):
+    """
+    Locks many rows of a column family at once, all or nothing. Rather than a round trip (or three) per row, the lock
+    columns for every row are written in a single batch mutation and verified with a single `multiget`. If any row is
+    already locked, every column that was written is removed again in one batch.
+
+    It takes all the same parameters as :py:class:`CassandraDistributedRowLock`, except that it takes a list of row
+    keys rather than a single one:
+
+    :param keys: The row keys to lock
+    :type keys: list
+    """
+
+    def __init__(self, pool, column_family, keys, **kwargs):
+        super(CassandraDistributedMultiRowLock, self).__init__(pool, column_family, None, **kwargs)
+        if self.coalesce:
+            raise ValueError("coalesce isn't supported when locking many rows at once")
+        if self.reentrant:
+            raise ValueError("reentrant isn't supported when locking many rows at once")
+        if self.lease_grace is not None:
+            raise ValueError("lease_grace isn't supported when locking many rows at once")
+        self.keys = []
+        for key in keys:
+            if key not in self.keys:
+                self.keys.append(key)
+        self.observed_key = self.keys[0] if self.keys else None
+        self.locks_to_delete = {}
+
+    def verify_held(self, cur_time):
+        rows = self.read_lock_columns()
+        for key in self.keys:
+            self.check_held(key, rows.get(key, {}), cur_time)
+
+    def verify_lock(self, cur_time):
+        """
+        Like :py:meth:`CassandraDistributedRowLock.verify_lock`, but for every row at once.
+        """
+        if self.lock_column is None:
+            raise ValueError("verify_lock() called without attempting to take the lock")
+
+        rows = self.read_lock_columns()
+        for key in self.keys:
+            stale = set()
+            try:
+                self.check_lock_columns(key, rows.get(key, {}), cur_time, stale)
+            finally:
+                if stale:
+                    self.locks_to_delete.setdefault(key, set()).update(stale)
+
+    def read_lock_columns(self):
+        """
+        Return the lock columns of every row, keyed by row key, with the timeout values deserialized into longs. Rows
+        without any lock columns are left out.
+
+        :rtype: dict
+        """
+        res = {}
+        self.stats['reads'] += 1
+        pages = self.column_family.multiget(self.keys, column_start=self.prefix,
+                                            column_finish=self.prefix + _PREFIX_END, column_count=self.page_size,
+                                            read_consistency_level=self.verify_consistency_level)
+        for key, cols in pages.iteritems():
+            res[key] = {}
+            for k, v in self.iter_lock_columns(key, cols):
+                res[key][k] = self.read_lock_value(k, v)
+        return res
+
+    def release_locks(self, force=False):
+        """
+        Removes stale lock columns (or all of them, if `force` is set) from every row, in a single batch.
+        """
+        rows = self.read_lock_columns()
+        mutation = self.batch()
+        now = self.utcnow()
+        for key, locks in rows.iteritems():
+            cols_to_remove = [k for k, v in locks.iteritems() if force or (v > 0 and v < now)]
+            if cols_to_remove:
+                self.fill_removal(mutation, key, cols_to_remove)
+        self.send(mutation, 'release')
+
+        return rows
+
+    def fill_lock_mutation(self, mutation, time, ttl):
+        column, value = self.lock_column_value(time)
+
+        kw = {}
+        if ttl is not None:
+            kw['ttl'] = ttl
+
+        for key in self.keys:
+            mutation.insert(key, {column: value}, **kw)
+
+        return column
+
+    def fill_release_mutation(self, mutation, exclude_current_lock=False):
+        for key in self.keys:
+            cols_to_delete = list(self.locks_to_delete.get(key, ()))
+            if not exclude_current_lock and self.lock_column is not None:
+                cols_to_delete.append(self.lock_column)
+            if cols_to_delete:
+                self.fill_removal(mutation, key, cols_to_delete)
+
+        self.locks_to_delete.clear()
+        self.lock_column = None
+
+
+class CassandraDistributedReadWriteLock(CassandraDistributedRowLock):
+    """
+    A shared/exclusive lock on a row: any number of readers can hold it at once, a writer only holds it alone. Readers
+    and writers are told apart by their lock columns, ``<prefix>r:<lock_id>`` and ``<prefix>w:<lock_id>``, so a reader
+    only backs off from writers (and from plain :py:class:`CassandraDistributedRowLock` s on the same row and prefix,
+    which count as writers), while writers back off from everyone. Stale locks, TTLs, retries and renewal all work just
+    like they do for :py:class:`CassandraDistributedRowLock`.
+
+    Writers don't get priority, so a row that always has a reader on it never lets a writer in.
+
+    It takes all the same parameters as :py:class:`CassandraDistributedRowLock`, along with:
+
+    :param shared: Whether to lock the row for reading (`True`) or writing. Defaults to `False`
+    :type shared: bool
+    """
+
+    READER = 'r:'
+    WRITER = 'w:'
+
+    def __init__(self, pool, column_family, key, **kwargs):
+        super(CassandraDistributedReadWriteLock, self).__init__(pool, column_family, key, **kwargs)
+        self.shared = kwargs.get('shared', False)
+        if self.shared and self.coalesce:
+            raise ValueError("coalesce would keep readers in this process from sharing the lock")
+        if self.lease_grace is not None:
+            raise ValueError("lease_grace isn't supported by the read/write lock")
+
+    def column_name(self):
+        return self.prefix + (self.READER if self.shared else self.WRITER) + self.lock_id
+
+    def reentrant_hold_key(self, owner):
+        # a reader holding the row doesn't let the same thread in as a writer
+        return super(CassandraDistributedReadWriteLock, self).reentrant_hold_key(owner) + (self.shared,)
+
+    def conflicts(self, column):
+        if column == self.lock_column:
+            return False
+        return not (self.shared and column.startswith(self.prefix + self.READER))
+
+
+class CassandraDistributedSemaphore(CassandraDistributedRowLock):
+    """
+    A counting semaphore on a row: up to `permits` holders at once, each with a lock column of its own, just like
+    :py:class:`CassandraDistributedRowLock` (which is a semaphore with a single permit). A holder gets in when, after
+    writing its column, it reads back no more than `permits` live lock columns.
+
+    When there are more, the live columns are put in order of their `lock_id` s (by time, for the default TimeUUIDs)
+    and only the ones that didn't make the first `permits` are removed again. The others keep their place and simply
+    read the row again when the `backoff_policy` allows, so contenders that collide don't all back off and collide
+    again, and the earliest of them get in first. A column's `timeout` counts from when it was written, so a column
+    kept in place is written again once half of it has passed, and one that went stale anyway is written again before
+    it can count.
+
+    It takes all the same parameters as :py:class:`CassandraDistributedRowLock`, along with:
+
+    :param permits: How many holders the row allows at once. Defaults to `1`
+    :type permits: int
+    """
+
+    def __init__(self, pool, column_family, key, **kwargs):
+        super(CassandraDistributedSemaphore, self).__init__(pool, column_family, key, **kwargs)
+        if self.layout != 'delete':
+            raise ValueError("The overwrite layout reuses lock ids, which would upset the order of the contenders")
+        self.permits = kwargs.get('permits', 1)
+        if self.permits < 1:
+            raise ValueError("A semaphore needs at least one permit, not {}".format(self.permits))
+        if self.coalesce:
+            raise ValueError("coalesce would keep holders in this process from sharing the permits")
+        if self.lease_grace is not None:
+            raise ValueError("lease_grace isn't supported by the semaphore")
+        self.waiting = False
+        self.written_at = None
+
+    def acquire_with(self, retry):
+        try:
+            super(CassandraDistributedSemaphore, self).acquire_with(retry)
+        except:
+            if self.waiting:
+                self.waiting = False
+                self.rollback()
+            raise
+
+    def write_lock_column(self, cur_time):
+        # waiting in place our column is already there, it's only written again once half its timeout has passed
+        if not self.waiting or time.time() - self.written_at > self.timeout / 2.0:
+            super(CassandraDistributedSemaphore, self).write_lock_column(cur_time)
+            self.written_at = time.time()
+
+    def check_lock_columns(self, key, cols, cur_time, stale):
+        live = self.live_lock_columns(key, cols, cur_time, stale)
+        if self.lock_column not in live:
+            # our column went stale while we waited (or was removed as stale by someone else), so it can't be counted:
+            # it's written again - in the same place, the order only depends on the lock_id - and read back next time
+            stale.discard(self.lock_column)
+            self.waiting = True
+            self.written_at = 0
+            self.write_lock_column(self.utcnow())
+            self.observer.busy(key)
+            raise BusyLockException("Lost our place waiting for a permit for row '{}'".format(key))
+        self.waiting = False
+        if len(live) > self.permits:
+            live.sort(key=self.order)
+            self.waiting = self.lock_column in live[:self.permits]
+            # a permit frees up as soon as any of the others is done
+            others = [k for k in live if k != self.lock_column]
+            self.note_busy(cols, others, first=True)
+            self.revoke(key, others)
+            self.observer.busy(key)
+            raise BusyLockException("All {} permits already acquired for row '{}'".format(self.permits, key))
+
+    def order(self, column):
+        """
+        Used internally - what lock columns are sorted by, see :py:func:`lock_id_order`.
+        """
+        return lock_id_order(column[len(self.prefix):])
+
+    def rollback(self):
+        if not self.waiting:
+            super(CassandraDistributedSemaphore, self).rollback()
+
+    def unhold(self):
+        self.waiting = False
+        super(CassandraDistributedSemaphore, self).unhold()
+
+
+class CassandraDistributedQueuedLock(CassandraDistributedRowLock):
+    """
+    A fair row lock: contenders queue up rather than repeatedly colliding, backing off and trying again.
+
+    When the row is free the lock is taken just like :py:class:`CassandraDistributedRowLock` takes it. Otherwise a
+    contender joins the queue by writing a waiting column, ``<prefix>q:<lock_id>``, and leaves it in place while it
+    reads the row again whenever the `backoff_policy` allows. Once its waiting column is the earliest one in the queue
+    (ordered by `lock_id`, see :py:func:`lock_id_order`) and nobody holds the lock, it swaps the waiting column for an
+    ordinary lock column and verifies it like the row lock does. If it turns out somebody else got there at the same
+    time it goes back to waiting, in the same place.
+
+    Waiting costs one write to join the queue and one read per poll, rather than a write, a read and a removal per
+    attempt, and the lock is handed out in the order the contenders' lock ids were created. Waiting columns expire
+    after `timeout` like lock columns do, and are written again after half of it has passed. Plain row locks on the
+    same row and prefix see waiting columns as taken, so they don't jump the queue either.
+
+    It takes all the same parameters as :py:class:`CassandraDistributedRowLock`.
+    """
+
+    WAITING = 'q:'
+
+    def __init__(self, pool, column_family, key, **kwargs):
+        super(CassandraDistributedQueuedLock, self).__init__(pool, column_family, key, **kwargs)
+        if self.layout != 'delete':
+            raise ValueError("The overwrite layout reuses lock ids, which would upset the order of the queue")
+        if self.lease_grace is not None:
+            raise ValueError("lease_grace would let this process jump the queue")
+        self.waiting = False
+        self.enqueued_at = None
+
+    def acquire_with(self, retry):
+        try:
+            super(CassandraDistributedQueuedLock, self).acquire_with(retry)
+        except:
+            if self.waiting:
+                self.waiting = False
+                self.rollback()
+            raise
+
+    def attempt(self):
+        cur_time = self.utcnow()
+        if not self.waiting:
+            if self.queue_ahead(self.read_lock_columns(), cur_time):
+                self.enqueue(cur_time)
+                self.observer.busy(self.key)
+                raise BusyLockException("Lock already acquired for row '{}', queued".format(self.key))
+            try:
+                super(CassandraDistributedQueuedLock, self).attempt()
+            except BusyLockException:
+                self.enqueue(cur_time)
+                raise
+            return
+
+        if self.queue_ahead(self.read_lock_columns(), cur_time):
+            if time.time() - self.enqueued_at > self.timeout / 2.0:
+                self.enqueue(cur_time)
+            self.observer.busy(self.key)
+            raise BusyLockException("Lock already acquired for row '{}', queued".format(self.key))
+
+        # head of the queue - swap our waiting column for a lock column
+        mutation = self.batch()
+        mutation.remove(self.key, [self.lock_column])
+        self.lock_column = None
+        self.fill_lock_mutation(mutation, cur_time, self.ttl)
+        self.waiting = False
+        self.send(mutation, 'insert')
+        try:
+            self.timed_verify_lock(cur_time)
+        except BusyLockException:
+            self.enqueue(cur_time)
+            raise
+        self.hold()
+
+    def queue_ahead(self, cols, cur_time):
+        """
+        Used internally - whether anyone is ahead of us among the lock columns `cols`: anyone holding (or taking) the
+        lock, or waiting since before us. Stale columns are noted for removal, except for our own waiting column,
+        which is written again - in the same place, the order only depends on the `lock_id`.
+        """
+        live = self.live_lock_columns(self.key, cols, cur_time, self.locks_to_delete)
+        if self.waiting and self.lock_column not in live:
+            self.enqueue(cur_time)
+        ours = self.waiting_order(self.lock_column) if self.waiting else None
+        ahead = [k for k in live if k != self.lock_column and
+                 (not self.is_waiting_column(k) or ours is None or self.waiting_order(k) < ours)]
+        if ahead:
+            self.note_busy(cols, ahead)
+            self.revoke(self.key, ahead)
+            return True
+        return False
+
+    def enqueue(self, cur_time):
+        """
+        Used internally - writes our waiting column (replacing our lock column, if there is one, and removing any
+        stale columns we came across) in a single round trip.
+        """
+        column = self.prefix + self.WAITING + self.lock_id
+        # removing and writing the same column in one batch would leave it removed
+        self.locks_to_delete.discard(column)
+        mutation = self.batch()
+        self.fill_stale_mutation(mutation)
+        if self.lock_column is not None and self.lock_column != column:
+            mutation.remove(self.key, [self.lock_column])
+        kw = {}
+        if self.ttl is not None:
+            kw['ttl'] = self.ttl
+        mutation.insert(self.key, {column: self.generate_timeout_value(cur_time + long(self.timeout * 1e6))}, **kw)
+        self.lock_column = column
+        self.waiting = True
+        self.enqueued_at = time.time()
+        self.send(mutation, 'insert')
+
+    def is_waiting_column(self, column):
+        return column.startswith(self.prefix + self.WAITING)
+
+    def waiting_order(self, column):
+        return lock_id_order(column[len(self.prefix + self.WAITING):])
+
+    def conflicts(self, column):
+        # contenders waiting in the queue don't hold the lock
+        return column != self.lock_column and not self.is_waiting_column(column)
+
+    def rollback(self):
+        if not self.waiting:
+            super(CassandraDistributedQueuedLock, self).rollback()
+
+    def unhold(self):
+        self.waiting = False
+        super(CassandraDistributedQueuedLock, self).unhold()
@@ -0,0 +1,149 @@
+"""
+An asyncio flavoured version of the cassandra row lock, for services running on an event loop. pycassa itself
+blocks, so every round trip to cassandra is made on a (bounded) thread pool while the event loop gets on with other
+things, and waiting between attempts is done with `asyncio.sleep` rather than by sleeping a thread. Thousands of
+coroutines can be waiting for locks while only a handful of threads are busy talking to cassandra.
+
+You'll need `trollius <http://trollius.readthedocs.org/>`_ (asyncio for python 2) as well as pycassa::
+
+    import padlock, pycassa
+    from trollius import From
+    pool = pycassa.ConnectionPool('my_keyspace')
+    lock = padlock.get_async('cassandra')(pool, 'my_column_family', 'my_row', backoff_policy=policy)
+    yield From(lock.acquire())
+    try:
+        yield From(do_some_important_shit())
+    finally:
+        yield From(lock.release())
+"""
+
+import threading
+import time
+from zope.interface import implements
+from padlock import IAsyncLock
+from padlock.distributed.cassandra import CassandraDistributedRowLock, BusyLockException, HolderExpiryPolicy
+
+try:
+    import trollius as asyncio
+    from trollius import From
+    from concurrent import futures
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # trollius must be available for any of this to work
+    asyncio = From = futures = ThreadPoolExecutor = None
+
+coroutine = asyncio.coroutine if asyncio is not None else lambda f: f
+
+
+# how many round trips to cassandra can be in flight at once on the default executor
+DEFAULT_MAX_WORKERS = 16
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def default_executor():
+    """
+    The thread pool shared by every lock that isn't given an `executor` of its own, created on first use.
+
+    :rtype: concurrent.futures.ThreadPoolExecutor
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS)
+        return _executor
+
+
+class AsyncCassandraDistributedRowLock(object):
+    """
+    An :py:class:`padlock.IAsyncLock` on a row of a cassandra column family. It takes the same parameters as
+    :py:class:`padlock.distributed.cassandra.CassandraDistributedRowLock` (and works the same way, it's compatible with
+    the blocking lock on the same row), plus:
+
+    :param executor: Where round trips to cassandra are run. Defaults to a pool of :py:data:`DEFAULT_MAX_WORKERS`
+        threads shared by all async locks.
+    :type executor: concurrent.futures.Executor
+    :param loop: The event loop to use. Defaults to the current event loop.
+    :type loop: trollius.AbstractEventLoop
+
+    Retries are governed by the `backoff_policy`, like the blocking lock (waits are cut short when the lock column in
+    the way expires, too), but the policy's :py:meth:`~padlock.distributed.retry_policy.IRetryPolicy.next_delay` is
+    waited out on the event loop. A policy without one does its own waiting in `allow_retry`, holding the loop up.
+    """
+
+    implements(IAsyncLock)
+
+    def __init__(self, pool, column_family, key, **kwargs):
+        self.executor = kwargs.pop('executor', None) or default_executor()
+        self.loop = kwargs.pop('loop', None)
+        self.lock = CassandraDistributedRowLock(pool, column_family, key, **kwargs)
+        if self.lock.coalesce:
+            raise ValueError("coalesce isn't supported by the asyncio lock")
+        if self.lock.reentrant:
+            # trollius runs every coroutine a task yields from as a task of its own, so the task acquiring the lock
+            # can't be told apart from any other
+            raise ValueError("reentrant isn't supported by the asyncio lock")
+
+    @coroutine
+    def acquire(self):
+        """
+        Acquire the lock on this row, retrying (without blocking the event loop) as the backoff policy allows.
+        """
+        lock = self.lock
+        lock.prepare_acquire()
+        retry = HolderExpiryPolicy(lock, lock.backoff_policy.duplicate())
+        attempts = 1
+        start = time.time()
+        attempt = None
+
+        try:
+            while True:
+                attempt = self.executor.submit(lock.try_acquire)
+                try:
+                    yield From(asyncio.wrap_future(attempt, loop=self.loop))
+                    lock.observer.acquired(lock.observed_key, attempts, time.time() - start)
+                    return
+                except BusyLockException, e:
+                    delay = retry.next_delay()
+                    if delay is None:
+                        raise e
+                yield From(asyncio.sleep(delay, loop=self.loop))
+                attempts += 1
+        except asyncio.CancelledError:
+            # the attempt in flight carries on in its thread and may yet write our column
+            self.executor.submit(self.abandon, attempt, attempts, start)
+            raise
+        except:
+            lock.give_up(attempts, start)
+            raise
+
+    def abandon(self, attempt, attempts, start):
+        """
+        Used internally - rolls back the `attempt` an acquire was cancelled during, once it's done, and gives up.
+        """
+        futures.wait([attempt])
+        if not attempt.cancelled() and attempt.exception() is None:
+            self.lock.rollback()
+        self.lock.give_up(attempts, start)
+
+    @coroutine
+    def release(self):
+        """
+        Allow this row to be locked by something (or someone) else.
+        """
+        yield From(self.run(self.lock.release))
+
+    @coroutine
+    def renew(self):
+        """
+        See :py:meth:`padlock.distributed.cassandra.CassandraDistributedRowLock.renew`
+        """
+        yield From(self.run(self.lock.renew))
+
+    def run(self, fn, *args):
+        """
+        Used internally - runs `fn` on the executor, returning a future for its result.
+        """
+        loop = self.loop or asyncio.get_event_loop()
+        return loop.run_in_executor(self.executor, fn, *args)
@@ -0,0 +1,128 @@
+"""
+How the value of a cassandra lock column is encoded: when the lock expires and, optionally, who holds it.
+
+By default locks store the expiry as a decimal string (``repr`` of a `long`), the text format. The binary format is
+opt-in (see `value_format` in :py:class:`padlock.distributed.cassandra.CassandraDistributedRowLock`) and versioned: a
+version byte (``\\x01``), the expiry as a big-endian signed 64 bit number of microseconds since the epoch (`0` for
+never) and, optionally, the holder: the length of the host name as a big-endian unsigned short, the host name (utf-8)
+and the process id as a big-endian unsigned int. The lock id isn't repeated, it's already in the column name.
+
+Version ``\\x02`` is the same, with a byte of flags following the expiry. The only flag so far is
+:py:data:`RELEASABLE` (``0x01``): the holder is keeping the lock for later (see `lease_grace` in
+:py:class:`padlock.distributed.cassandra.CassandraDistributedRowLock`) and gives it up when asked to. Values without
+flags are still written as version ``\\x01``.
+
+In any format, a negative expiry marks a lock column that was released by overwriting it rather than removing it
+(see the `overwrite` layout of :py:class:`padlock.distributed.cassandra.CassandraDistributedRowLock`), as
+``-(when it was released)``. Such a column is neither held nor stale.
+
+:py:func:`decode` reads every format, so locks writing either can share a row while moving from one to the other -
+just make sure everything reading the row understands the binary format before anything starts writing it. The
+binary format needs a column family whose values are validated as `BytesType`, the default. It isn't cheaper: with
+the holder recorded, values take two to three times as long to encode as text ones (see
+``benchmarks/bench_lock_values.py``).
+"""
+
+import os
+import socket
+import struct
+
+VERSION = '\x01'
+VERSION_FLAGS = '\x02'
+
+# flags
+RELEASABLE = 0x01
+
+_expiry = struct.Struct('>q')
+_flags = struct.Struct('>B')
+_host_length = struct.Struct('>H')
+_pid = struct.Struct('>I')
+
+# (host, pid), looked up once per process - see holder()
+_holder = None
+
+
+def holder():
+    """
+    This process, as a holder: ``(host name, process id)``.
+
+    :rtype: tuple
+    """
+    global _holder
+    pid = os.getpid()
+    if _holder is None or _holder[1] != pid:
+        _holder = (socket.gethostname(), pid)
+    return _holder
+
+
+def encode(expiry, host=None, pid=None, flags=0):
+    """
+    The binary lock column value for a lock expiring at `expiry` (microseconds since the epoch, or `0`), held by
+    process `pid` on `host` if given, with `flags` (eg: :py:data:`RELEASABLE`) if any.
+
+    :rtype: str
+    """
+    if flags:
+        value = VERSION_FLAGS + _expiry.pack(expiry) + _flags.pack(flags)
+    else:
+        value = VERSION + _expiry.pack(expiry)
+    if host is not None:
+        if isinstance(host, unicode):
+            host = host.encode('utf-8')
+        value += _host_length.pack(len(host)) + host + _pid.pack(pid or 0)
+    return value
+
+
+def encode_text(expiry):
+    """
+    The lock column value for a lock expiring at `expiry`, in the old, decimal string format.
+
+    :rtype: str
+    """
+    return repr(long(expiry))
+
+
+def decode_expiry(value):
+    """
+    When the lock whose column holds `value` expires, in any format. This is the only part of the value that's
+    needed to verify a lock, so it skips the rest.
+
+    :rtype: long
+    """
+    if value[:1] in (VERSION, VERSION_FLAGS):
+        return _expiry.unpack_from(value, 1)[0]
+    return long(value)
+
+
+def decode_flags(value):
+    """
+    The flags in a lock column `value`, `0` for formats without any.
+
+    :rtype: int
+    """
+    if value[:1] == VERSION_FLAGS:
+        return _flags.unpack_from(value, 1 + _expiry.size)[0]
+    return 0
+
+
+def decode(value):
+    """
+    Everything but the flags in a lock column `value`, in any format, as ``(expiry, host, pid)``. The host and
+    process id are `None` unless the holder was written.
+
+    :rtype: tuple
+    """
+    version = value[:1]
+    if version not in (VERSION, VERSION_FLAGS):
+        return long(value), None, None
+    expiry = _expiry.unpack_from(value, 1)[0]
+    offset = 1 + _expiry.size
+    if version == VERSION_FLAGS:
+        offset += _flags.size
+    if len(value) <= offset:
+        return expiry, None, None
+    length = _host_length.unpack_from(value, offset)[0]
+    offset += _host_length.size
+    host = value[offset:offset + length].decode('utf-8')
+    pid = _pid.unpack_from(value, offset + length)[0]
+    return expiry, host, pid
@@ -0,0 +1,161 @@
+"""
+A long lived home for the cassandra locks of a busy process. Creating a `pycassa` `ColumnFamily` reads the column
+family's schema from cassandra, which is far more work than the lock itself; a :py:class:`LockManager` does it once
+per column family and hands out locks that share it::
+
+    import padlock, pycassa
+    from padlock.distributed.manager import LockManager
+
+    locks = LockManager(pycassa.ConnectionPool('my_keyspace'), timeout=10)
+
+    with locks.lock('my_column_family', 'account:1234'):
+        do_some_stuff()
+
+It also keeps track of the locks it handed out that are held, so they can be released together, in one batch
+mutation per column family, with :py:meth:`LockManager.release_all` - which is also what
+:py:meth:`LockManager.shutdown` does.
+"""
+
+import threading
+from padlock import ILock, registry
+from padlock.distributed.cassandra import _cf_args, release_leases
+from padlock.distributed.status import lock_status
+
+try:
+    from pycassa import ColumnFamily
+except ImportError:
+    # pycassa must be available for any of this to work
+    ColumnFamily = None
+
+
+class LockManager(object):
+    """
+    Creates locks on the column families of `pool`, caching the `ColumnFamily` instances they use.
+
+    :param pool: A pycassa ConnectionPool
+    :type pool: pycassa.pool.ConnectionPool
+    :param kind: The name of the :py:class:`padlock.ILock` to create (`cassandra`, `cassandra_queued`...). Defaults to
+        `cassandra`
+    :type kind: str
+
+    Any other keyword arguments are defaults for every lock created, eg: `timeout`, `ttl` or `backoff_policy`.
+    """
+
+    def __init__(self, pool, kind='cassandra', **defaults):
+        self.pool = pool
+        self.kind = kind
+        self.defaults = defaults
+        self.column_families = {}
+        self.locks = set()
+        self._lock = threading.Lock()
+
+    def column_family(self, name, **cf_kwargs):
+        """
+        The `ColumnFamily` named `name`, created with `cf_kwargs` the first time it's asked for.
+        """
+        cache_key = (name, tuple(sorted((k, repr(v)) for k, v in cf_kwargs.iteritems())))
+        try:
+            return self.column_families[cache_key]
+        except KeyError:
+            pass
+        cf = ColumnFamily(self.pool, name, **cf_kwargs)
+        with self._lock:
+            return self.column_families.setdefault(cache_key, cf)
+
+    def lock(self, column_family, key, kind=None, **kwargs):
+        """
+        A new lock on `key` (or on a list of keys, for the `cassandra_multi` kind) of the column family named
+        `column_family`, which may also be a `ColumnFamily`. Keyword arguments override the manager's defaults, and
+        any that are meant for the `ColumnFamily` pick which cached instance the lock uses.
+
+        :param kind: The name of the :py:class:`padlock.ILock` to create. Defaults to the manager's `kind`
+        :type kind: str
+        """
+        options = dict(self.defaults, **kwargs)
+        if isinstance(column_family, basestring):
+            cf_kwargs = dict((k, options.pop(k)) for k in _cf_args if k in options)
+            column_family = self.column_family(column_family, **cf_kwargs)
+        return registry.lookup(ILock, kind or self.kind)(self.pool, column_family, key, manager=self, **options)
+
+    def status(self, column_family, keys, **kwargs):
+        """
+        Who has the locks on `keys` of the column family named `column_family` (or a `ColumnFamily`), without taking
+        them - see :py:func:`padlock.distributed.status.lock_status`, which takes the same keyword arguments. The
+        manager's `prefix` is used unless one is given.
+
+        :rtype: dict
+        """
+        if isinstance(column_family, basestring):
+            column_family = self.column_family(column_family)
+        if 'prefix' in self.defaults:
+            kwargs.setdefault('prefix', self.defaults['prefix'])
+        return lock_status(column_family, keys, **kwargs)
+
+    def held(self):
+        """
+        The locks handed out by this manager that are currently held.
+
+        :rtype: list
+        """
+        with self._lock:
+            return list(self.locks)
+
+    def holding(self, lock):
+        """
+        Used internally - called by `lock` once it's acquired.
+        """
+        with self._lock:
+            self.locks.add(lock)
+
+    def released(self, lock):
+        """
+        Used internally - called by `lock` when it's released.
+        """
+        with self._lock:
+            self.locks.discard(lock)
+
+    def release_all(self, locks=None):
+        """
+        Release many locks at once, with a single batch mutation (one round trip) per column family rather than one
+        per lock.
+
+        :param locks: The locks to release. Defaults to every lock handed out by this manager that's held
+        :type locks: list
+        """
+        if locks is None:
+            locks = self.held()
+
+        by_cf = {}
+        for l in locks:
+            by_cf.setdefault(id(l.column_family), []).append(l)
+
+        for group in by_cf.itervalues():
+            mutation = group[0].batch()
+            pending = False
+            try:
+                for l in group:
+                    l.unhold()
+                    if l.lock_column is not None or len(l.locks_to_delete):
+                        l.fill_release_mutation(mutation, False)
+                        pending = True
+                if pending:
+                    group[0].send(mutation, 'release')
+            finally:
+                for l in group:
+                    l.release_local()
+                    l.forget_holds()
+                    l.return_lock_id()
+
+    def shutdown(self):
+        """
+        Release every lock handed out by this manager that's still held, and give up the leases kept by those
+        that were released with `lease_grace` set.
+        """
+        self.release_all()
+        release_leases(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
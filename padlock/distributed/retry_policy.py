@@ -1,4 +1,7 @@
+import random
+import time
 from zope.interface import Interface, implements
+from padlock import registry
 
 
 class IRetryPolicy(Interface):
@@ -9,6 +12,11 @@ class IRetryPolicy(Interface):
     def allow_retry(self):
         """Determines whether or not a retry should be allowed at this time. This may internally sleep..."""
 
+    def next_delay(self):
+        """
+        How many seconds to wait before retrying, or `None` if no retry should be allowed. Unlike :py:meth:`allow_retry`
+        it never sleeps, leaving the waiting up to the caller."""
+
 
 class RunOncePolicy(object):
     """
@@ -22,4 +30,176 @@ class RunOncePolicy(object):
     def allow_retry(self):
         return False
 
+    def next_delay(self):
+        return None
+
+
+class _BackoffPolicy(object):
+    """
+    Used internally - base class for retry policies that wait a while between attempts, not a policy on its own.
+    Subclasses implement `duplicate` and `next_delay` (counting every delay it hands out in `retries`), which is also
+    handy on its own if you'd rather do the waiting yourself (on an event loop, say).
+    """
+    implements(IRetryPolicy)
+
+    def __init__(self):
+        self.retries = 0
+
+    def allow_retry(self):
+        delay = self.next_delay()
+        if delay is None:
+            return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+
+class FixedAttemptsPolicy(_BackoffPolicy):
+    """
+    Makes up to `attempts` attempts in total, waiting `delay` seconds between each.
+
+    :param attempts: How many times to try, including the first. Defaults to `3`
+    :type attempts: int
+    :param delay: Seconds to wait between attempts. Defaults to `0.1`
+    :type delay: float
+    """
+
+    def __init__(self, attempts=3, delay=0.1):
+        super(FixedAttemptsPolicy, self).__init__()
+        self.attempts = attempts
+        self.delay = delay
+
+    def duplicate(self):
+        return self.__class__(self.attempts, self.delay)
+
+    def next_delay(self):
+        if self.retries >= self.attempts - 1:
+            return None
+        self.retries += 1
+        return self.delay
+
+
+class ExponentialBackoffPolicy(_BackoffPolicy):
+    """
+    Waits exponentially longer between each attempt, starting at `base` seconds and never waiting more than `cap`.
+    Randomizing the wait (the `jitter`) keeps contenders that collided once from colliding again in lockstep:
+
+        * ``'full'`` waits anywhere between zero and the exponential delay
+        * ``'decorrelated'`` waits between `base` and three times the previous wait
+        * ``None`` doesn't randomize at all
+
+    See `Exponential Backoff And Jitter <https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/>`_
+    for a comparison.
+
+    :param base: The first delay, in seconds. Defaults to `0.01`
+    :type base: float
+    :param cap: The longest delay, in seconds. Defaults to `1.0`
+    :type cap: float
+    :param max_attempts: How many times to try, including the first, or `None` for no limit. Defaults to `10`
+    :type max_attempts: int
+    :param jitter: One of ``'full'`` (the default), ``'decorrelated'`` or `None`
+    :type jitter: str
+    """
+
+    jitters = ('full', 'decorrelated', None)
+
+    def __init__(self, base=0.01, cap=1.0, max_attempts=10, jitter='full'):
+        super(ExponentialBackoffPolicy, self).__init__()
+        if jitter not in self.jitters:
+            raise ValueError("Unknown jitter {!r}, must be one of {!r}".format(jitter, self.jitters))
+        self.base = base
+        self.cap = cap
+        self.max_attempts = max_attempts
+        self.jitter = jitter
+        self.last_delay = base
+
+    def duplicate(self):
+        return self.__class__(self.base, self.cap, self.max_attempts, self.jitter)
+
+    def next_delay(self):
+        if self.max_attempts is not None and self.retries >= self.max_attempts - 1:
+            return None
+        self.retries += 1
+        return self.backoff()
+
+    def backoff(self):
+        """
+        Used internally - the (jittered) delay before the current retry.
+        """
+        if self.jitter == 'decorrelated':
+            self.last_delay = min(self.cap, random.uniform(self.base, self.last_delay * 3))
+            return self.last_delay
+        delay = min(self.cap, self.base * 2 ** (self.retries - 1))
+        if self.jitter == 'full':
+            delay = random.uniform(0, delay)
+        return delay
+
+
+class DeadlinePolicy(ExponentialBackoffPolicy):
+    """
+    Backs off exponentially (see :py:class:`ExponentialBackoffPolicy`), for as many attempts as fit in `max_wait`
+    seconds. The clock starts when the policy is created or duplicated, ie: when the lock starts acquiring.
+
+    :param max_wait: The most time to spend retrying, in seconds. Defaults to `10.0`
+    :type max_wait: float
+    """
+
+    def __init__(self, max_wait=10.0, base=0.01, cap=1.0, jitter='full'):
+        super(DeadlinePolicy, self).__init__(base, cap, None, jitter)
+        self.max_wait = max_wait
+        self.deadline = time.time() + max_wait
+
+    def duplicate(self):
+        return self.__class__(self.max_wait, self.base, self.cap, self.jitter)
+
+    def next_delay(self):
+        remaining = self.deadline - time.time()
+        if remaining <= 0:
+            return None
+        self.retries += 1
+        return min(self.backoff(), remaining)
+
+
+def retry_delay(policy):
+    """
+    How many seconds to wait before the next attempt `policy` allows, or `None` if it doesn't allow one. Policies that
+    predate :py:meth:`IRetryPolicy.next_delay` only have :py:meth:`IRetryPolicy.allow_retry`, which does its own
+    waiting, so for those there's nothing left to wait once it's allowed a retry.
+
+    :rtype: float
+    """
+    if getattr(policy, 'next_delay', None) is None:
+        return 0 if policy.allow_retry() else None
+    return policy.next_delay()
+
+
+def acquire_policy(backoff_policy, blocking=None, timeout=None):
+    """
+    The retry policy for acquiring a lock whose `backoff_policy` is given, when `acquire()` was called with `blocking`
+    and `timeout` (see :py:meth:`padlock.ILock.acquire`): a duplicate of `backoff_policy` itself when neither was given,
+    a single attempt when `blocking` is `False`, otherwise exponential backoff (from the `base`, up to the `cap` and
+    with the `jitter` of `backoff_policy`, if it has them) for up to `timeout` seconds, or for as long as it takes if
+    `timeout` is `None` or `-1`.
+
+    :rtype: IRetryPolicy
+    """
+    if blocking is None and timeout is None:
+        return backoff_policy.duplicate()
+    if blocking is False:
+        if timeout is not None and timeout != -1:
+            raise ValueError("Can't specify a timeout for a non-blocking acquire")
+        return RunOncePolicy()
+    if timeout is not None and timeout < 0 and timeout != -1:
+        raise ValueError("Timeout must be positive, or -1 to wait as long as it takes")
+    base = getattr(backoff_policy, 'base', 0.01)
+    cap = getattr(backoff_policy, 'cap', 1.0)
+    jitter = getattr(backoff_policy, 'jitter', 'full')
+    if timeout is None or timeout == -1:
+        return ExponentialBackoffPolicy(base, cap, None, jitter)
+    return DeadlinePolicy(timeout, base, cap, jitter)
+
 
+registry.register(IRetryPolicy, 'run_once', RunOncePolicy, factory=True)
+registry.register(IRetryPolicy, 'fixed_attempts', FixedAttemptsPolicy, factory=True)
+registry.register(IRetryPolicy, 'exponential_backoff', ExponentialBackoffPolicy, factory=True)
+registry.register(IRetryPolicy, 'deadline', DeadlinePolicy, factory=True)
@@ -0,0 +1,114 @@
+"""
+Who has the cassandra locks on many rows, without taking (or writing) anything. Handy for schedulers that would rather
+skip work that's locked than wait for it, and for dashboards::
+
+    import pycassa
+    from padlock.distributed.status import lock_status
+
+    cf = pycassa.ColumnFamily(pycassa.ConnectionPool('my_keyspace'), 'my_column_family')
+    statuses = lock_status(cf, ['account:%d' % i for i in xrange(10000)])
+    todo = [key for key, status in statuses.iteritems() if not status.locked]
+
+The lock columns are read with one `multiget` per `chunk_size` rows, and only the lock columns are read. What's
+reported is only as current as the read, of course - it's a hint, taking the lock is still the only way to be sure.
+"""
+
+from padlock.distributed import lock_values
+from padlock.distributed.cassandra import _PREFIX_END, CassandraDistributedRowLock, iter_lock_columns, utcnow
+
+
+class LockStatus(object):
+    """
+    The lock columns on one row, as of when they were read.
+
+    .. py:attribute:: holders
+
+        The live lock columns, as a list of ``(column name, expiry, host, pid)`` ordered by column name. The expiry is
+        in microseconds since the epoch, `0` for a lock that never expires. The host and pid are `None` for locks that
+        didn't record them. Depending on the kind of lock, a live column can be a lock that's held, one that's being
+        taken, a reader or a contender waiting in a queue.
+
+    .. py:attribute:: stale
+
+        The names of the lock columns that have expired but haven't been removed yet.
+    """
+
+    def __init__(self, key, holders, stale):
+        self.key = key
+        self.holders = holders
+        self.stale = stale
+
+    @property
+    def locked(self):
+        """
+        Whether any lock column on the row is live.
+        """
+        return bool(self.holders)
+
+    @property
+    def expiry(self):
+        """
+        When the last live lock column on the row expires (microseconds since the epoch), `0` if one never does, or
+        `None` if the row isn't locked.
+        """
+        expiries = [h[1] for h in self.holders]
+        if not expiries:
+            return None
+        if 0 in expiries:
+            return 0
+        return max(expiries)
+
+    def __repr__(self):
+        return '<LockStatus {!r} holders={!r} stale={!r}>'.format(self.key, self.holders, self.stale)
+
+
+def lock_status(column_family, keys, **kwargs):
+    """
+    The :py:class:`LockStatus` of every one of `keys`, as a dict keyed by row key. Nothing is written.
+
+    :param column_family: The column family the locks are in
+    :type column_family: pycassa.ColumnFamily
+    :param keys: The row keys
+    :type keys: list
+    :keyword prefix: The column prefix of the locks. Defaults to `_lock_`
+    :type prefix: str
+    :keyword chunk_size: How many rows to read per `multiget`. Defaults to `500`
+    :type chunk_size: int
+    :keyword page_size: How many lock columns of a row to read at a time. Defaults to `100`
+    :type page_size: int
+    :keyword read_consistency_level: The consistency level to read at. Defaults to the column family's
+    :rtype: dict
+    """
+    prefix = kwargs.get('prefix', '_lock_')
+    chunk_size = kwargs.get('chunk_size', 500)
+    page_size = kwargs.get('page_size', 100)
+    read_kwargs = {}
+    if kwargs.get('read_consistency_level') is not None:
+        read_kwargs['read_consistency_level'] = kwargs['read_consistency_level']
+
+    revoke = prefix + CassandraDistributedRowLock.REVOKE
+    keys = list(keys)
+    now = utcnow()
+    res = {}
+    for i in xrange(0, len(keys), chunk_size):
+        chunk = keys[i:i + chunk_size]
+        pages = column_family.multiget(chunk, column_start=prefix, column_finish=prefix + _PREFIX_END,
+                                       column_count=page_size, **read_kwargs)
+        for key in chunk:
+            holders, stale = [], []
+            if key in pages:
+                for name, value in iter_lock_columns(column_family, key, prefix, page_size, pages[key],
+                                                     **read_kwargs):
+                    if name.startswith(revoke):
+                        # asking for a lease, not a lock
+                        continue
+                    expiry, host, pid = lock_values.decode(value)
+                    if expiry < 0:
+                        # released, in the overwrite layout
+                        continue
+                    if expiry == 0 or expiry >= now:
+                        holders.append((name, expiry, host, pid))
+                    else:
+                        stale.append(name)
+            res[key] = LockStatus(key, holders, stale)
+    return res
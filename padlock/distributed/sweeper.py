@@ -0,0 +1,186 @@
+"""
+Cleans stale lock columns out of a whole column family. A lock only removes the stale columns it comes across on the
+row it's locking, so workers that crash while holding locks on rows nobody locks again leave their columns behind,
+and rows that are locked often can pile up enough of them to slow every lock on the row down.
+
+The sweeper pages through every row of the column family, reading only the slice of lock columns, and deletes those
+that expired in large batch mutations, as fast as it's allowed to::
+
+    import pycassa
+    from padlock.distributed.sweeper import StaleLockSweeper
+
+    cf = pycassa.ColumnFamily(pycassa.ConnectionPool('my_keyspace'), 'my_column_family')
+    stats = StaleLockSweeper(cf, max_rate=5000).sweep()
+
+It's also installed as the ``padlock-sweep`` command::
+
+    padlock-sweep my_keyspace my_column_family --server cass1:9160 --max-rate 5000 --dry-run
+
+Locks that never expire (written with a `timeout` of `0`) are never swept. Nor are the released markers left by locks
+using the `overwrite` layout, unless `released_age` is given: they're written over again by the next lock, and
+removing them leaves the tombstones behind that the layout is there to avoid - but the ids of processes that are long
+gone can pile up, so it's worth sweeping those every so often, when the row isn't busy.
+"""
+
+import argparse
+import collections
+import time
+from padlock.distributed import lock_values
+from padlock.distributed.cassandra import _PREFIX_END, iter_lock_columns, utcnow
+
+try:
+    from pycassa import ConnectionPool, ColumnFamily
+except ImportError:
+    # pycassa must be available for any of this to work
+    ConnectionPool = ColumnFamily = None
+
+
+class StaleLockSweeper(object):
+    """
+    Deletes the stale lock columns of every row in `column_family`.
+
+    :param column_family: The column family to sweep
+    :type column_family: pycassa.ColumnFamily
+    :keyword prefix: The column prefix of the locks. Defaults to `_lock_`
+    :type prefix: str
+    :keyword grace: Only delete columns that expired at least this many seconds ago, to allow for clock skew between
+        this machine and the ones taking locks. Defaults to `0`
+    :type grace: float
+    :keyword page_size: How many rows, and how many lock columns of a row, to read at a time. Defaults to `1000`
+    :type page_size: int
+    :keyword batch_size: How many columns to delete per batch mutation. Defaults to `1000`
+    :type batch_size: int
+    :keyword max_rate: The most columns to delete per second, or `None` for as fast as possible. Defaults to `None`
+    :type max_rate: float
+    :keyword released_age: Also delete the markers of locks that were released (in the `overwrite` layout) at least
+        this many seconds ago. Defaults to `None`, never
+    :type released_age: float
+    """
+
+    def __init__(self, column_family, **kwargs):
+        self.column_family = column_family
+        self.prefix = kwargs.get('prefix', '_lock_')
+        self.grace = kwargs.get('grace', 0)
+        self.page_size = kwargs.get('page_size', 1000)
+        self.batch_size = kwargs.get('batch_size', 1000)
+        self.max_rate = kwargs.get('max_rate')
+        self.released_age = kwargs.get('released_age')
+        self.stats = collections.Counter()
+
+    def iter_stale(self):
+        """
+        Yields every row with stale lock columns, as ``(key, {column name: lock value})``. Nothing is deleted.
+        """
+        start, finish = self.prefix, self.prefix + _PREFIX_END
+        now = utcnow()
+        cutoff = now - long(self.grace * 1e6)
+        released_cutoff = None if self.released_age is None else now - long(self.released_age * 1e6)
+        rows = self.column_family.get_range(column_start=start, column_finish=finish, column_count=self.page_size,
+                                            buffer_size=self.page_size)
+        for key, cols in rows:
+            self.stats['rows'] += 1
+            stale = {}
+            for name, value in iter_lock_columns(self.column_family, key, self.prefix, self.page_size, cols):
+                self.stats['columns'] += 1
+                try:
+                    expiry = lock_values.decode_expiry(value)
+                except ValueError:
+                    # not written by a lock
+                    self.stats['unreadable'] += 1
+                    continue
+                if 0 < expiry < cutoff:
+                    stale[name] = value
+                elif expiry < 0 and released_cutoff is not None and -expiry < released_cutoff:
+                    self.stats['released'] += 1
+                    stale[name] = value
+            if stale:
+                self.stats['stale'] += len(stale)
+                yield key, stale
+
+    def sweep(self, dry_run=False):
+        """
+        Delete every stale lock column, `batch_size` at a time and at most `max_rate` a second.
+
+        :param dry_run: Only count the stale columns, don't delete them
+        :type dry_run: bool
+        :returns: How many `rows` and lock `columns` were read, how many columns were `stale` (including `released`
+            markers, if they're swept) and `unreadable` (not written by a lock) and how many were `deleted` in how many
+            `batches`
+        :rtype: collections.Counter
+        """
+        start = time.time()
+        mutation = self.column_family.batch(queue_size=0)
+        pending = 0
+        for key, stale in self.iter_stale():
+            if dry_run:
+                continue
+            names = sorted(stale)
+            while names:
+                chunk, names = names[:self.batch_size - pending], names[self.batch_size - pending:]
+                mutation.remove(key, chunk)
+                pending += len(chunk)
+                if pending >= self.batch_size:
+                    self.send(mutation, pending, start)
+                    pending = 0
+        if pending:
+            self.send(mutation, pending, start)
+        return self.stats
+
+    def send(self, mutation, count, start):
+        """
+        Used internally - sends a batch deleting `count` columns, first waiting for as long as `max_rate` requires.
+        """
+        if self.max_rate:
+            delay = start + (self.stats['deleted'] + count) / float(self.max_rate) - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        mutation.send()
+        self.stats['deleted'] += count
+        self.stats['batches'] += 1
+
+
+def main(argv=None):
+    """
+    The ``padlock-sweep`` command.
+    """
+    parser = argparse.ArgumentParser(description='Delete the stale lock columns of a cassandra column family.')
+    parser.add_argument('keyspace')
+    parser.add_argument('column_family')
+    parser.add_argument('--server', action='append', dest='servers',
+                        help='host:port of a cassandra node, may be repeated (default: localhost:9160)')
+    parser.add_argument('--prefix', default='_lock_', help='the column prefix of the locks (default: _lock_)')
+    parser.add_argument('--grace', type=float, default=0,
+                        help='only delete columns that expired at least this many seconds ago (default: 0)')
+    parser.add_argument('--page-size', type=int, default=1000, help='rows and columns read at a time (default: 1000)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='columns deleted per batch (default: 1000)')
+    parser.add_argument('--max-rate', type=float, help='the most columns to delete per second (default: no limit)')
+    parser.add_argument('--released-age', type=float,
+                        help='also delete the markers of locks released (in place) at least this many seconds ago')
+    parser.add_argument('--dry-run', action='store_true', help="list the stale lock columns, don't delete them")
+    args = parser.parse_args(argv)
+
+    pool = ConnectionPool(args.keyspace, server_list=args.servers or ['localhost:9160'])
+    try:
+        sweeper = StaleLockSweeper(ColumnFamily(pool, args.column_family), prefix=args.prefix, grace=args.grace,
+                                   page_size=args.page_size, batch_size=args.batch_size, max_rate=args.max_rate,
+                                   released_age=args.released_age)
+        if args.dry_run:
+            for key, stale in sweeper.iter_stale():
+                for name, value in sorted(stale.iteritems()):
+                    expiry, host, pid = lock_values.decode(value)
+                    when = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(abs(expiry) / 1e6))
+                    print '%r %r %s %s UTC%s' % (key, name, 'released' if expiry < 0 else 'expired', when,
+                                                 '' if host is None else ', held by %s:%d' % (host, pid))
+        else:
+            sweeper.sweep()
+    finally:
+        pool.dispose()
+
+    stats = sweeper.stats
+    print '%d rows, %d lock columns read: %d stale (%d released), %d unreadable, %d deleted in %d batches' % (
+        stats['rows'], stats['columns'], stats['stale'], stats['released'], stats['unreadable'], stats['deleted'],
+        stats['batches'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+"""
+The exceptions raised by every lock backend, so code catching them doesn't care which backend it's using.
+"""
+
+
+class BusyLockException(Exception):
+    """
+    Raised when a lock is already taken on this row.
+    """
+
+
+class StaleLockException(Exception):
+    """
+    Raised old, stale locks exist on a row and we don't want them to have existed.
+    """
+
+
+class LostLockException(Exception):
+    """
+    Raised when renewing a lock that has been lost in the meantime - it went stale, or its column is gone.
+    """
@@ -0,0 +1,3 @@
+"""
+Locks that never leave the process (or the machine).
+"""
@@ -0,0 +1,181 @@
+"""
+The `file` lock: a lock shared by every process on this machine, with no round trips at all. Keys are hashed onto
+one byte each of a single lock file, which is locked with `fcntl` byte-range locks, so any number of keys share one
+file (and one file descriptor per process), and the operating system releases a lock as soon as the process holding
+it dies::
+
+    import padlock
+    with padlock.get('file')('account:1234', path='/var/run/myapp/locks'):
+        do_some_stuff()
+
+Keys that hash onto the same byte lock each other too. With the default of a million `slots` that's rare, but raise
+it if you lock a lot of keys at once. The file never actually grows, locks beyond the end of a file are fine.
+
+POSIX locks belong to a process rather than a thread, and are all dropped as soon as the process closes *any*
+descriptor on the file. So each process opens each lock file once and keeps it open, and threads in the same process
+take turns on a slot through a :py:class:`padlock.local.table.LocalLockTable` before locking it in the file.
+"""
+
+import errno
+import os
+import tempfile
+import threading
+import time
+import zlib
+from zope.interface import implements
+from padlock import ILock, registry
+from padlock.exceptions import BusyLockException
+from padlock.distributed.retry_policy import IRetryPolicy, acquire_policy, retry_delay
+from padlock.local.table import LocalLockTable
+from padlock.metrics import ILockObserver
+
+try:
+    import fcntl
+except ImportError:
+    # not available on windows
+    fcntl = None
+
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'padlock.lock')
+DEFAULT_SLOTS = 2 ** 20
+
+# path -> file descriptor, opened once per process and never closed (closing would drop every lock on the file)
+_files = {}
+_files_lock = threading.Lock()
+
+# turns on a slot among the threads of this process, keyed by (path, slot)
+_local_locks = LocalLockTable()
+
+
+def lock_file(path):
+    """
+    Used internally - the file descriptor of the lock file at `path`, opened (and created, if need be) on first use.
+    """
+    try:
+        return _files[path]
+    except KeyError:
+        with _files_lock:
+            if path not in _files:
+                _files[path] = os.open(path, os.O_RDWR | os.O_CREAT, 0666)
+            return _files[path]
+
+
+def slot(key, slots):
+    """
+    Which of `slots` bytes `key` is locked by. The same in every process, unlike `hash()`.
+
+    :rtype: int
+    """
+    if isinstance(key, unicode):
+        key = key.encode('utf-8')
+    return (zlib.crc32(str(key)) & 0xffffffff) % slots
+
+
+class FileLock(object):
+    """
+    A lock on `key` shared by every process using the same lock file.
+
+    :param key: What to lock
+    :type key: str
+    :keyword path: The lock file. Defaults to ``padlock.lock`` in the temp directory
+    :type path: str
+    :keyword slots: How many bytes of the file keys are hashed onto. Every process must use the same number.
+        Defaults to ``2 ** 20``
+    :type slots: int
+    :keyword blocking: Wait as long as it takes for the lock instead of following the retry policy, when
+        :py:meth:`acquire` isn't given `blocking` or `timeout` itself. Defaults to `False`
+    :type blocking: bool
+    :keyword backoff_policy: The :py:class:`padlock.distributed.retry_policy.IRetryPolicy` deciding how long to wait
+        between attempts when the lock is taken. Defaults to `run_once`
+    :keyword observer: The :py:class:`padlock.metrics.ILockObserver` to report to. Defaults to `default`
+    """
+
+    implements(ILock)
+
+    def __init__(self, key, **kwargs):
+        if fcntl is None:
+            raise RuntimeError("The file lock needs fcntl, which isn't available on this platform")
+        self.key = key
+        self.path = kwargs.get('path', DEFAULT_PATH)
+        self.slots = kwargs.get('slots', DEFAULT_SLOTS)
+        self.blocking = kwargs.get('blocking', False)
+        self.backoff_policy = kwargs.get('backoff_policy')
+        if self.backoff_policy is None:
+            self.backoff_policy = registry.lookup(IRetryPolicy, 'run_once')
+        self.observer = kwargs.get('observer')
+        if self.observer is None:
+            self.observer = registry.lookup(ILockObserver, 'default')
+        self.slot = slot(key, self.slots)
+        self.acquire_time = None
+
+    def acquire(self, blocking=None, timeout=None):
+        """
+        Acquire the lock, retrying as the retry policy allows (or waiting as long as it takes, if `blocking`), or
+        raise :py:class:`padlock.exceptions.BusyLockException`. Given `blocking` and/or `timeout`, returns whether the
+        lock was acquired instead, see :py:meth:`padlock.ILock.acquire`.
+
+        :rtype: bool
+        """
+        retry = acquire_policy(self.backoff_policy, blocking, timeout)
+        if blocking is None and timeout is None:
+            wait = self.blocking
+        else:
+            wait = blocking is not False and timeout in (None, -1)
+        attempts = 1
+        start = time.time()
+        while not self.attempt(wait):
+            self.observer.busy(self.key)
+            delay = retry_delay(retry)
+            if delay is None:
+                self.observer.failed(self.key, attempts, time.time() - start)
+                if blocking is not None or timeout is not None:
+                    return False
+                raise BusyLockException("Lock already acquired for key '{}'".format(self.key))
+            if delay > 0:
+                time.sleep(delay)
+            attempts += 1
+        self.acquire_time = time.time()
+        self.observer.acquired(self.key, attempts, self.acquire_time - start)
+        return True
+
+    def attempt(self, wait=False):
+        """
+        Used internally - a single attempt at taking the lock, first among the threads of this process and then in the
+        lock file. Only waits (as long as it takes) if `wait`.
+
+        :returns: Whether the lock was acquired
+        :rtype: bool
+        """
+        local_key = (self.path, self.slot)
+        if not _local_locks.acquire(local_key, wait):
+            return False
+        flags = fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.lockf(lock_file(self.path), flags, 1, self.slot, os.SEEK_SET)
+        except Exception, e:
+            _local_locks.release(local_key)
+            # another process has it
+            if isinstance(e, IOError) and e.errno in (errno.EACCES, errno.EAGAIN) and not wait:
+                return False
+            raise
+        return True
+
+    def release(self):
+        """
+        Release the lock.
+        """
+        if self.acquire_time is None:
+            return
+        self.observer.released(self.key, time.time() - self.acquire_time)
+        self.acquire_time = None
+        try:
+            fcntl.lockf(lock_file(self.path), fcntl.LOCK_UN, 1, self.slot, os.SEEK_SET)
+        finally:
+            _local_locks.release((self.path, self.slot))
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
@@ -0,0 +1,201 @@
+"""
+The `memory` lock: a lock that lives in this process. It has the same shape as the distributed locks (a key, a
+`timeout` after which an abandoned lock goes stale and a retry policy) with none of the round trips, which makes it a
+good stand in for single process services and for tests::
+
+    import padlock
+    with padlock.get('memory')('account:1234', timeout=10):
+        do_some_stuff()
+
+All memory locks share one :py:class:`StripedLockTable` unless given a `table` of their own.
+"""
+
+import itertools
+import threading
+import time
+from zope.interface import implements
+from padlock import ILock, registry
+from padlock.exceptions import BusyLockException
+from padlock.distributed.retry_policy import IRetryPolicy, acquire_policy, retry_delay
+from padlock.metrics import ILockObserver
+
+
+class _Stripe(object):
+    __slots__ = ('cond', 'entries', 'next_sweep')
+
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.entries = {}
+        self.next_sweep = 0
+
+
+class StripedLockTable(object):
+    """
+    Locks for any number of keys, kept as ``key -> (lock id, expiry)`` in one of `stripes` dictionaries, each guarded
+    by its own mutex. There's a fixed number of `threading` objects however many keys are locked, and threads locking
+    different keys rarely wait on the same mutex.
+
+    Released locks are removed straight away. Locks that were never released (their holder went away, say) are
+    replaced by the next acquire once they expire, and every `sweep_interval` seconds each stripe throws out all of
+    its expired locks, so keys nobody asks for again don't hang around forever.
+
+    :param stripes: How many stripes to spread keys over. Defaults to `64`
+    :type stripes: int
+    :param sweep_interval: Seconds between sweeps of a stripe for expired locks. Defaults to `60`
+    :type sweep_interval: float
+    """
+
+    def __init__(self, stripes=64, sweep_interval=60.0):
+        self.stripes = [_Stripe() for _ in xrange(stripes)]
+        self.sweep_interval = sweep_interval
+
+    def stripe(self, key):
+        """
+        Used internally - the stripe `key` lives in.
+        """
+        return self.stripes[hash(key) % len(self.stripes)]
+
+    def acquire(self, key, lock_id, timeout, wait=0):
+        """
+        Lock `key` for `lock_id`, for `timeout` seconds (or until released).
+
+        :param wait: The most seconds to wait for the lock if it's held. Defaults to `0`, not waiting at all
+        :type wait: float
+        :returns: Whether the lock was acquired
+        :rtype: bool
+        """
+        stripe = self.stripe(key)
+        with stripe.cond:
+            now = time.time()
+            if now >= stripe.next_sweep:
+                self.sweep(stripe, now)
+            deadline = now + wait
+            while True:
+                entry = stripe.entries.get(key)
+                if entry is None or entry[1] <= now:
+                    stripe.entries[key] = (lock_id, now + timeout)
+                    return True
+                if now >= deadline:
+                    return False
+                # woken early by any release on this stripe, or when the holder expires
+                stripe.cond.wait(min(deadline, entry[1]) - now)
+                now = time.time()
+
+    def release(self, key, lock_id):
+        """
+        Release the lock on `key`, if `lock_id` still holds it.
+
+        :returns: Whether `lock_id` held the lock
+        :rtype: bool
+        """
+        stripe = self.stripe(key)
+        with stripe.cond:
+            entry = stripe.entries.get(key)
+            if entry is None or entry[0] != lock_id:
+                return False
+            del stripe.entries[key]
+            stripe.cond.notify_all()
+            return True
+
+    def holder(self, key):
+        """
+        The id of whoever holds the lock on `key`, or `None` if it's free.
+        """
+        stripe = self.stripe(key)
+        with stripe.cond:
+            entry = stripe.entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                return None
+            return entry[0]
+
+    def sweep(self, stripe, now):
+        """
+        Used internally - removes the expired locks from `stripe`, which must be locked.
+        """
+        for key, (_, expires) in stripe.entries.items():
+            if expires <= now:
+                del stripe.entries[key]
+        stripe.next_sweep = now + self.sweep_interval
+
+    def __len__(self):
+        return sum(len(s.entries) for s in self.stripes)
+
+
+_table = StripedLockTable()
+_ids = itertools.count()
+
+
+class MemoryLock(object):
+    """
+    A lock on `key` within this process.
+
+    :param key: What to lock, anything hashable
+    :keyword timeout: Seconds before a lock that was never released goes stale and can be taken. Defaults to `60`
+    :type timeout: float
+    :keyword backoff_policy: The :py:class:`padlock.distributed.retry_policy.IRetryPolicy` deciding how long to wait
+        when the lock is taken. Instead of sleeping, the lock waits up to that long to be released. Defaults to
+        `run_once`
+    :keyword lock_id: Identifies this holder of the lock. Defaults to a number unique to this process
+    :keyword observer: The :py:class:`padlock.metrics.ILockObserver` to report to. Defaults to `default`
+    :keyword table: The :py:class:`StripedLockTable` to keep the lock in. Defaults to one shared by every memory lock
+    """
+
+    implements(ILock)
+
+    def __init__(self, key, **kwargs):
+        self.key = key
+        self.timeout = kwargs.get('timeout', 60.0)
+        self.backoff_policy = kwargs.get('backoff_policy')
+        if self.backoff_policy is None:
+            self.backoff_policy = registry.lookup(IRetryPolicy, 'run_once')
+        self.lock_id = kwargs.get('lock_id')
+        if self.lock_id is None:
+            self.lock_id = next(_ids)
+        self.observer = kwargs.get('observer')
+        if self.observer is None:
+            self.observer = registry.lookup(ILockObserver, 'default')
+        self.table = kwargs.get('table')
+        if self.table is None:
+            self.table = _table
+        self.acquire_time = None
+
+    def acquire(self, blocking=None, timeout=None):
+        """
+        Acquire the lock, waiting for as long as the retry policy allows, or raise
+        :py:class:`padlock.exceptions.BusyLockException`. Given `blocking` and/or `timeout`, returns whether the lock
+        was acquired instead, see :py:meth:`padlock.ILock.acquire`.
+
+        :rtype: bool
+        """
+        retry = acquire_policy(self.backoff_policy, blocking, timeout)
+        attempts = 1
+        start = time.time()
+        wait = 0
+        while not self.table.acquire(self.key, self.lock_id, self.timeout, wait):
+            self.observer.busy(self.key)
+            wait = retry_delay(retry)
+            if wait is None:
+                self.observer.failed(self.key, attempts, time.time() - start)
+                if blocking is not None or timeout is not None:
+                    return False
+                raise BusyLockException("Lock already acquired for key '{}'".format(self.key))
+            attempts += 1
+        self.acquire_time = time.time()
+        self.observer.acquired(self.key, attempts, self.acquire_time - start)
+        return True
+
+    def release(self):
+        """
+        Release the lock, unless it already went stale and was taken by someone else.
+        """
+        if self.acquire_time is not None:
+            self.observer.released(self.key, time.time() - self.acquire_time)
+            self.acquire_time = None
+        self.table.release(self.key, self.lock_id)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
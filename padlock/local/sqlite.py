@@ -0,0 +1,188 @@
+"""
+The `sqlite` lock: leases kept in a SQLite database on this machine, in WAL mode, so they survive the process (and the
+machine) crashing and can be shared by every process that can open the database. Each lease is a row of
+``(key, owner, expires)``; acquiring is a single upsert that only takes the row over if it has expired, releasing is a
+single delete of the rows we own::
+
+    import padlock
+    with padlock.get('sqlite')('account:1234', path='/var/lib/myapp/locks.db', timeout=30):
+        do_some_stuff()
+
+Use `sqlite_multi` to lock many keys at once, all or nothing, in one transaction. Needs SQLite 3.24 or later.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from zope.interface import implements
+from padlock import ILock, registry
+from padlock.exceptions import BusyLockException
+from padlock.distributed.retry_policy import IRetryPolicy, acquire_policy, retry_delay
+from padlock.metrics import ILockObserver
+
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'padlock.sqlite')
+
+# sqlite connections can't be shared between threads, so each thread has its own: {(path, table): connection}
+_connections = threading.local()
+
+
+def connection(path, table, busy_timeout=5.0):
+    """
+    Used internally - this thread's connection to the database at `path`, set up (WAL mode, leases table) the first
+    time it's asked for.
+    """
+    conns = _connections.__dict__.setdefault('conns', {})
+    try:
+        return conns[(path, table)]
+    except KeyError:
+        pass
+    conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS {} (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)'
+                 .format(table))
+    conns[(path, table)] = conn
+    return conn
+
+
+class SQLiteLock(object):
+    """
+    A lease on `key` in a SQLite database.
+
+    :param key: What to lock
+    :type key: str
+    :keyword path: The database file. Defaults to ``padlock.sqlite`` in the temp directory
+    :type path: str
+    :keyword table: The table leases are kept in. Defaults to ``padlock_locks``
+    :type table: str
+    :keyword timeout: Seconds before a lease that was never released expires and can be taken. Defaults to `60`
+    :type timeout: float
+    :keyword lock_id: Identifies the owner of the lease. Defaults to a random UUID
+    :type lock_id: str
+    :keyword backoff_policy: The :py:class:`padlock.distributed.retry_policy.IRetryPolicy` deciding how long to wait
+        between attempts when the lock is taken. Defaults to `run_once`
+    :keyword observer: The :py:class:`padlock.metrics.ILockObserver` to report to. Defaults to `default`
+    :keyword busy_timeout: Seconds to wait for another connection's write transaction to finish. Defaults to `5`
+    :type busy_timeout: float
+    """
+
+    implements(ILock)
+
+    def __init__(self, key, **kwargs):
+        self.keys = [key]
+        self.path = kwargs.get('path', DEFAULT_PATH)
+        self.table = kwargs.get('table', 'padlock_locks')
+        self.timeout = kwargs.get('timeout', 60.0)
+        self.lock_id = kwargs.get('lock_id', uuid.uuid4().hex)
+        self.backoff_policy = kwargs.get('backoff_policy')
+        if self.backoff_policy is None:
+            self.backoff_policy = registry.lookup(IRetryPolicy, 'run_once')
+        self.observer = kwargs.get('observer')
+        if self.observer is None:
+            self.observer = registry.lookup(ILockObserver, 'default')
+        self.busy_timeout = kwargs.get('busy_timeout', 5.0)
+        self.observed_key = key
+        self.acquire_time = None
+
+    def acquire(self, blocking=None, timeout=None):
+        """
+        Acquire the lock, retrying as the retry policy allows, or raise
+        :py:class:`padlock.exceptions.BusyLockException`. Given `blocking` and/or `timeout`, returns whether the lock
+        was acquired instead, see :py:meth:`padlock.ILock.acquire`.
+
+        :rtype: bool
+        """
+        retry = acquire_policy(self.backoff_policy, blocking, timeout)
+        attempts = 1
+        start = time.time()
+        while not self.attempt():
+            self.observer.busy(self.observed_key)
+            delay = retry_delay(retry)
+            if delay is None:
+                self.observer.failed(self.observed_key, attempts, time.time() - start)
+                if blocking is not None or timeout is not None:
+                    return False
+                raise BusyLockException("Lock already acquired for key(s) {}".format(
+                    ', '.join("'{}'".format(k) for k in self.keys)))
+            if delay > 0:
+                time.sleep(delay)
+            attempts += 1
+        self.acquire_time = time.time()
+        self.observer.acquired(self.observed_key, attempts, self.acquire_time - start)
+        return True
+
+    def attempt(self):
+        """
+        Used internally - a single attempt at taking every key's lease: one upsert per key, which only writes a row
+        that's missing or expired. Several keys are upserted in one transaction, and rolled back unless every one of
+        them was taken.
+
+        :returns: Whether the lock was acquired
+        :rtype: bool
+        """
+        conn = self.connection()
+        now = time.time()
+        sql = ('INSERT INTO {0} (key, owner, expires) VALUES (?, ?, ?) '
+               'ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires '
+               'WHERE {0}.expires <= ?').format(self.table)
+        rows = [(key, self.lock_id, now + self.timeout, now) for key in self.keys]
+        if len(rows) == 1:
+            return conn.execute(sql, rows[0]).rowcount == 1
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            before = conn.total_changes
+            conn.executemany(sql, rows)
+            if conn.total_changes - before == len(rows):
+                conn.execute('COMMIT')
+                return True
+        except:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('ROLLBACK')
+        return False
+
+    def release(self):
+        """
+        Release the lock, deleting every lease we still own in a single statement.
+        """
+        if self.acquire_time is not None:
+            self.observer.released(self.observed_key, time.time() - self.acquire_time)
+            self.acquire_time = None
+        sql = 'DELETE FROM {} WHERE owner = ? AND key IN ({})'.format(self.table, ', '.join('?' * len(self.keys)))
+        self.connection().execute(sql, [self.lock_id] + list(self.keys))
+
+    def connection(self):
+        """
+        Used internally - this thread's connection to the database.
+        """
+        return connection(self.path, self.table, self.busy_timeout)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class SQLiteMultiLock(SQLiteLock):
+    """
+    A lease on every one of `keys`, all taken in a single transaction (or none at all) and all released in a single
+    statement. Takes the same keyword arguments as :py:class:`SQLiteLock`.
+
+    :param keys: What to lock
+    :type keys: list
+    """
+
+    def __init__(self, keys, **kwargs):
+        super(SQLiteMultiLock, self).__init__(None, **kwargs)
+        self.keys = []
+        for key in keys:
+            if key not in self.keys:
+                self.keys.append(key)
+        self.observed_key = self.keys[0] if self.keys else None
@@ -0,0 +1,89 @@
+"""
+A table of process local locks, one per key, created on demand and thrown away as soon as nobody holds or waits for
+them - so there are only ever as many locks as there are keys in use.
+"""
+
+import threading
+import time
+
+
+class _Entry(object):
+    __slots__ = ('held', 'refs', 'cond')
+
+    def __init__(self, cond):
+        self.held = False
+        self.refs = 0
+        self.cond = cond
+
+
+class LocalLockTable(object):
+    """
+    Process local, non-reentrant locks keyed by anything hashable. All entries share one mutex, each has its own
+    condition so a release only wakes up the threads waiting on that key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def acquire(self, key, blocking=True, timeout=None):
+        """
+        Acquire the lock for `key`.
+
+        :param blocking: Whether to wait for the lock if it's held. Defaults to `True`
+        :type blocking: bool
+        :param timeout: The most seconds to wait, or `None` to wait as long as it takes.
+        :type timeout: float
+        :returns: Whether the lock was acquired
+        :rtype: bool
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(threading.Condition(self._lock))
+            entry.refs += 1
+
+            if entry.held and blocking:
+                deadline = None if timeout is None else time.time() + timeout
+                while entry.held:
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    entry.cond.wait(remaining)
+
+            if entry.held:
+                self._unref(key, entry)
+                return False
+            entry.held = True
+            return True
+
+    def release(self, key):
+        """
+        Release the lock for `key`, handing it to the next waiter if there is one.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.held:
+                raise RuntimeError("release of unlocked key {!r}".format(key))
+            entry.held = False
+            entry.cond.notify()
+            self._unref(key, entry)
+
+    def locked(self, key):
+        """
+        Whether the lock for `key` is held.
+
+        :rtype: bool
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.held
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _unref(self, key, entry):
+        entry.refs -= 1
+        if not entry.refs:
+            del self._entries[key]
@@ -0,0 +1,215 @@
+"""
+Hooks for finding out what locks are up to: how long their round trips take, how many attempts it takes to acquire
+them, how often they're busy or stale and how long they're held.
+
+Locks report to an :py:class:`ILockObserver`, looked up by name like everything else. Unless told otherwise (with the
+`observer` argument) locks use the one named `default`, which does nothing. To keep in-memory histograms for every
+lock instead::
+
+    from padlock import registry
+    from padlock.metrics import ILockObserver
+    registry.register(ILockObserver, 'default', registry.lookup(ILockObserver, 'memory'))
+
+and have a look at ``registry.lookup(ILockObserver, 'memory').snapshot()`` every now and then.
+"""
+
+import bisect
+import threading
+from zope.interface import Interface, implements
+from padlock import registry
+
+
+class ILockObserver(Interface):
+    """
+    Told about everything that happens to a lock. `key` is the row key (or the first of them, for locks on many rows).
+    Implementations must be thread safe and should be quick, they're called on the lock's hot path.
+    """
+    def round_trip(self, phase, key, seconds):
+        """
+        A round trip to the lock's backend took `seconds`. `phase` is one of ``'insert'``, ``'verify'``,
+        ``'release'`` or ``'renew'``.
+        """
+
+    def busy(self, key):
+        """
+        An attempt at acquiring the lock found it held by someone else.
+        """
+
+    def stale(self, key, count):
+        """
+        An attempt at acquiring the lock came across `count` stale locks.
+        """
+
+    def acquired(self, key, attempts, seconds):
+        """
+        The lock was acquired after `attempts` attempts, taking `seconds` in all.
+        """
+
+    def failed(self, key, attempts, seconds):
+        """
+        Gave up acquiring the lock after `attempts` attempts, taking `seconds` in all.
+        """
+
+    def released(self, key, seconds):
+        """
+        The lock was released after being held for `seconds`.
+        """
+
+
+class NoopLockObserver(object):
+    """
+    Ignores everything.
+    """
+    implements(ILockObserver)
+
+    def round_trip(self, phase, key, seconds):
+        pass
+
+    def busy(self, key):
+        pass
+
+    def stale(self, key, count):
+        pass
+
+    def acquired(self, key, attempts, seconds):
+        pass
+
+    def failed(self, key, attempts, seconds):
+        pass
+
+    def released(self, key, seconds):
+        pass
+
+
+class Histogram(object):
+    """
+    A thread safe histogram with exponentially growing buckets (each `factor` times wider than the last, starting at
+    `lowest`), so recording is a binary search over a few dozen bounds and percentiles are accurate to within a bucket.
+    """
+
+    def __init__(self, lowest=1e-5, factor=1.5, buckets=48):
+        self.bounds = [lowest * factor ** i for i in xrange(buckets)]
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, p):
+        """
+        The upper bound of the bucket holding the `p` th percentile (`p` between 0 and 100), or `None` if nothing has
+        been recorded. Never more than the largest value recorded.
+        """
+        with self._lock:
+            if not self.count:
+                return None
+            rank = p / 100.0 * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank and n:
+                    return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+            return self.max
+
+    def summary(self):
+        """
+        :returns: The count, mean, p50, p99 and max
+        :rtype: dict
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+def default_key_prefix(key):
+    """
+    Groups keys by whatever comes before the first colon, eg: ``account:1234`` is reported as ``account``. Keys
+    without a colon are all grouped together as ``*``.
+    """
+    if key is None:
+        return '*'
+    prefix, sep, _ = str(key).partition(':')
+    return prefix if sep else '*'
+
+
+class InMemoryLockObserver(object):
+    """
+    Keeps :py:class:`Histogram` s of round trip latencies (per phase), attempts per acquire, time to acquire and
+    hold times, along with counts of busy and stale locks, all grouped by key prefix.
+
+    :param key_prefix: Maps a row key to the group it's reported under. Defaults to :py:func:`default_key_prefix`
+    :type key_prefix: callable
+    """
+    implements(ILockObserver)
+
+    def __init__(self, key_prefix=default_key_prefix):
+        self.key_prefix = key_prefix
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, prefix, name, **kwargs):
+        try:
+            return self.histograms[(prefix, name)]
+        except KeyError:
+            with self._lock:
+                return self.histograms.setdefault((prefix, name), Histogram(**kwargs))
+
+    def increment(self, prefix, name, n=1):
+        with self._lock:
+            self.counters[(prefix, name)] = self.counters.get((prefix, name), 0) + n
+
+    def round_trip(self, phase, key, seconds):
+        self.histogram(self.key_prefix(key), phase).record(seconds)
+
+    def busy(self, key):
+        self.increment(self.key_prefix(key), 'busy')
+
+    def stale(self, key, count):
+        self.increment(self.key_prefix(key), 'stale', count)
+
+    def acquired(self, key, attempts, seconds):
+        prefix = self.key_prefix(key)
+        self.increment(prefix, 'acquired')
+        self.histogram(prefix, 'attempts', lowest=1, factor=2, buckets=16).record(attempts)
+        self.histogram(prefix, 'acquire').record(seconds)
+
+    def failed(self, key, attempts, seconds):
+        self.increment(self.key_prefix(key), 'failed')
+
+    def released(self, key, seconds):
+        self.histogram(self.key_prefix(key), 'held').record(seconds)
+
+    def snapshot(self):
+        """
+        Everything recorded so far, eg: ``{'account': {'acquired': 10, 'busy': 3, 'verify': {'p50': ...}, ...}}``
+
+        :rtype: dict
+        """
+        res = {}
+        with self._lock:
+            histograms = self.histograms.items()
+            counters = self.counters.items()
+        for (prefix, name), histogram in histograms:
+            res.setdefault(prefix, {})[name] = histogram.summary()
+        for (prefix, name), count in counters:
+            res.setdefault(prefix, {})[name] = count
+        return res
+
+
+registry.register(ILockObserver, 'noop', NoopLockObserver, factory=True)
+registry.register(ILockObserver, 'default', NoopLockObserver, factory=True)
+registry.register(ILockObserver, 'memory', InMemoryLockObserver, factory=True)
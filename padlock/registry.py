@@ -0,0 +1,109 @@
+"""
+A small, lazy registry of named components (lock classes, retry policies and so on).
+
+Components are registered by dotted name and are only imported the first time somebody asks for them, so
+``import padlock`` doesn't drag in every backend (and its dependencies) or parse any ZCML. Resolved components are
+cached, so every lookup after the first is a single dictionary access.
+
+Anything not found in the registry is looked up in the zope global site manager, which means utilities registered
+through ZCML (see :py:func:`padlock.load_zcml`) or :py:func:`padlock.interface_utils.utility` keep working.
+"""
+
+import sys
+import threading
+
+# reentrant, resolving a component imports modules which may register components of their own
+_lock = threading.RLock()
+
+# (interface, name) -> (component or dotted name, whether the component is a factory)
+_components = {}
+
+# (interface, name) -> resolved component
+_resolved = {}
+
+# whether registrations in the zope global site manager take precedence over ours
+_zope_first = False
+
+
+def register(iface, name, component, factory=False):
+    """
+    Register a component providing `iface` under `name`.
+
+    :param iface: The interface the component provides
+    :param name: The name it will be looked up by
+    :type name: str
+    :param component: The component itself, or the dotted name of it (``'package.module.attribute'``) which will be
+        imported on the first lookup.
+    :param factory: Whether `component` should be called (once) to create the utility, like the `factory` attribute
+        of a ZCML `utility` directive.
+    :type factory: bool
+    """
+    with _lock:
+        _components[(iface, name)] = (component, factory)
+        _resolved.pop((iface, name), None)
+
+
+def lookup(iface, name):
+    """
+    Return the component providing `iface` registered under `name`, importing and caching it on first use.
+
+    :raises zope.component.interfaces.ComponentLookupError: if nothing is registered under that name
+    """
+    try:
+        return _resolved[(iface, name)]
+    except KeyError:
+        pass
+
+    with _lock:
+        if (iface, name) in _resolved:
+            return _resolved[(iface, name)]
+
+        component = _query_zope(iface, name) if _zope_first else None
+        if component is None:
+            try:
+                component, factory = _components[(iface, name)]
+            except KeyError:
+                from zope.component import getUtility
+                component = getUtility(iface, name)
+            else:
+                if isinstance(component, basestring):
+                    component = resolve(component)
+                if factory:
+                    component = component()
+
+        _resolved[(iface, name)] = component
+        return component
+
+
+def names(iface):
+    """
+    The names of every component registered for `iface` in this registry.
+
+    :rtype: list
+    """
+    return sorted(name for i, name in _components if i is iface)
+
+
+def resolve(dotted_name):
+    """
+    Import and return the object named by `dotted_name`, eg: ``'padlock.distributed.cassandra.BusyLockException'``
+    """
+    module_name, _, attr = dotted_name.rpartition('.')
+    __import__(module_name)
+    return getattr(sys.modules[module_name], attr)
+
+
+def prefer_zope():
+    """
+    Make registrations in the zope global site manager take precedence over the ones in this registry, and forget
+    anything resolved so far. Called by :py:func:`padlock.load_zcml`.
+    """
+    global _zope_first
+    with _lock:
+        _zope_first = True
+        _resolved.clear()
+
+
+def _query_zope(iface, name):
+    from zope.component import queryUtility
+    return queryUtility(iface, name)
@@ -0,0 +1,282 @@
+"""
+An in-memory stand-in for a pycassa `ColumnFamily`, good enough to drive the cassandra lock recipes without a cluster.
+
+It implements the subset of the pycassa API the locks use (slicing `get`, `multiget`, `get_range`, `insert`, `remove`
+and `batch`), honours column TTLs and counts round trips (in total and per consistency level, eg: `reads_QUORUM`) and
+columns read in :py:attr:`FakeColumnFamily.stats` so tests and benchmarks can reason about how much work each lock
+operation does.
+
+To get a feel for how the locks behave over a real network, every round trip can be made to take `latency` seconds
+(plus up to `jitter` more, at random), and writes can be made to take `replication_delay` seconds to become visible
+to reads, like a write at `ONE` followed by a read from another replica.
+
+Consistency levels are modelled on three replicas, each answering after `latency` plus its own share of `jitter`: a
+request waits for as many replicas as its consistency level needs (one for `ONE`, two for `QUORUM`, all three for
+`ALL`...), so stronger levels take longer. A write is visible to a read right away, rather than after the
+`replication_delay`, when the two levels together cover more than the three replicas (`QUORUM` writes then `QUORUM`
+reads, say). The default level for both is `ONE`, like pycassa's.
+
+Removed columns, and columns whose TTL ran out, leave tombstones behind like they do in cassandra, until
+`gc_grace_seconds` have passed (or :py:meth:`FakeColumnFamily.compact` is called). Writing a column again shadows
+its tombstone. Slices count the tombstones they have to scan past in `tombstones_scanned`.
+"""
+
+import collections
+import random
+import threading
+import time
+from pycassa import NotFoundException
+from pycassa.cassandra.ttypes import ConsistencyLevel
+
+
+REPLICAS = 3
+
+# how many of the replicas each consistency level waits for
+_replicas_needed = {
+    ConsistencyLevel.ANY: 1,
+    ConsistencyLevel.ONE: 1,
+    ConsistencyLevel.TWO: 2,
+    ConsistencyLevel.THREE: 3,
+    ConsistencyLevel.QUORUM: REPLICAS // 2 + 1,
+    ConsistencyLevel.LOCAL_QUORUM: REPLICAS // 2 + 1,
+    ConsistencyLevel.EACH_QUORUM: REPLICAS // 2 + 1,
+    ConsistencyLevel.ALL: REPLICAS,
+}
+
+
+class FakeColumnFamily(object):
+    """
+    A thread safe, in-memory column family with a `BytesType` comparator.
+
+    :param column_family: The name of the column family
+    :type column_family: str
+    :param latency: How many seconds every round trip takes. Defaults to `0`
+    :type latency: float
+    :param jitter: Up to how many more seconds, at random, a round trip takes. Defaults to `0`
+    :type jitter: float
+    :param replication_delay: How many seconds before a write can be read at a consistency level that doesn't
+        overlap the write's. Defaults to `0`
+    :type replication_delay: float
+    :param read_consistency_level: The default consistency level of reads. Defaults to `ONE`
+    :param write_consistency_level: The default consistency level of writes. Defaults to `ONE`
+    :param gc_grace_seconds: How many seconds tombstones are kept for, or `None` to keep them until
+        :py:meth:`compact` is called. Defaults to `None`
+    :type gc_grace_seconds: float
+    """
+
+    def __init__(self, column_family='FakeCF', latency=0, jitter=0, replication_delay=0,
+                 read_consistency_level=ConsistencyLevel.ONE, write_consistency_level=ConsistencyLevel.ONE,
+                 gc_grace_seconds=None):
+        self.column_family = column_family
+        self.latency = latency
+        self.jitter = jitter
+        self.replication_delay = replication_delay
+        self.read_consistency_level = read_consistency_level
+        self.write_consistency_level = write_consistency_level
+        self.gc_grace_seconds = gc_grace_seconds
+        self.rows = {}
+        # {key: {column name: when the tombstone can be purged, or None}}
+        self.tombstones = {}
+        self.stats = collections.Counter()
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+
+    def get(self, key, columns=None, column_start='', column_finish='', column_reversed=False, column_count=100,
+            include_timestamp=False, super_column=None, read_consistency_level=None, include_ttl=False):
+        level = self._read(read_consistency_level)
+        with self._lock:
+            self._replicate(level)
+            cols = self._slice(key, columns, column_start, column_finish, column_reversed, column_count)
+        if not cols:
+            raise NotFoundException()
+        return cols
+
+    def multiget(self, keys, columns=None, column_start='', column_finish='', column_reversed=False, column_count=100,
+                 include_timestamp=False, super_column=None, read_consistency_level=None, buffer_size=None,
+                 include_ttl=False):
+        res = collections.OrderedDict()
+        level = self._read(read_consistency_level)
+        with self._lock:
+            self._replicate(level)
+            for key in keys:
+                cols = self._slice(key, columns, column_start, column_finish, column_reversed, column_count)
+                if cols:
+                    res[key] = cols
+        return res
+
+    def get_range(self, start='', finish='', columns=None, column_start='', column_finish='', column_reversed=False,
+                  column_count=100, row_count=None, include_timestamp=False, super_column=None,
+                  read_consistency_level=None, buffer_size=None, filter_empty=True, include_ttl=False):
+        buffer_size = buffer_size or 1024
+        returned = 0
+        while True:
+            level = self._read(read_consistency_level)
+            with self._lock:
+                self._replicate(level)
+                keys = sorted(k for k in self.rows if (not start or k >= start) and (not finish or k <= finish))
+                page = [(k, self._slice(k, columns, column_start, column_finish, column_reversed, column_count))
+                        for k in keys[:buffer_size]]
+            for key, cols in page:
+                if cols or not filter_empty:
+                    yield key, cols
+                    returned += 1
+                    if row_count is not None and returned >= row_count:
+                        return
+            if len(keys) <= buffer_size:
+                return
+            # like pycassa, page on from the last key seen (which is skipped, it's already been returned)
+            start = keys[buffer_size - 1] + '\0'
+
+    def insert(self, key, columns, timestamp=None, ttl=None, write_consistency_level=None):
+        self._write([('insert', key, columns, ttl)], write_consistency_level)
+
+    def remove(self, key, columns=None, super_column=None, write_consistency_level=None, timestamp=None,
+               counter=None):
+        self._write([('remove', key, columns, None)], write_consistency_level)
+
+    def batch(self, queue_size=100, write_consistency_level=None, atomic=None):
+        return FakeMutator(self, queue_size, write_consistency_level)
+
+    def compact(self):
+        """
+        Purge every tombstone, as if `gc_grace_seconds` had passed and everything had been compacted.
+        """
+        with self._lock:
+            self.tombstones.clear()
+
+    def _round_trip(self, replicas):
+        if self.jitter:
+            # the coordinator answers once the slowest of the replicas it waits for has
+            delay = self.latency + sorted(random.uniform(0, self.jitter) for _ in xrange(REPLICAS))[replicas - 1]
+        else:
+            delay = self.latency
+        if delay:
+            time.sleep(delay)
+
+    def _read(self, level):
+        level = level if level is not None else self.read_consistency_level
+        self._round_trip(_replicas_needed[level])
+        with self._lock:
+            self.stats['reads'] += 1
+            self.stats['reads_' + ConsistencyLevel._VALUES_TO_NAMES[level]] += 1
+        return _replicas_needed[level]
+
+    def _write(self, mutations, level=None):
+        level = level if level is not None else self.write_consistency_level
+        replicas = _replicas_needed[level]
+        self._round_trip(replicas)
+        with self._lock:
+            self.stats['writes'] += 1
+            self.stats['writes_' + ConsistencyLevel._VALUES_TO_NAMES[level]] += 1
+            if self.replication_delay and replicas < REPLICAS:
+                self._pending.append((time.time() + self.replication_delay, replicas, mutations))
+            else:
+                self._apply(mutations)
+
+    def _replicate(self, replicas=1):
+        # writes are applied in order, each one once it's replicated or a read overlaps the replicas it reached
+        now = time.time()
+        while self._pending and (self._pending[0][0] <= now or self._pending[0][1] + replicas > REPLICAS):
+            self._apply(self._pending.popleft()[2])
+
+    def _apply(self, mutations):
+        for op, key, cols, ttl in mutations:
+            if op == 'insert':
+                self._insert(key, cols, ttl)
+            else:
+                self._remove(key, cols)
+
+    def _insert(self, key, columns, ttl):
+        expires = None if ttl is None else time.time() + ttl
+        row = self.rows.setdefault(key, {})
+        tombstones = self.tombstones.get(key, {})
+        for name, value in columns.iteritems():
+            row[name] = (value, expires)
+            tombstones.pop(name, None)
+
+    def _remove(self, key, columns):
+        row = self.rows.get(key, {})
+        if columns is None:
+            # a single row tombstone covers everything
+            row.clear()
+            self.tombstones.pop(key, None)
+        for name in columns or ():
+            row.pop(name, None)
+            self._bury(key, name, time.time())
+        if not row:
+            self.rows.pop(key, None)
+
+    def _bury(self, key, name, when):
+        purge = None if self.gc_grace_seconds is None else when + self.gc_grace_seconds
+        self.tombstones.setdefault(key, {})[name] = purge
+
+    def _slice(self, key, columns, column_start, column_finish, column_reversed, column_count):
+        now = time.time()
+        row = self.rows.get(key, {})
+        for name, (_, expires) in row.items():
+            if expires is not None and expires <= now:
+                # expired columns are tombstones until they're purged
+                del row[name]
+                self._bury(key, name, expires)
+        tombstones = self.tombstones.get(key, {})
+        for name, purge in tombstones.items():
+            if purge is not None and purge <= now:
+                del tombstones[name]
+
+        if columns is not None:
+            names = [n for n in columns if n in row]
+            self.stats['tombstones_scanned'] += sum(1 for n in columns if n in tombstones)
+        else:
+            low, high = (column_finish, column_start) if column_reversed else (column_start, column_finish)
+            names = []
+            for name in sorted(set(row) | set(tombstones), reverse=column_reversed):
+                if (low and name < low) or (high and name > high):
+                    continue
+                if len(names) >= int(column_count):
+                    break
+                if name in row:
+                    names.append(name)
+                else:
+                    self.stats['tombstones_scanned'] += 1
+
+        self.stats['columns_read'] += len(names)
+        return collections.OrderedDict((n, row[n][0]) for n in names)
+
+
+class FakeMutator(object):
+    """
+    The :py:class:`FakeColumnFamily` equivalent of a `pycassa.batch.CfMutator`. Everything queued is applied
+    atomically, in a single round trip, when :py:meth:`send` is called (or when `queue_size` operations are queued).
+    """
+
+    def __init__(self, column_family, queue_size=100, write_consistency_level=None):
+        self.column_family = column_family
+        self.limit = queue_size
+        self.write_consistency_level = write_consistency_level
+        self._buffer = []
+
+    def insert(self, key, cols, timestamp=None, ttl=None):
+        if cols:
+            self._enqueue(('insert', key, cols, ttl))
+        return self
+
+    def remove(self, key, columns=None, super_column=None, timestamp=None):
+        self._enqueue(('remove', key, columns, None))
+        return self
+
+    def send(self, write_consistency_level=None, atomic=None):
+        if not self._buffer:
+            return
+        buffer, self._buffer = self._buffer, []
+        self.column_family._write(buffer, write_consistency_level or self.write_consistency_level)
+
+    def _enqueue(self, mutation):
+        self._buffer.append(mutation)
+        if self.limit and len(self._buffer) >= self.limit:
+            self.send()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.send()
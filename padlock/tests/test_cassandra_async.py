@@ -0,0 +1,77 @@
+import unittest
+import trollius as asyncio
+from concurrent.futures import ThreadPoolExecutor
+from trollius import From
+from padlock.distributed.cassandra import BusyLockException
+from padlock.distributed.cassandra_async import AsyncCassandraDistributedRowLock
+from padlock.distributed.retry_policy import ExponentialBackoffPolicy
+from padlock.tests.test_cassandra_row_lock import CassandraLockTestCase
+
+
+class AsyncCassandraRowLockTestCase(CassandraLockTestCase):
+    lock_class = AsyncCassandraDistributedRowLock
+
+    def setUp(self):
+        super(AsyncCassandraRowLockTestCase, self).setUp()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def lock(self, cls=None, key='row', **kwargs):
+        kwargs.setdefault('loop', self.loop)
+        return super(AsyncCassandraRowLockTestCase, self).lock(cls, key, **kwargs)
+
+    def test_busy(self):
+        l1, l2 = self.lock(), self.lock()
+
+        @asyncio.coroutine
+        def go():
+            yield From(l1.acquire())
+            try:
+                yield From(l2.acquire())
+            finally:
+                yield From(l1.release())
+
+        self.assertRaises(BusyLockException, self.loop.run_until_complete, go())
+        self.assertEqual({}, self.cf.rows)
+
+    def test_cancelled_acquire_rolls_back(self):
+        self.cf.latency = 0.05
+        executor = ThreadPoolExecutor(max_workers=2)
+        task = asyncio.Task(self.lock(executor=executor).acquire(), loop=self.loop)
+        self.loop.run_until_complete(asyncio.sleep(0.01, loop=self.loop))
+        task.cancel()
+        self.assertRaises(asyncio.CancelledError, self.loop.run_until_complete, task)
+        executor.shutdown(wait=True)
+        self.assertEqual({}, self.cf.rows)
+
+    def test_failed_acquire_gives_its_lock_id_back(self):
+        l1, l2 = self.lock(layout='overwrite'), self.lock(layout='overwrite')
+        self.loop.run_until_complete(l1.acquire())
+        self.assertRaises(BusyLockException, self.loop.run_until_complete, l2.acquire())
+        self.assertEqual(None, l2.lock.lock_id)
+        self.loop.run_until_complete(l1.release())
+        self.assertEqual(None, l1.lock.lock_id)
+
+    def test_reentrant_refused(self):
+        self.assertRaises(ValueError, self.lock, reentrant=True)
+
+    def test_many_waiters_share_the_loop(self):
+        held, inside = [], []
+
+        @asyncio.coroutine
+        def work(i):
+            lock = self.lock(backoff_policy=ExponentialBackoffPolicy(base=0.001, cap=0.01, max_attempts=None))
+            yield From(lock.acquire())
+            try:
+                inside.append(i)
+                held.append(len(inside))
+                yield From(asyncio.sleep(0.001, loop=self.loop))
+            finally:
+                inside.remove(i)
+                yield From(lock.release())
+
+        self.loop.run_until_complete(asyncio.wait([work(i) for i in xrange(20)], loop=self.loop))
+        self.assertEqual([1] * 20, held)
+        self.assertEqual({}, self.cf.rows)
@@ -0,0 +1,647 @@
+import threading
+import time
+import unittest
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.distributed import lock_values
+from padlock.distributed.cassandra import (
+    CassandraDistributedRowLock, CassandraDistributedMultiRowLock, CassandraDistributedReadWriteLock,
+    CassandraDistributedSemaphore, CassandraDistributedQueuedLock, BusyLockException, LostLockException,
+    release_leases
+)
+from time_uuid import TimeUUID
+from padlock.distributed.retry_policy import FixedAttemptsPolicy, ExponentialBackoffPolicy
+from padlock.tests.fake_cassandra import FakeColumnFamily
+from padlock.tests.test_retry_policy import AllowRetryPolicy
+
+
+class CassandraLockTestCase(unittest.TestCase):
+    """
+    Locks on a fresh, in-memory :py:class:`FakeColumnFamily` for every test, at `ONE`. :py:meth:`lock` makes a
+    `lock_class`, on row `'row'` unless given another `key`, with `lock_kwargs` unless they're given too.
+    """
+    lock_class = CassandraDistributedRowLock
+    lock_kwargs = {}
+
+    def setUp(self):
+        self.cf = FakeColumnFamily()
+
+    def lock(self, cls=None, key='row', **kwargs):
+        for k, v in self.lock_kwargs.iteritems():
+            kwargs.setdefault(k, v)
+        kwargs.setdefault('consistency_level', ConsistencyLevel.ONE)
+        return (cls or self.lock_class)(None, self.cf, key, **kwargs)
+
+
+class CassandraRowLockTestCase(CassandraLockTestCase):
+    """
+    The row lock, exercised against the in-memory :py:class:`FakeColumnFamily`.
+    """
+
+    def test_acquire_release(self):
+        l = self.lock()
+        with l:
+            self.assertEqual([l.lock_column], l.read_lock_columns().keys())
+        self.assertEqual({}, l.read_lock_columns())
+
+    def test_busy(self):
+        l1, l2 = self.lock(), self.lock()
+        with l1:
+            self.assertRaises(BusyLockException, l2.acquire)
+        with l2:
+            pass
+
+    def test_policy_without_next_delay(self):
+        with self.lock(coalesce=True):
+            self.cf.stats.clear()
+            self.assertRaises(BusyLockException, self.lock(backoff_policy=AllowRetryPolicy(attempts=3)).acquire)
+            self.assertEqual(3, self.cf.stats['reads'])
+            self.assertRaises(BusyLockException, self.lock(backoff_policy=AllowRetryPolicy(), coalesce=True).acquire)
+            self.assertEqual(3, self.cf.stats['reads'])
+
+    def test_ignores_data_columns(self):
+        self.cf.insert('row', dict(('col%04d' % i, 'not a number') for i in xrange(500)))
+        self.cf.insert('row', {'zzz': 'also not a number'})
+        l = self.lock()
+        with l:
+            self.cf.stats.clear()
+            self.assertEqual([l.lock_column], l.read_lock_columns().keys())
+            self.assertEqual(1, self.cf.stats['columns_read'])
+        self.assertEqual(501, len(self.cf.rows['row']))
+
+    def test_pages_through_lock_columns(self):
+        self.cf.insert('row', dict(('_lock_%04d' % i, '0') for i in xrange(25)))
+        l = self.lock(page_size=10)
+        self.assertEqual(25, len(l.read_lock_columns()))
+        self.assertEqual(3, self.cf.stats['reads'])
+
+
+class CassandraRowLockBlockingAcquireTestCase(CassandraLockTestCase):
+
+    def test_non_blocking(self):
+        lock = self.lock()
+        self.assertTrue(lock.acquire(blocking=False))
+        self.assertFalse(self.lock().acquire(blocking=False))
+        self.assertEqual([lock.lock_column], self.cf.rows['row'].keys())
+        lock.release()
+        self.assertTrue(self.lock().acquire(blocking=False))
+
+    def test_timeout(self):
+        self.lock().acquire()
+        start = time.time()
+        self.assertFalse(self.lock().acquire(timeout=0.05))
+        self.assertTrue(0.05 <= time.time() - start < 0.5)
+
+    def test_wakes_when_the_holder_goes_stale(self):
+        self.lock(timeout=0.1).acquire()
+        start = time.time()
+        # the backoff alone would wait a second
+        contender = self.lock(backoff_policy=ExponentialBackoffPolicy(base=1, cap=1, jitter=None))
+        self.assertTrue(contender.acquire(blocking=True))
+        self.assertTrue(0.09 <= time.time() - start < 0.3)
+        self.assertEqual(2, contender.stats['reads'])
+
+    def test_expiry_cuts_waits_short(self):
+        self.lock(timeout=0.05).acquire()
+        contender = self.lock(backoff_policy=FixedAttemptsPolicy(attempts=2, delay=5))
+        start = time.time()
+        contender.acquire()
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertEqual(2, contender.stats['reads'])
+
+    def test_semaphore_and_queue(self):
+        holder = self.lock(CassandraDistributedSemaphore, permits=1, timeout=0.05)
+        holder.acquire()
+        self.assertFalse(self.lock(CassandraDistributedSemaphore, permits=1).acquire(blocking=False))
+        self.assertTrue(self.lock(CassandraDistributedSemaphore, permits=1).acquire(timeout=1))
+
+        holder = self.lock(CassandraDistributedQueuedLock, key='queue', timeout=0.05)
+        holder.acquire()
+        waiter = self.lock(CassandraDistributedQueuedLock, key='queue')
+        self.assertFalse(waiter.acquire(timeout=0.01))
+        self.assertEqual([holder.lock_column], self.cf.rows['queue'].keys())
+        self.assertTrue(waiter.acquire(timeout=1))
+
+
+class CassandraRowLockConsistencyTestCase(unittest.TestCase):
+    def test_per_phase_levels(self):
+        cf = FakeColumnFamily()
+        with CassandraDistributedRowLock(None, cf, 'row', consistency_level=ConsistencyLevel.QUORUM,
+                                         release_consistency_level=ConsistencyLevel.ONE):
+            pass
+        self.assertEqual((1, 1, 1), (cf.stats['writes_QUORUM'], cf.stats['reads_QUORUM'], cf.stats['writes_ONE']))
+
+        cf.stats.clear()
+        with CassandraDistributedMultiRowLock(None, cf, ['a', 'b'], consistency_level=ConsistencyLevel.ONE,
+                                              verify_consistency_level=ConsistencyLevel.ALL):
+            pass
+        self.assertEqual((2, 1), (cf.stats['writes_ONE'], cf.stats['reads_ALL']))
+
+    def test_quorum_lock_sees_unreplicated_quorum_lock(self):
+        cf = FakeColumnFamily(replication_delay=10)
+        kwargs = dict(consistency_level=ConsistencyLevel.QUORUM, release_consistency_level=ConsistencyLevel.ONE)
+        with CassandraDistributedRowLock(None, cf, 'row', **kwargs):
+            self.assertRaises(BusyLockException, CassandraDistributedRowLock(None, cf, 'row', **kwargs).acquire)
+            # at ONE, neither write nor read reach a common replica
+            weak = CassandraDistributedRowLock(None, cf, 'other', consistency_level=ConsistencyLevel.ONE)
+            weak.acquire()
+            CassandraDistributedRowLock(None, cf, 'other', consistency_level=ConsistencyLevel.ONE).acquire()
+
+
+class CassandraRowLockOverwriteLayoutTestCase(CassandraLockTestCase):
+    lock_kwargs = {'layout': 'overwrite'}
+
+    def test_no_tombstones(self):
+        for _ in xrange(20):
+            with self.lock():
+                self.assertRaises(BusyLockException, self.lock().acquire)
+        with self.lock(CassandraDistributedMultiRowLock, ['row', 'other']):
+            pass
+        self.assertEqual(0, self.cf.stats['tombstones_scanned'])
+        self.assertEqual({}, self.cf.tombstones)
+        # the lock ids are borrowed and given back, so only two lock columns were ever written to the row
+        cols = self.lock().read_lock_columns()
+        self.assertEqual(2, len(cols))
+        self.assertTrue(all(v < 0 for v in cols.values()))
+
+    def test_delete_layout_leaves_tombstones(self):
+        for _ in xrange(20):
+            with CassandraDistributedRowLock(None, self.cf, 'row', consistency_level=ConsistencyLevel.ONE):
+                pass
+        self.assertEqual(20, len(self.cf.tombstones['row']))
+        self.assertTrue(self.cf.stats['tombstones_scanned'] > 100)
+
+    def test_overwrites_stale_columns(self):
+        stale = self.lock(timeout=0.01)
+        stale.acquire()
+        time.sleep(0.02)
+        with self.lock() as l:
+            self.assertEqual(set([stale.lock_column]), l.locks_to_delete)
+        self.assertTrue(all(v < 0 for v in l.read_lock_columns().values()))
+        self.assertEqual({}, self.cf.tombstones)
+        self.assertRaises(LostLockException, stale.renew)
+
+    def test_released_columns_are_ignored_by_other_layouts(self):
+        with self.lock():
+            pass
+        with CassandraDistributedRowLock(None, self.cf, 'row', consistency_level=ConsistencyLevel.ONE,
+                                         fail_on_stale_lock=True) as l:
+            self.assertEqual(set(), l.locks_to_delete)
+
+    def test_ordered_locks_refuse_it(self):
+        self.assertRaises(ValueError, self.lock, CassandraDistributedSemaphore)
+        self.assertRaises(ValueError, self.lock, CassandraDistributedQueuedLock)
+        self.assertRaises(ValueError, self.lock, layout='compact')
+
+
+class CassandraMultiRowLockTestCase(CassandraLockTestCase):
+    lock_class = CassandraDistributedMultiRowLock
+
+    def setUp(self):
+        super(CassandraMultiRowLockTestCase, self).setUp()
+        self.keys = ['row%03d' % i for i in xrange(250)]
+
+    def test_two_round_trips(self):
+        l = self.lock(key=self.keys)
+        l.acquire()
+        self.assertEqual(1, self.cf.stats['writes'])
+        self.assertEqual(1, self.cf.stats['reads'])
+        self.assertEqual(set(self.keys), set(l.read_lock_columns()))
+        l.release()
+        self.assertEqual(2, self.cf.stats['writes'])
+        self.assertEqual({}, l.read_lock_columns())
+
+    def test_all_or_nothing(self):
+        single = CassandraDistributedRowLock(None, self.cf, self.keys[100], consistency_level=ConsistencyLevel.ONE)
+        with single:
+            self.cf.stats.clear()
+            self.assertRaises(BusyLockException, self.lock(key=self.keys).acquire)
+            self.assertEqual(2, self.cf.stats['writes'])
+            self.assertEqual([self.keys[100]], self.cf.rows.keys())
+        with self.lock(key=self.keys):
+            pass
+        self.assertEqual({}, self.cf.rows)
+
+    def test_cleans_up_stale_locks(self):
+        self.cf.insert(self.keys[7], {'_lock_stale': '1'})
+        with self.lock(key=self.keys[:10]) as l:
+            self.assertEqual({self.keys[7]: set(['_lock_stale'])},
+                             dict((k, v) for k, v in l.locks_to_delete.iteritems() if v))
+        self.assertEqual({}, self.cf.rows)
+
+
+class CassandraRowLockRenewalTestCase(CassandraLockTestCase):
+
+    def test_renew(self):
+        l = self.lock(timeout=0.2)
+        with l:
+            time.sleep(0.15)
+            l.renew()
+            time.sleep(0.15)
+            self.assertRaises(BusyLockException, self.lock().acquire)
+            time.sleep(0.1)
+            self.assertRaises(LostLockException, l.renew)
+            self.assertTrue(l.lost)
+
+    def test_background_renewal(self):
+        l = self.lock(timeout=0.2, renew_interval=0.05)
+        with l:
+            time.sleep(0.5)
+            self.assertRaises(BusyLockException, self.lock().acquire)
+            self.assertFalse(l.lost)
+        self.assertEqual({}, self.cf.rows)
+
+    def test_background_renewal_notices_loss(self):
+        lost = threading.Event()
+        l = self.lock(timeout=0.2, renew_interval=0.05, on_lost=lambda lock: lost.set())
+        with l:
+            self.cf.remove('row', [l.lock_column])
+            self.assertTrue(lost.wait(1))
+            self.assertTrue(l.lost)
+
+
+class CassandraRowLockCoalescingTestCase(CassandraLockTestCase):
+    lock_kwargs = {'coalesce': True}
+
+    def test_busy_without_round_trips(self):
+        with self.lock():
+            self.cf.stats.clear()
+            self.assertRaises(BusyLockException, self.lock().acquire)
+            self.assertEqual(0, self.cf.stats['reads'] + self.cf.stats['writes'])
+        with self.lock():
+            pass
+
+    def test_threads_take_turns(self):
+        acquired = []
+
+        def work():
+            for _ in xrange(10):
+                with self.lock(backoff_policy=FixedAttemptsPolicy(attempts=1000, delay=0.01)):
+                    acquired.append(1)
+
+        threads = [threading.Thread(target=work) for _ in xrange(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(80, len(acquired))
+        self.assertEqual(80, self.cf.stats['reads'])
+        self.assertEqual(160, self.cf.stats['writes'])
+
+
+class CassandraRowLockReentrantTestCase(CassandraLockTestCase):
+    lock_kwargs = {'reentrant': True}
+
+    def test_nested_acquires_are_local(self):
+        outer = self.lock()
+        with outer:
+            self.cf.stats.clear()
+            inner = self.lock()
+            with inner:
+                with self.lock():
+                    self.assertEqual([outer.lock_column], self.cf.rows['row'].keys())
+            self.assertEqual(0, self.cf.stats['reads'] + self.cf.stats['writes'])
+            self.assertEqual(1, inner.stats['reentered'])
+            self.assertEqual([outer.lock_column], self.cf.rows['row'].keys())
+        self.assertNotIn('row', self.cf.rows)
+
+    def test_same_lock_twice(self):
+        l = self.lock()
+        l.acquire()
+        l.acquire()
+        l.release()
+        self.assertIn('row', self.cf.rows)
+        l.release()
+        self.assertNotIn('row', self.cf.rows)
+
+    def test_outermost_release_last(self):
+        outer, inner = self.lock(), self.lock()
+        outer.acquire()
+        inner.acquire()
+        outer.release()
+        self.assertRaises(BusyLockException, self.lock(reentrant=False).acquire)
+        inner.release()
+        self.assertNotIn('row', self.cf.rows)
+
+    def test_other_threads_wait(self):
+        results = []
+        with self.lock():
+            t = threading.Thread(target=lambda: results.append(self.lock().acquire(blocking=False)))
+            t.start()
+            t.join()
+        self.assertEqual([False], results)
+
+    def test_not_reentrant(self):
+        with self.lock(reentrant=False):
+            self.assertRaises(BusyLockException, self.lock(reentrant=False).acquire)
+
+    def test_readers_dont_become_writers(self):
+        with self.lock(CassandraDistributedReadWriteLock, shared=True):
+            self.assertFalse(self.lock(CassandraDistributedReadWriteLock).acquire(blocking=False))
+            with self.lock(CassandraDistributedReadWriteLock, shared=True) as reader:
+                self.assertEqual(1, reader.stats['reentered'])
+
+    def test_many_rows_refuse_it(self):
+        self.assertRaises(ValueError, CassandraDistributedMultiRowLock, None, self.cf, ['a', 'b'], reentrant=True)
+
+
+class CassandraRowLockLeaseTestCase(CassandraLockTestCase):
+    lock_kwargs = {'lease_grace': 0.5, 'value_format': 'binary'}
+
+    def tearDown(self):
+        release_leases()
+
+    def test_reacquire_is_local(self):
+        with self.lock() as l:
+            column = l.lock_column
+            self.assertEqual(lock_values.RELEASABLE, lock_values.decode_flags(self.cf.rows['row'][column][0]))
+        self.cf.stats.clear()
+        for _ in xrange(10):
+            with self.lock() as l:
+                self.assertEqual(column, l.lock_column)
+                self.assertEqual(1, l.stats['leased'])
+        self.assertEqual(0, self.cf.stats['reads'] + self.cf.stats['writes'])
+        self.assertEqual([column], self.cf.rows['row'].keys())
+
+    def test_one_reaper(self):
+        threads = threading.active_count()
+        for i in xrange(20):
+            with self.lock(key='row%d' % i):
+                pass
+        self.assertTrue(threading.active_count() <= threads + 1)
+        self.assertEqual(1, len([t for t in threading.enumerate() if t.name == 'padlock-lease-reaper']))
+
+    def test_lapses(self):
+        with self.lock(lease_grace=0.05):
+            pass
+        self.assertIn('row', self.cf.rows)
+        time.sleep(0.15)
+        self.assertNotIn('row', self.cf.rows)
+        with self.lock(lease_grace=0.05) as l:
+            self.assertEqual(0, l.stats['leased'])
+
+    def test_renewed_unless_revoked(self):
+        l = self.lock(lease_grace=0.05)
+        l.acquire()
+        time.sleep(0.06)
+        self.cf.stats.clear()
+        l.release()
+        self.assertEqual(1, l.stats['lease_renewed'])
+        self.assertEqual((1, 1), (self.cf.stats['reads'], self.cf.stats['writes']))
+
+        contender = self.lock(lease_grace=None)
+        self.revoke_elsewhere(contender)
+        self.assertEqual(1, contender.stats['revokes'])
+        self.assertRaises(BusyLockException, self.lock(lease_grace=None).acquire)
+        self.assertEqual(1, len([c for c in self.cf.rows['row'] if 'revoke:' in c]))
+        with self.lock(lease_grace=0.05) as l:
+            self.assertEqual(1, l.stats['leased'])
+            time.sleep(0.06)
+        self.assertEqual(1, l.stats['lease_revoked'])
+        self.assertNotIn('row', self.cf.rows)
+        with contender:
+            pass
+
+    def revoke_elsewhere(self, lock):
+        # locks in this process don't revoke its leases, pretend the contender is elsewhere
+        lock_values.holder, holder = lambda: ('elsewhere', 1), lock_values.holder
+        try:
+            self.assertRaises(BusyLockException, lock.acquire)
+        finally:
+            lock_values.holder = holder
+
+    def test_revoked_lease_lapses(self):
+        with self.lock(lease_grace=0.05):
+            pass
+        self.revoke_elsewhere(self.lock(lease_grace=None))
+        self.assertEqual(1, len([c for c in self.cf.rows['row'] if 'revoke:' in c]))
+        time.sleep(0.15)
+        with self.lock(lease_grace=None):
+            pass
+        self.assertNotIn('row', self.cf.rows)
+
+    def test_expired_revoke_columns_are_removed(self):
+        l = self.lock(lease_grace=None)
+        self.cf.insert('row', {l.revoke_column(l.prefix + 'gone'): lock_values.encode(l.utcnow() - 10 ** 6)})
+        with l:
+            pass
+        self.assertNotIn('row', self.cf.rows)
+
+        with self.lock(lease_grace=0.05) as l:
+            pass
+        self.revoke_elsewhere(self.lock(lease_grace=None))
+        # without a ttl of its own, the revoke column still expires from cassandra
+        self.assertNotEqual(None, self.cf.rows['row'][l.revoke_column(l.lock_column)][1])
+
+    def test_lost_lease_is_not_kept(self):
+        l = self.lock(lease_grace=0.05, timeout=0.1)
+        l.acquire()
+        time.sleep(0.12)
+        l.release()
+        self.assertTrue(l.lost)
+        self.assertNotIn('row', self.cf.rows)
+
+    def test_threads_take_leases_over(self):
+        acquired = []
+
+        def work():
+            for _ in xrange(20):
+                with self.lock(backoff_policy=FixedAttemptsPolicy(attempts=1000, delay=0.001)):
+                    acquired.append(1)
+
+        threads = [threading.Thread(target=work) for _ in xrange(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(80, len(acquired))
+        self.assertEqual(1, len(self.cf.rows['row']))
+
+    def test_release_leases(self):
+        with self.lock():
+            pass
+        self.cf.stats.clear()
+        release_leases()
+        self.assertEqual(1, self.cf.stats['writes'])
+        self.assertNotIn('row', self.cf.rows)
+
+    def test_refused(self):
+        self.assertRaises(ValueError, self.lock, value_format='text')
+        self.assertRaises(ValueError, CassandraDistributedRowLock, None, self.cf, 'row', lease_grace=0.5)
+        self.assertRaises(ValueError, self.lock, layout='overwrite')
+        self.assertRaises(ValueError, self.lock, record_holder=False)
+        self.assertRaises(ValueError, self.lock(timeout=0.5).acquire)
+        for cls in (CassandraDistributedReadWriteLock, CassandraDistributedSemaphore, CassandraDistributedQueuedLock):
+            self.assertRaises(ValueError, self.lock, cls)
+
+
+class CassandraRowLockRoundTripsTestCase(CassandraLockTestCase):
+
+    def test_release_after_failed_acquire(self):
+        l1, l2 = self.lock(), self.lock()
+        with l1:
+            try:
+                l2.acquire()
+            except BusyLockException:
+                pass
+            finally:
+                l2.release()
+        self.assertEqual(2, l2.stats['writes'])
+        self.assertEqual(1, l2.stats['writes_skipped'])
+        self.assertEqual(2, self.cf.stats['writes'] - l1.stats['writes'])
+
+    def test_renew_removes_stale_locks(self):
+        self.cf.insert('row', {'_lock_stale': '1'})
+        l = self.lock()
+        with l:
+            self.assertIn('_lock_stale', self.cf.rows['row'])
+            l.renew()
+            self.assertEqual([l.lock_column], self.cf.rows['row'].keys())
+        self.assertEqual(1, l.stats['stale_folded'])
+        self.assertEqual(3, l.stats['writes'])
+
+
+class CassandraReadWriteLockTestCase(CassandraLockTestCase):
+    lock_class = CassandraDistributedReadWriteLock
+
+    def test_readers_share(self):
+        with self.lock(shared=True):
+            with self.lock(shared=True) as reader:
+                self.assertTrue(reader.lock_column.startswith('_lock_r:'))
+                self.assertRaises(BusyLockException, self.lock(shared=False).acquire)
+
+    def test_writers_exclude(self):
+        with self.lock(shared=False) as writer:
+            self.assertTrue(writer.lock_column.startswith('_lock_w:'))
+            self.assertRaises(BusyLockException, self.lock(shared=True).acquire)
+            self.assertRaises(BusyLockException, self.lock(shared=False).acquire)
+        with self.lock(shared=True):
+            pass
+
+    def test_row_locks_count_as_writers(self):
+        row_lock = CassandraDistributedRowLock(None, self.cf, 'row', consistency_level=ConsistencyLevel.ONE)
+        with row_lock:
+            self.assertRaises(BusyLockException, self.lock(shared=True).acquire)
+        with self.lock(shared=True):
+            self.assertRaises(BusyLockException, row_lock.acquire)
+
+    def test_stale_writers_are_ignored(self):
+        self.cf.insert('row', {'_lock_w:stale': '1'})
+        with self.lock(shared=True) as reader:
+            self.assertEqual(set(['_lock_w:stale']), reader.locks_to_delete)
+        self.assertEqual({}, reader.read_lock_columns())
+
+
+class CassandraSemaphoreTestCase(CassandraLockTestCase):
+    lock_class = CassandraDistributedSemaphore
+    lock_kwargs = {'permits': 3}
+
+    def test_permits(self):
+        holders = [self.lock() for _ in xrange(3)]
+        for h in holders:
+            h.acquire()
+        self.assertRaises(BusyLockException, self.lock().acquire)
+        self.assertEqual(3, len(holders[0].read_lock_columns()))
+        holders[0].release()
+        with self.lock():
+            pass
+        for h in holders[1:]:
+            h.release()
+        self.assertEqual({}, holders[0].read_lock_columns())
+
+    def test_earliest_waiter_keeps_its_place(self):
+        ids = [str(TimeUUID.with_utcnow()) for _ in xrange(3)]
+        holder = self.lock(permits=1, lock_id=ids[2])
+        holder.acquire()
+
+        early = self.lock(permits=1, lock_id=ids[0], backoff_policy=FixedAttemptsPolicy(attempts=100,
+                                                                                            delay=0.01))
+        late = self.lock(permits=1, lock_id=ids[1])
+        waiter = threading.Thread(target=early.acquire)
+        waiter.start()
+        time.sleep(0.03)
+        self.assertRaises(BusyLockException, late.acquire)
+        inserts = early.stats['writes']
+        holder.release()
+        waiter.join()
+
+        self.assertEqual(1, inserts)
+        self.assertEqual([early.lock_column], early.read_lock_columns().keys())
+        early.release()
+
+    def test_waiter_outliving_its_timeout(self):
+        early_id = str(TimeUUID.with_utcnow())
+        with self.lock(permits=1) as holder:
+            # polling often enough to keep its column fresh, and too seldom to keep it from going stale
+            for delay in (0.01, 0.15):
+                waiter = self.lock(permits=1, lock_id=early_id, timeout=0.1,
+                                        backoff_policy=FixedAttemptsPolicy(attempts=int(0.4 / delay), delay=delay))
+                self.assertRaises(BusyLockException, waiter.acquire)
+                self.assertEqual([holder.lock_column], holder.read_lock_columns().keys())
+
+    def test_waiter_whose_column_was_removed(self):
+        early_id = str(TimeUUID.with_utcnow())
+        holder = self.lock(permits=1)
+        holder.acquire()
+        waiter = self.lock(permits=1, lock_id=early_id)
+        self.assertRaises(BusyLockException, waiter.attempt)
+        self.assertTrue(waiter.waiting)
+        # taken for stale by someone whose clock runs ahead
+        self.cf.remove('row', [waiter.lock_column])
+        holder.release()
+        self.assertRaises(BusyLockException, waiter.attempt)
+        waiter.attempt()
+        self.assertEqual([waiter.lock_column], waiter.read_lock_columns().keys())
+        waiter.release()
+
+    def test_gives_up_its_place(self):
+        early_id, late_id = str(TimeUUID.with_utcnow()), str(TimeUUID.with_utcnow())
+        with self.lock(permits=1, lock_id=late_id):
+            early = self.lock(permits=1, lock_id=early_id, backoff_policy=FixedAttemptsPolicy(delay=0))
+            self.assertRaises(BusyLockException, early.acquire)
+            self.assertEqual(1, len(early.read_lock_columns()))
+
+
+class CassandraQueuedLockTestCase(CassandraLockTestCase):
+    lock_class = CassandraDistributedQueuedLock
+
+    def test_uncontended(self):
+        l = self.lock()
+        with l:
+            self.assertEqual([l.prefix + l.lock_id], l.read_lock_columns().keys())
+        self.assertEqual({}, l.read_lock_columns())
+
+    def test_waiters_keep_their_place(self):
+        holder = self.lock()
+        holder.acquire()
+        waiter = self.lock(backoff_policy=FixedAttemptsPolicy(attempts=2, delay=0))
+        self.assertRaises(BusyLockException, waiter.acquire)
+        # one write to join the queue, one to leave it when giving up
+        self.assertEqual(2, waiter.stats['writes'])
+        self.assertEqual([holder.lock_column], holder.read_lock_columns().keys())
+        holder.release()
+
+    def test_first_come_first_served(self):
+        order = []
+        holder = self.lock()
+        holder.acquire()
+
+        def wait(i, lock_id):
+            with self.lock(lock_id=lock_id, backoff_policy=FixedAttemptsPolicy(attempts=500, delay=0.005)):
+                order.append(i)
+
+        ids = [str(TimeUUID.with_utcnow()) for _ in xrange(4)]
+        threads = [threading.Thread(target=wait, args=(i, lock_id)) for i, lock_id in reversed(list(enumerate(ids)))]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        self.assertEqual(4, sum(1 for k in holder.read_lock_columns() if k.startswith('_lock_q:')))
+        holder.release()
+        for t in threads:
+            t.join()
+        self.assertEqual([0, 1, 2, 3], order)
+        self.assertEqual({}, holder.read_lock_columns())
+
+    def test_row_locks_respect_the_queue(self):
+        self.cf.insert('row', {'_lock_q:' + str(TimeUUID.with_utcnow()): repr(self.lock().utcnow() + 10 ** 7)})
+        self.assertRaises(BusyLockException, CassandraDistributedRowLock(
+            None, self.cf, 'row', consistency_level=ConsistencyLevel.ONE).acquire)
@@ -0,0 +1,75 @@
+import time
+import unittest
+from pycassa import NotFoundException
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+
+class FakeColumnFamilyTestCase(unittest.TestCase):
+    def test_ttl(self):
+        cf = FakeColumnFamily()
+        cf.insert('row', {'col': 'val'}, ttl=0.01)
+        self.assertEqual({'col': 'val'}, dict(cf.get('row')))
+        time.sleep(0.02)
+        self.assertRaises(NotFoundException, cf.get, 'row')
+
+    def test_latency(self):
+        cf = FakeColumnFamily(latency=0.01, jitter=0.01)
+        start = time.time()
+        cf.batch(queue_size=0).insert('row', {'col': 'val'}).send()
+        cf.get('row')
+        self.assertTrue(0.02 <= time.time() - start < 0.1)
+        self.assertEqual(1, cf.stats['writes'])
+
+    def test_replication_delay(self):
+        cf = FakeColumnFamily(replication_delay=0.02)
+        cf.insert('row', {'col': 'val'})
+        self.assertRaises(NotFoundException, cf.get, 'row')
+        time.sleep(0.03)
+        self.assertEqual({'col': 'val'}, dict(cf.get('row')))
+
+    def test_overlapping_consistency_levels(self):
+        cf = FakeColumnFamily(replication_delay=10)
+        cf.insert('row', {'col': 'val'}, write_consistency_level=ConsistencyLevel.QUORUM)
+        self.assertRaises(NotFoundException, cf.get, 'row')
+        self.assertEqual({'col': 'val'}, dict(cf.get('row', read_consistency_level=ConsistencyLevel.QUORUM)))
+        cf.batch(queue_size=0).insert('row', {'col': 'new'}).send(write_consistency_level=ConsistencyLevel.ALL)
+        self.assertEqual({'col': 'new'}, dict(cf.get('row')))
+        self.assertEqual((1, 1, 2, 1), (cf.stats['writes_QUORUM'], cf.stats['writes_ALL'], cf.stats['reads_ONE'],
+                                        cf.stats['reads_QUORUM']))
+
+    def test_stronger_levels_wait_longer(self):
+        cf = FakeColumnFamily(jitter=0.01)
+
+        def timed(level):
+            start = time.time()
+            for _ in xrange(10):
+                cf.insert('row', {'col': 'val'}, write_consistency_level=level)
+            return time.time() - start
+        self.assertTrue(timed(ConsistencyLevel.ONE) < timed(ConsistencyLevel.ALL))
+
+    def test_tombstones(self):
+        cf = FakeColumnFamily()
+        cf.insert('row', dict(('col%d' % i, 'val') for i in xrange(5)))
+        cf.remove('row', ['col0', 'col1', 'col2'])
+        self.assertEqual(['col3', 'col4'], cf.get('row', column_count=2).keys())
+        self.assertEqual(3, cf.stats['tombstones_scanned'])
+        cf.insert('row', {'col1': 'again'})
+        cf.stats.clear()
+        cf.get('row', column_start='col1')
+        self.assertEqual(1, cf.stats['tombstones_scanned'])
+        cf.compact()
+        cf.stats.clear()
+        cf.get('row')
+        self.assertEqual(0, cf.stats['tombstones_scanned'])
+
+    def test_expired_columns_are_tombstones(self):
+        cf = FakeColumnFamily(gc_grace_seconds=0.02)
+        cf.insert('row', {'a': 'val'}, ttl=0.01)
+        cf.insert('row', {'b': 'val'})
+        time.sleep(0.015)
+        cf.get('row')
+        self.assertEqual(1, cf.stats['tombstones_scanned'])
+        time.sleep(0.02)
+        cf.get('row')
+        self.assertEqual(1, cf.stats['tombstones_scanned'])
@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import padlock
+from padlock.exceptions import BusyLockException
+from padlock.distributed.retry_policy import FixedAttemptsPolicy
+from padlock.local.file import FileLock, slot
+
+
+def hold(path, key, acquired):
+    FileLock(key, path=path).acquire()
+    acquired.set()
+    time.sleep(60)
+
+
+class FileLockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'locks')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def lock(self, key='row', **kwargs):
+        return FileLock(key, path=self.path, **kwargs)
+
+    def test_registered(self):
+        self.assertTrue(padlock.get('file') is FileLock)
+
+    def test_slot(self):
+        self.assertEqual(slot('row', 100), slot(u'row', 100))
+        self.assertTrue(0 <= slot('row', 100) < 100)
+
+    def test_busy_between_threads(self):
+        with self.lock():
+            self.assertRaises(BusyLockException, self.lock().acquire)
+            with self.lock('other'):
+                pass
+        with self.lock():
+            pass
+
+    def test_acquire_blocking_timeout(self):
+        lock = self.lock()
+        self.assertTrue(lock.acquire(blocking=False))
+        self.assertFalse(self.lock().acquire(blocking=False))
+        self.assertFalse(self.lock().acquire(timeout=0.02))
+        threading.Timer(0.02, lock.release).start()
+        self.assertTrue(self.lock().acquire(timeout=5))
+
+    def test_blocking_lock_honours_acquire_args(self):
+        lock = self.lock()
+        lock.acquire()
+        self.assertFalse(self.lock(blocking=True).acquire(blocking=False))
+        self.assertFalse(self.lock(blocking=True).acquire(timeout=0.02))
+        threading.Timer(0.02, lock.release).start()
+        with self.lock(blocking=True):
+            pass
+
+    def test_retry(self):
+        lock = self.lock()
+        lock.acquire()
+        threading.Timer(0.02, lock.release).start()
+        with self.lock(backoff_policy=FixedAttemptsPolicy(attempts=50, delay=0.01)):
+            pass
+
+    def test_released_when_process_dies(self):
+        acquired = multiprocessing.Event()
+        proc = multiprocessing.Process(target=hold, args=(self.path, 'row', acquired))
+        proc.start()
+        try:
+            self.assertTrue(acquired.wait(5))
+            self.assertRaises(BusyLockException, self.lock().acquire)
+        finally:
+            proc.terminate()
+            proc.join()
+        with self.lock(backoff_policy=FixedAttemptsPolicy(attempts=50, delay=0.01)):
+            pass
@@ -0,0 +1,43 @@
+import threading
+import time
+import unittest
+from padlock.local.table import LocalLockTable
+
+
+class LocalLockTableTestCase(unittest.TestCase):
+    def setUp(self):
+        self.table = LocalLockTable()
+
+    def test_acquire_release(self):
+        self.assertTrue(self.table.acquire('a'))
+        self.assertTrue(self.table.locked('a'))
+        self.assertFalse(self.table.acquire('a', blocking=False))
+        self.assertTrue(self.table.acquire('b', blocking=False))
+        self.table.release('a')
+        self.table.release('b')
+        self.assertEqual(0, len(self.table))
+        self.assertRaises(RuntimeError, self.table.release, 'a')
+
+    def test_timeout(self):
+        self.table.acquire('a')
+        start = time.time()
+        self.assertFalse(self.table.acquire('a', timeout=0.05))
+        self.assertTrue(time.time() - start >= 0.05)
+        self.assertEqual(1, len(self.table))
+
+    def test_hand_off(self):
+        self.table.acquire('a')
+        got = threading.Event()
+
+        def wait():
+            self.table.acquire('a')
+            got.set()
+            self.table.release('a')
+
+        t = threading.Thread(target=wait)
+        t.start()
+        self.assertFalse(got.wait(0.05))
+        self.table.release('a')
+        t.join()
+        self.assertTrue(got.is_set())
+        self.assertEqual(0, len(self.table))
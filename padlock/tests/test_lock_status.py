@@ -0,0 +1,61 @@
+import unittest
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.distributed import lock_values
+from padlock.distributed.cassandra import CassandraDistributedRowLock, utcnow
+from padlock.distributed.manager import LockManager
+from padlock.distributed.status import lock_status
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+
+class LockStatusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cf = FakeColumnFamily()
+        self.locks = [CassandraDistributedRowLock(None, self.cf, 'row:%d' % i, consistency_level=ConsistencyLevel.ONE,
+                                                  value_format='binary')
+                      for i in xrange(0, 100, 3)]
+        for l in self.locks:
+            l.acquire()
+        self.cf.insert('row:1', {'data': 'x', '_lock_dead': lock_values.encode(utcnow() - 10 ** 6),
+                                 '_lock_revoke:dead': lock_values.encode(utcnow() + 10 ** 6)})
+        self.cf.insert('row:2', {'_lock_forever': lock_values.encode_text(0)})
+        self.cf.stats.clear()
+
+    def tearDown(self):
+        for l in self.locks:
+            l.release()
+
+    def test_status(self):
+        statuses = lock_status(self.cf, ['row:%d' % i for i in xrange(100)], chunk_size=30)
+        self.assertEqual(100, len(statuses))
+        self.assertEqual(set(['row:%d' % i for i in xrange(0, 100, 3)] + ['row:2']),
+                         set(k for k, s in statuses.iteritems() if s.locked))
+
+        held = statuses['row:0']
+        self.assertEqual(self.locks[0].lock_column, held.holders[0][0])
+        self.assertEqual(lock_values.holder(), held.holders[0][2:])
+        self.assertEqual(held.holders[0][1], held.expiry)
+        self.assertTrue(held.expiry > utcnow())
+
+        self.assertEqual((False, None, [], ['_lock_dead']),
+                         (statuses['row:1'].locked, statuses['row:1'].expiry, statuses['row:1'].holders,
+                          statuses['row:1'].stale))
+        self.assertEqual([('_lock_forever', 0, None, None)], statuses['row:2'].holders)
+        self.assertEqual(0, statuses['row:2'].expiry)
+
+        self.assertEqual(4, self.cf.stats['reads'])
+        self.assertEqual(0, self.cf.stats['writes'])
+
+    def test_released_markers(self):
+        self.cf.insert('row:1', {'_lock_released': lock_values.encode(-utcnow())})
+        status = lock_status(self.cf, ['row:1'])['row:1']
+        self.assertEqual(([], ['_lock_dead']), (status.holders, status.stale))
+
+    def test_pages_through_wide_rows(self):
+        self.cf.insert('row:1', dict(('_lock_%03d' % i, lock_values.encode(0)) for i in xrange(25)))
+        status = lock_status(self.cf, ['row:1'], page_size=10)['row:1']
+        self.assertEqual(25, len(status.holders))
+        self.assertEqual(['_lock_dead'], status.stale)
+
+    def test_manager(self):
+        self.assertTrue(LockManager(None).status(self.cf, ['row:0'])['row:0'].locked)
+        self.assertFalse(LockManager(None, prefix='_other_').status(self.cf, ['row:0'])['row:0'].locked)
@@ -0,0 +1,57 @@
+import os
+import unittest
+from padlock.distributed import lock_values
+from padlock.distributed.cassandra import BusyLockException
+from padlock.tests.test_cassandra_row_lock import CassandraLockTestCase
+
+
+class LockValuesTestCase(unittest.TestCase):
+    def test_binary(self):
+        value = lock_values.encode(1392166152000000L)
+        self.assertEqual(9, len(value))
+        self.assertEqual(1392166152000000L, lock_values.decode_expiry(value))
+        self.assertEqual((1392166152000000L, None, None), lock_values.decode(value))
+
+    def test_holder(self):
+        value = lock_values.encode(0, u'h\xf6st', 1234)
+        self.assertEqual(0, lock_values.decode_expiry(value))
+        self.assertEqual((0, u'h\xf6st', 1234), lock_values.decode(value))
+        self.assertEqual(os.getpid(), lock_values.holder()[1])
+
+    def test_flags(self):
+        value = lock_values.encode(1392166152000000L, u'host', 1234, lock_values.RELEASABLE)
+        self.assertEqual(1392166152000000L, lock_values.decode_expiry(value))
+        self.assertEqual((1392166152000000L, u'host', 1234), lock_values.decode(value))
+        self.assertEqual(lock_values.RELEASABLE, lock_values.decode_flags(value))
+        self.assertEqual(0, lock_values.decode_flags(lock_values.encode(1392166152000000L)))
+        self.assertEqual(0, lock_values.decode_flags(lock_values.encode_text(1392166152000000L)))
+
+    def test_text(self):
+        for value in ('1392166152000000', '1392166152000000L', lock_values.encode_text(1392166152000000L)):
+            self.assertEqual(1392166152000000L, lock_values.decode_expiry(value))
+            self.assertEqual((1392166152000000L, None, None), lock_values.decode(value))
+
+
+class LockValueFormatTestCase(CassandraLockTestCase):
+
+    def test_text_by_default(self):
+        with self.lock() as l:
+            self.assertEqual(lock_values.encode_text(l.read_lock_columns()[l.lock_column]),
+                             self.cf.rows['row'][l.lock_column][0])
+
+    def test_records_holder(self):
+        with self.lock(value_format='binary') as l:
+            expiry, host, pid = l.read_lock_holders()[l.lock_column]
+            self.assertEqual((lock_values.holder()[0], os.getpid()), (host, pid))
+            self.assertTrue(expiry > l.utcnow())
+
+    def test_text_and_binary_locks_share_a_row(self):
+        with self.lock() as l:
+            self.assertEqual((None, None), l.read_lock_holders()[l.lock_column][1:])
+            self.assertRaises(BusyLockException, self.lock(value_format='binary').acquire)
+        with self.lock(value_format='binary', record_holder=False) as l:
+            self.assertEqual(9, len(self.cf.rows['row'][l.lock_column][0]))
+            self.assertRaises(BusyLockException, self.lock().acquire)
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, self.lock, value_format='json')
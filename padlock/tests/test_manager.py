@@ -0,0 +1,76 @@
+import unittest
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.distributed.cassandra import (
+    CassandraDistributedRowLock, CassandraDistributedQueuedLock, BusyLockException
+)
+from padlock.distributed import manager
+from padlock.distributed.manager import LockManager
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+
+class LockManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cf = FakeColumnFamily()
+        self.manager = LockManager(None, consistency_level=ConsistencyLevel.ONE)
+
+    def test_caches_column_families(self):
+        created = []
+
+        def column_family(pool, name, **kwargs):
+            created.append(name)
+            return FakeColumnFamily(name)
+
+        manager.ColumnFamily, cf_class = column_family, manager.ColumnFamily
+        try:
+            l1 = self.manager.lock('Locks', 'a')
+            l2 = self.manager.lock('Locks', 'b', timeout=5)
+            l3 = self.manager.lock('Locks', 'c', read_consistency_level=ConsistencyLevel.QUORUM)
+        finally:
+            manager.ColumnFamily = cf_class
+        self.assertTrue(l1.column_family is l2.column_family)
+        self.assertFalse(l1.column_family is l3.column_family)
+        self.assertEqual(['Locks', 'Locks'], created)
+        self.assertEqual(5, l2.timeout)
+        self.assertTrue(isinstance(l1, CassandraDistributedRowLock))
+
+    def test_kind(self):
+        self.assertTrue(isinstance(self.manager.lock(self.cf, 'a', kind='cassandra_queued'),
+                                   CassandraDistributedQueuedLock))
+
+    def test_release_all_in_one_batch(self):
+        locks = [self.manager.lock(self.cf, 'row%d' % i) for i in xrange(10)]
+        for l in locks:
+            l.acquire()
+        self.manager.lock(self.cf, 'not held')
+        self.assertEqual(set(locks), set(self.manager.held()))
+
+        self.cf.stats.clear()
+        self.manager.release_all()
+        self.assertEqual(1, self.cf.stats['writes'])
+        self.assertEqual({}, self.cf.rows)
+        self.assertEqual([], self.manager.held())
+
+    def test_release_all_reentrant(self):
+        outer = self.manager.lock(self.cf, 'row', reentrant=True)
+        inner = self.manager.lock(self.cf, 'row', reentrant=True)
+        outer.acquire()
+        inner.acquire()
+        self.manager.release_all()
+        self.assertEqual({}, self.cf.rows)
+        inner.release()
+        with self.manager.lock(self.cf, 'row', reentrant=True) as l:
+            self.assertEqual(0, l.stats['reentered'])
+            self.assertEqual([l.lock_column], self.cf.rows['row'].keys())
+
+    def test_shutdown_gives_up_leases(self):
+        with self.manager:
+            with self.manager.lock(self.cf, 'row', lease_grace=1, value_format='binary'):
+                pass
+            self.assertIn('row', self.cf.rows)
+        self.assertEqual({}, self.cf.rows)
+
+    def test_shutdown(self):
+        with self.manager:
+            self.manager.lock(self.cf, 'row').acquire()
+            self.assertRaises(BusyLockException, self.manager.lock(self.cf, 'row').acquire)
+        self.assertEqual({}, self.cf.rows)
@@ -0,0 +1,104 @@
+import threading
+import time
+import unittest
+import padlock
+from padlock.exceptions import BusyLockException
+from padlock.distributed.retry_policy import FixedAttemptsPolicy
+from padlock.local.memory import MemoryLock, StripedLockTable
+from padlock.tests.test_retry_policy import AllowRetryPolicy
+
+
+class StripedLockTableTestCase(unittest.TestCase):
+    def setUp(self):
+        self.table = StripedLockTable(stripes=4)
+
+    def test_acquire_release(self):
+        self.assertTrue(self.table.acquire('a', 1, 10))
+        self.assertFalse(self.table.acquire('a', 2, 10))
+        self.assertEqual(1, self.table.holder('a'))
+        self.assertFalse(self.table.release('a', 2))
+        self.assertTrue(self.table.release('a', 1))
+        self.assertEqual(None, self.table.holder('a'))
+        self.assertEqual(0, len(self.table))
+
+    def test_expiry(self):
+        self.assertTrue(self.table.acquire('a', 1, 0.01))
+        time.sleep(0.02)
+        self.assertTrue(self.table.acquire('a', 2, 10))
+        self.assertFalse(self.table.release('a', 1))
+
+    def test_sweep(self):
+        table = StripedLockTable(stripes=1, sweep_interval=0)
+        for i in xrange(100):
+            table.acquire(i, 1, 0.01)
+        time.sleep(0.02)
+        # every acquire sweeps its stripe first
+        table.acquire('other', 1, 10)
+        self.assertEqual(1, len(table))
+
+    def test_wait_is_cut_short_by_release(self):
+        self.table.acquire('a', 1, 10)
+        threading.Timer(0.02, self.table.release, ('a', 1)).start()
+        start = time.time()
+        self.assertTrue(self.table.acquire('a', 2, 10, wait=5))
+        self.assertTrue(time.time() - start < 1)
+
+
+class MemoryLockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.table = StripedLockTable()
+
+    def lock(self, key='row', **kwargs):
+        return MemoryLock(key, table=self.table, **kwargs)
+
+    def test_registered(self):
+        self.assertTrue(padlock.get('memory') is MemoryLock)
+
+    def test_busy(self):
+        with self.lock():
+            self.assertRaises(BusyLockException, self.lock().acquire)
+            with self.lock('other'):
+                pass
+        with self.lock():
+            pass
+
+    def test_acquire_blocking_timeout(self):
+        lock = self.lock()
+        self.assertTrue(lock.acquire(blocking=False))
+        self.assertFalse(self.lock().acquire(blocking=False))
+        start = time.time()
+        self.assertFalse(self.lock().acquire(timeout=0.05))
+        self.assertTrue(0.05 <= time.time() - start < 0.5)
+        threading.Timer(0.02, lock.release).start()
+        self.assertTrue(self.lock().acquire(blocking=True))
+
+    def test_retry_waits_for_release(self):
+        lock = self.lock()
+        lock.acquire()
+        threading.Timer(0.02, lock.release).start()
+        with self.lock(backoff_policy=FixedAttemptsPolicy(attempts=2, delay=5)):
+            pass
+
+    def test_policy_without_next_delay(self):
+        with self.lock():
+            self.assertRaises(BusyLockException, self.lock(backoff_policy=AllowRetryPolicy()).acquire)
+
+    def test_threads_take_turns(self):
+        holders = []
+        overlaps = []
+
+        def work():
+            for _ in xrange(20):
+                with self.lock(backoff_policy=FixedAttemptsPolicy(attempts=1000, delay=0.01)):
+                    holders.append(1)
+                    if len(holders) > 1:
+                        overlaps.append(1)
+                    holders.pop()
+
+        threads = [threading.Thread(target=work) for _ in xrange(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([], overlaps)
+        self.assertEqual(0, len(self.table))
@@ -0,0 +1,46 @@
+import unittest
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.distributed.cassandra import CassandraDistributedRowLock, BusyLockException
+from padlock.metrics import Histogram, InMemoryLockObserver, default_key_prefix
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+
+class HistogramTestCase(unittest.TestCase):
+    def test_percentiles(self):
+        h = Histogram()
+        self.assertEqual(None, h.percentile(50))
+        for i in xrange(1, 101):
+            h.record(i / 1000.0)
+        self.assertTrue(0.05 <= h.percentile(50) <= 0.05 * 1.5)
+        self.assertTrue(0.099 <= h.percentile(99) <= 0.099 * 1.5)
+        self.assertEqual(0.1, h.max)
+        self.assertEqual(100, h.summary()['count'])
+
+
+class InMemoryLockObserverTestCase(unittest.TestCase):
+    def test_key_prefix(self):
+        self.assertEqual('account', default_key_prefix('account:1234'))
+        self.assertEqual('*', default_key_prefix('1234'))
+
+    def test_lock_reports(self):
+        observer = InMemoryLockObserver()
+        cf = FakeColumnFamily()
+        cf.insert('account:1', {'_lock_stale': '1'})
+
+        def lock():
+            return CassandraDistributedRowLock(None, cf, 'account:1', consistency_level=ConsistencyLevel.ONE,
+                                               observer=observer)
+
+        with lock():
+            self.assertRaises(BusyLockException, lock().acquire)
+
+        stats = observer.snapshot()['account']
+        self.assertEqual(1, stats['acquired'])
+        self.assertEqual(1, stats['failed'])
+        self.assertEqual(1, stats['busy'])
+        self.assertEqual(2, stats['stale'])
+        self.assertEqual(2, stats['insert']['count'])
+        self.assertEqual(2, stats['verify']['count'])
+        self.assertEqual(2, stats['release']['count'])
+        self.assertEqual(1, stats['held']['count'])
+        self.assertEqual(1, stats['attempts']['p50'])
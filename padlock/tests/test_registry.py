@@ -0,0 +1,47 @@
+import subprocess
+import sys
+import unittest
+from zope.interface import Interface
+from zope.component.interfaces import ComponentLookupError
+from padlock import registry
+
+
+class IThing(Interface):
+    pass
+
+
+class Thing(object):
+    pass
+
+
+def _modules_after(statement):
+    out = subprocess.check_output([
+        sys.executable, '-c', statement + '; import sys; print " ".join(sorted(sys.modules))'
+    ])
+    return set(out.split())
+
+
+class RegistryTestCase(unittest.TestCase):
+    def test_import_is_lazy(self):
+        modules = _modules_after('import padlock')
+        self.assertNotIn('zope.configuration', modules)
+        self.assertNotIn('padlock.distributed.cassandra', modules)
+
+    def test_get_imports_backend(self):
+        modules = _modules_after("import padlock; padlock.get('cassandra')")
+        self.assertIn('padlock.distributed.cassandra', modules)
+        self.assertNotIn('zope.configuration', modules)
+
+    def test_lookup_by_dotted_name(self):
+        registry.register(IThing, 'dotted', 'padlock.tests.test_registry.Thing')
+        self.assertIs(Thing, registry.lookup(IThing, 'dotted'))
+        self.assertIs(registry.lookup(IThing, 'dotted'), registry.lookup(IThing, 'dotted'))
+
+    def test_factory_is_called_once(self):
+        registry.register(IThing, 'factory', Thing, factory=True)
+        thing = registry.lookup(IThing, 'factory')
+        self.assertIsInstance(thing, Thing)
+        self.assertIs(thing, registry.lookup(IThing, 'factory'))
+
+    def test_missing(self):
+        self.assertRaises(ComponentLookupError, registry.lookup, IThing, 'missing')
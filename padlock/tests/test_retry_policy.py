@@ -0,0 +1,77 @@
+import time
+import unittest
+from padlock import registry
+from padlock.distributed.retry_policy import (
+    IRetryPolicy, RunOncePolicy, FixedAttemptsPolicy, ExponentialBackoffPolicy, DeadlinePolicy, acquire_policy,
+    retry_delay
+)
+
+
+class AllowRetryPolicy(object):
+    """
+    A policy from before next_delay, with only duplicate and allow_retry.
+    """
+    def __init__(self, attempts=3):
+        self.attempts = attempts
+        self.retries = 0
+
+    def duplicate(self):
+        return self.__class__(self.attempts)
+
+    def allow_retry(self):
+        self.retries += 1
+        return self.retries < self.attempts
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+    def delays(self, policy):
+        res = []
+        while True:
+            delay = policy.next_delay()
+            if delay is None:
+                return res
+            res.append(delay)
+
+    def test_run_once(self):
+        self.assertEqual([], self.delays(RunOncePolicy()))
+
+    def test_fixed_attempts(self):
+        self.assertEqual([0.5, 0.5], self.delays(FixedAttemptsPolicy(3, 0.5)))
+
+    def test_exponential(self):
+        policy = ExponentialBackoffPolicy(base=0.1, cap=0.5, max_attempts=6, jitter=None)
+        self.assertEqual([0.1, 0.2, 0.4, 0.5, 0.5], self.delays(policy))
+        self.assertEqual(5, len(self.delays(policy.duplicate())))
+
+    def test_jitter_stays_in_bounds(self):
+        for jitter in ('full', 'decorrelated'):
+            for delay in self.delays(ExponentialBackoffPolicy(base=0.1, cap=0.5, max_attempts=100, jitter=jitter)):
+                self.assertTrue(0 <= delay <= 0.5)
+        self.assertRaises(ValueError, ExponentialBackoffPolicy, jitter='wobbly')
+
+    def test_deadline(self):
+        policy = DeadlinePolicy(max_wait=0.05, base=0.01, cap=0.01, jitter=None)
+        start = time.time()
+        while policy.allow_retry():
+            pass
+        self.assertTrue(0.05 <= time.time() - start < 0.5)
+
+    def test_acquire_policy(self):
+        policy = FixedAttemptsPolicy(3, 0.5)
+        self.assertEqual([0.5, 0.5], self.delays(acquire_policy(policy)))
+        self.assertEqual([], self.delays(acquire_policy(policy, blocking=False)))
+        self.assertRaises(ValueError, acquire_policy, policy, False, 1)
+        self.assertRaises(ValueError, acquire_policy, policy, True, -2)
+        self.assertEqual(0.05, acquire_policy(policy, timeout=0.05).max_wait)
+        forever = acquire_policy(ExponentialBackoffPolicy(base=0.1, cap=0.2, jitter=None), timeout=-1)
+        self.assertEqual((0.1, 0.2, None, None), (forever.base, forever.cap, forever.max_attempts, forever.jitter))
+
+    def test_allow_retry_only(self):
+        policy = AllowRetryPolicy()
+        self.assertEqual([0, 0, None], [retry_delay(policy) for _ in xrange(3)])
+        self.assertEqual(0.5, retry_delay(FixedAttemptsPolicy(3, 0.5)))
+
+    def test_registered(self):
+        self.assertIsInstance(registry.lookup(IRetryPolicy, 'deadline'), DeadlinePolicy)
+        self.assertIsInstance(registry.lookup(IRetryPolicy, 'exponential_backoff'), ExponentialBackoffPolicy)
+        self.assertIsInstance(registry.lookup(IRetryPolicy, 'fixed_attempts'), FixedAttemptsPolicy)
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import padlock
+from padlock.exceptions import BusyLockException
+from padlock.distributed.retry_policy import FixedAttemptsPolicy
+from padlock.local.sqlite import SQLiteLock, SQLiteMultiLock, connection
+
+
+class SQLiteLockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'locks.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def lock(self, key='row', **kwargs):
+        return SQLiteLock(key, path=self.path, **kwargs)
+
+    def rows(self):
+        return connection(self.path, 'padlock_locks').execute('SELECT key, owner FROM padlock_locks').fetchall()
+
+    def test_registered(self):
+        self.assertTrue(padlock.get('sqlite') is SQLiteLock)
+        self.assertTrue(padlock.get('sqlite_multi') is SQLiteMultiLock)
+
+    def test_acquire_release(self):
+        with self.lock(lock_id='me'):
+            self.assertEqual([('row', 'me')], self.rows())
+            self.assertRaises(BusyLockException, self.lock().acquire)
+        self.assertEqual([], self.rows())
+        with self.lock():
+            pass
+
+    def test_wal(self):
+        self.lock().acquire()
+        mode = connection(self.path, 'padlock_locks').execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual('wal', mode)
+
+    def test_expired_lease_is_taken_over(self):
+        stale = self.lock(lock_id='stale', timeout=0.01)
+        stale.acquire()
+        time.sleep(0.02)
+        with self.lock(lock_id='me'):
+            # releasing a lease we no longer own leaves the new owner alone
+            stale.release()
+            self.assertEqual([('row', 'me')], self.rows())
+
+    def test_acquire_blocking_timeout(self):
+        lock = self.lock()
+        self.assertTrue(lock.acquire(blocking=False))
+        self.assertFalse(self.lock().acquire(blocking=False))
+        self.assertFalse(self.lock().acquire(timeout=0.02))
+        threading.Timer(0.02, lock.release).start()
+        self.assertTrue(self.lock().acquire(timeout=5))
+
+    def test_threads(self):
+        lock = self.lock()
+        lock.acquire()
+        threading.Timer(0.02, lock.release).start()
+        with self.lock(backoff_policy=FixedAttemptsPolicy(attempts=50, delay=0.01)):
+            pass
+
+    def test_multi_all_or_nothing(self):
+        with self.lock('b', lock_id='other'):
+            multi = SQLiteMultiLock(['a', 'b', 'c', 'a'], path=self.path, lock_id='me')
+            self.assertEqual(['a', 'b', 'c'], multi.keys)
+            self.assertRaises(BusyLockException, multi.acquire)
+            self.assertEqual([('b', 'other')], self.rows())
+        with multi:
+            self.assertEqual(['a', 'b', 'c'], sorted(k for k, _ in self.rows()))
+            self.assertRaises(BusyLockException, self.lock('c').acquire)
+        self.assertEqual([], self.rows())
@@ -0,0 +1,68 @@
+import time
+import unittest
+from pycassa.cassandra.ttypes import ConsistencyLevel
+from padlock.distributed import lock_values
+from padlock.distributed.cassandra import CassandraDistributedRowLock, utcnow
+from padlock.distributed.sweeper import StaleLockSweeper
+from padlock.tests.fake_cassandra import FakeColumnFamily
+
+
+class StaleLockSweeperTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cf = FakeColumnFamily()
+        expired = lock_values.encode(utcnow() - 10 ** 6)
+        for i in xrange(20):
+            self.cf.insert('row:%02d' % i, dict(('_lock_dead%02d' % j, expired) for j in xrange(i % 4)))
+        self.cf.insert('row:00', {'data': 'x', '_lock_forever': lock_values.encode(0), '_lock_junk': 'nope'})
+        self.cf.insert('row:01', {'_lock_old': lock_values.encode_text(utcnow() - 10 ** 6)})
+        self.held = CassandraDistributedRowLock(None, self.cf, 'row:02', consistency_level=ConsistencyLevel.ONE)
+        self.held.acquire()
+
+    def tearDown(self):
+        self.held.release()
+
+    def lock_columns(self):
+        return sorted((k, n) for k, row in self.cf.rows.iteritems() for n in row if n.startswith('_lock_'))
+
+    def test_sweep(self):
+        stats = StaleLockSweeper(self.cf, page_size=3, batch_size=7).sweep()
+        self.assertEqual([('row:00', '_lock_forever'), ('row:00', '_lock_junk'), ('row:02', self.held.lock_column)],
+                         self.lock_columns())
+        self.assertEqual('x', self.cf.rows['row:00']['data'][0])
+        self.assertEqual((31, 31, 5, 1), (stats['stale'], stats['deleted'], stats['batches'], stats['unreadable']))
+
+    def test_dry_run(self):
+        before, writes = self.lock_columns(), self.cf.stats['writes']
+        stale = dict(StaleLockSweeper(self.cf).iter_stale())
+        self.assertEqual(['_lock_dead00', '_lock_old'], sorted(stale['row:01']))
+        self.assertEqual(31, StaleLockSweeper(self.cf).sweep(dry_run=True)['stale'])
+        self.assertEqual(before, self.lock_columns())
+        self.assertEqual(writes, self.cf.stats['writes'])
+
+    def test_grace(self):
+        self.assertEqual(0, StaleLockSweeper(self.cf, grace=60).sweep()['deleted'])
+
+    def test_released_markers(self):
+        self.cf.insert('row:00', {'_lock_released': lock_values.encode(-(utcnow() - 10 ** 6)),
+                                  '_lock_recent': lock_values.encode(-utcnow())})
+        self.assertEqual(0, StaleLockSweeper(self.cf).sweep()['released'])
+        self.assertTrue('_lock_released' in self.cf.rows['row:00'])
+        stats = StaleLockSweeper(self.cf, released_age=0.5).sweep()
+        self.assertEqual(1, stats['released'])
+        self.assertEqual(['_lock_forever', '_lock_junk', '_lock_recent', 'data'], sorted(self.cf.rows['row:00']))
+
+    def test_max_rate(self):
+        start = time.time()
+        StaleLockSweeper(self.cf, batch_size=10, max_rate=100).sweep()
+        self.assertTrue(time.time() - start >= 0.3)
+
+
+class ReleaseLocksTestCase(unittest.TestCase):
+    def test_release_locks(self):
+        cf = FakeColumnFamily()
+        cf.insert('row', {'_lock_dead': lock_values.encode(utcnow() - 10 ** 6), '_lock_live': lock_values.encode(0)})
+        lock = CassandraDistributedRowLock(None, cf, 'row', consistency_level=ConsistencyLevel.ONE)
+        self.assertEqual(2, len(lock.release_locks()))
+        self.assertEqual(['_lock_live'], cf.rows['row'].keys())
+        lock.release_locks(force=True)
+        self.assertEqual({}, cf.rows)
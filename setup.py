@@ -23,7 +23,11 @@ It's really easy to use. Here, for example, is how to create a cassandra row loc
 
 Huzzah!
 """,
-    packages=['padlock'],
+    packages=['padlock', 'padlock.distributed', 'padlock.local'],
+    package_data={'padlock': ['configure.zcml']},
+    entry_points={
+        'console_scripts': ['padlock-sweep = padlock.distributed.sweeper:main'],
+    },
     install_requires=[
         'zope.interface==4.0.1',
         'zope.component==4.0.0',